@@ -1,33 +1,180 @@
 import os
 import io
-from datetime import datetime, timedelta
+import re
+import time
+import hashlib
+import gzip
+import zlib
+import json
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+import base64
+import struct
+import threading
+import click
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
 from functools import wraps
 from werkzeug.utils import secure_filename
-from PIL import Image
-
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file
+from werkzeug.wsgi import ClosingIterator
+from PIL import Image, ImageOps
+
+# fcntl غير موجود في Windows: هناك يعمل التطبيق بعملية واحدة (python app.py) فلا حاجة لقفل بين العمليات
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ضغط Brotli اختياري: يُستخدم فقط إذا كانت الحزمة مثبتة
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# orjson اختياري: أسرع بعدة مرات من json القياسية في واجهة JSON
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# msgpack اختياري: ترميز أصغر لمزامنة الأجهزة اللوحية
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# numpy اختياري: البحث عن الفساتين المشابهة بصرياً يحتاجها
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from dotenv import load_dotenv
+from flask import (Flask, render_template, request, redirect, url_for, flash, session, send_file,
+                   send_from_directory, abort, make_response, stream_template, Response, g)
 from flask_sqlalchemy import SQLAlchemy
+from markupsafe import Markup, escape
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer, joinedload, load_only
+from sqlalchemy.orm.exc import StaleDataError
 
 # ====================================================================
 # I. تهيئة التطبيق وقاعدة البيانات
 # ====================================================================
 
+load_dotenv()
+
+def database_url():
+    """رابط قاعدة البيانات من DATABASE_URL أو SQLite المحلية"""
+    url = os.environ.get('DATABASE_URL', 'sqlite:///the_bride.db')
+    # Heroku وغيرها ما زالت تستخدم postgres:// الذي لا يقبله SQLAlchemy 1.4+،
+    # ونثبت المشغل على psycopg2 الموجود في requirements.txt
+    for scheme in ('postgres://', 'postgresql://'):
+        if url.startswith(scheme):
+            url = 'postgresql+psycopg2://' + url[len(scheme):]
+    return url
+
+def engine_options(url):
+    """إعدادات مجمع الاتصالات لقواعد البيانات الخادمية"""
+    if url.startswith('sqlite'):
+        return {}
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+    }
+    # إيقاف الاستعلامات العالقة بدلاً من حجز الاتصال إلى الأبد
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    if url.startswith('postgresql') and statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
 app = Flask(__name__)
+# القوالب تُقرأ من مجلد templates، ونسخها المترجمة تُحفظ في مجلد مشترك بين العمليات
+app.jinja_options = {
+    **app.jinja_options,
+    # بدون JINJA_CACHE_DIR يستخدم Jinja مجلداً مؤقتاً خاصاً بالمستخدم
+    'bytecode_cache': FileSystemBytecodeCache(os.environ.get('JINJA_CACHE_DIR')),
+}
 app.config['SECRET_KEY'] = 'THE_BRIDE_SECRET_KEY_2025'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///the_bride.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# ملف إعدادات SQLite: production (WAL) أو default (وضع SQLite الافتراضي)
+app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'production')
+
 # السماح بملفات الصور فقط
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
-db = SQLAlchemy(app)
+# إعدادات SQLite للإنتاج: WAL يسمح للقراءة بالاستمرار أثناء الكتابة
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',      # آمن مع WAL وأسرع بكثير من FULL
+    'cache_size': -64000,         # 64MB لكل اتصال
+    'mmap_size': 268435456,       # 256MB
+    'busy_timeout': 5000,         # الانتظار بدلاً من "database is locked"
+    'foreign_keys': 'ON',
+    'temp_store': 'MEMORY',
+}
+
+# قاعدة البيانات تُربط بالتطبيق داخل create_app()
+db = SQLAlchemy()
+
+@event.listens_for(Engine, 'connect')
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """تطبيق إعدادات SQLite على كل اتصال جديد"""
+    if app.config['SQLITE_PROFILE'] != 'production':
+        return
+    if type(dbapi_connection).__module__ != 'sqlite3':
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+def dispose_engines_after_fork():
+    """إسقاط اتصالات العملية الأم في العملية الابنة (gunicorn --preload)"""
+    if 'sqlalchemy' not in app.extensions:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False: لا نغلق مقابس SQLite/Postgres التي تستخدمها العملية الأم
+            engine.dispose(close=False)
+
+if hasattr(os, 'register_at_fork'):  # غير موجود في Windows
+    os.register_at_fork(after_in_child=dispose_engines_after_fork)
 
 # ====================================================================
 # II. تعريف نماذج قاعدة البيانات
 # ====================================================================
 
+# ربط الفساتين بوسوم الأقمشة والألوان؛ الفهرس (tag_id, dress_id) يخدم التصفية حسب الوسم
+dress_tag = db.Table(
+    'dress_tag',
+    db.Column('dress_id', db.Integer, db.ForeignKey('dress.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_dress_tag_tag_dress', 'tag_id', 'dress_id'),
+)
+
+class Tag(db.Model):
+    """وسم قماش أو لون (fabric_types و color مقسمة بالفواصل)"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # fabric, color
+    name = db.Column(db.String(100), nullable=False)
+    
+    __table_args__ = (db.UniqueConstraint('kind', 'name'),)
+
 class Dress(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     dress_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -38,14 +185,63 @@ class Dress(db.Model):
     rental_price = db.Column(db.Float, default=0.0)
     size = db.Column(db.String(50))
     details = db.Column(db.Text)  # تفاصيل إضافية
-    image_data = db.Column(db.LargeBinary)  # تخزين الصورة كبيانات ثنائية
+    image_data = db.Column(db.LargeBinary)  # قديم: يُنقل إلى image_blob عند التهيئة (migrate_dress_images)
+    image_id = db.Column(db.Integer, db.ForeignKey('image_blob.id'), index=True)
     image_filename = db.Column(db.String(255))
     created_date = db.Column(db.DateTime, default=datetime.now)
     is_available = db.Column(db.Boolean, default=True)
+    # اختيار "متاح للحجز" اليدوي؛ is_available = in_service ولا حجز نشط يشمل اليوم
+    in_service = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     
     # معلومات الحجز
     booking_count = db.Column(db.Integer, default=0)
     last_booking_date = db.Column(db.Date)
+    
+    # يزيد مع كل تعديل من نموذج الفستان؛ التحديث يشترط الإصدار المقروء (WHERE id=? AND version=?).
+    # الحجوزات والإرجاع والصيانة تحدث الإتاحة والعدادات فقط فلا تغيره (لا تعارض زائف في نموذج التعديل)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default=db.text('1'))
+    
+    tags = db.relationship('Tag', secondary=dress_tag, lazy=True)
+    
+    # فهارس تصفية الكتالوج: التصنيف والمقاس ونطاق السعر
+    __table_args__ = (
+        db.Index('ix_dress_category_size_price', 'category', 'size', 'rental_price'),
+        db.Index('ix_dress_size_price', 'size', 'rental_price'),
+        db.Index('ix_dress_rental_price', 'rental_price'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+
+    @property
+    def has_image(self):
+        return self.image_id is not None
+
+class ImageBlob(db.Model):
+    """صورة مضغوطة واحدة مشتركة بين الفساتين، مفتاحها SHA-256 لمحتواها
+
+    ref_count عدد الفساتين التي تستخدمها؛ تُحذف عندما يصل إلى صفر.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), nullable=False, unique=True)
+    source_digest = db.Column(db.String(64), index=True)  # بصمة الملف المرفوع قبل الضغط
+    data = db.Column(db.LargeBinary, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    features = db.Column(db.LargeBinary)  # خصائص التشابه البصري (image_features)، وb'' إن تعذر حسابها
+    ref_count = db.Column(db.Integer, nullable=False, default=1)
+    created_date = db.Column(db.DateTime, default=datetime.now)
+
+class ImageThumbnail(db.Model):
+    """مصغرة صورة مشتركة بأحد عروض THUMB_WIDTHS، تُنشأ عند أول طلب لها"""
+    image_id = db.Column(db.Integer, db.ForeignKey('image_blob.id', ondelete='CASCADE'), primary_key=True)
+    width = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+class Customer(db.Model):
+    """عميل واحد لكل رقم هاتف (بعد توحيد صيغته بـ normalize_phone)"""
+    id = db.Column(db.Integer, primary_key=True)
+    phone = db.Column(db.String(20), nullable=False, unique=True)
+    name = db.Column(db.String(150), nullable=False)
+    email = db.Column(db.String(100))
+    created_date = db.Column(db.DateTime, default=datetime.now)
 
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -61,11 +257,46 @@ class Booking(db.Model):
     
     # حالة الحجز
     status = db.Column(db.String(20), default='active')  # active, returned, cancelled
+    is_overdue = db.Column(db.Boolean, default=False, server_default=db.false())  # تُحدثه مهمة الصيانة
     
     dress_id = db.Column(db.Integer, db.ForeignKey('dress.id'), nullable=False)
+    # بيانات العميل تبقى في الحجز كما أُدخلت، والربط بالعميل يجمع سجله
+    customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'), index=True)
     created_date = db.Column(db.DateTime, default=datetime.now)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default=db.text('1'))
     
     dress = db.relationship('Dress', backref=db.backref('bookings', lazy=True))
+    customer = db.relationship('Customer', backref=db.backref('bookings', lazy=True))
+    
+    # فحص التعارض والإتاحة يبحث عن حجوزات الفستان النشطة حسب التاريخ
+    __table_args__ = (
+        db.Index('ix_booking_dress_status_date', 'dress_id', 'status', 'booking_date'),
+        db.Index('ix_booking_status_date', 'status', 'booking_date'),
+        db.Index('ix_booking_status_return', 'status', 'return_date'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+
+class BookingArchive(db.Model):
+    """الحجوزات المغلقة (مُرجعة أو ملغاة) منذ أكثر من ARCHIVE_AFTER_MONTHS شهراً
+
+    نفس أعمدة Booking ونفس المعرف؛ بدون مفتاح أجنبي حتى لا يمنع حذف الفستان.
+    """
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    customer_name = db.Column(db.String(150), nullable=False)
+    customer_phone = db.Column(db.String(20))
+    customer_email = db.Column(db.String(100))
+    booking_date = db.Column(db.Date, nullable=False)
+    return_date = db.Column(db.Date)
+    deposit_paid = db.Column(db.Float, default=0.0)
+    total_price = db.Column(db.Float, default=0.0)
+    remaining_balance = db.Column(db.Float, default=0.0)
+    notes = db.Column(db.Text)
+    status = db.Column(db.String(20))
+    is_overdue = db.Column(db.Boolean, default=False, server_default=db.false())
+    dress_id = db.Column(db.Integer, nullable=False, index=True)
+    customer_id = db.Column(db.Integer, index=True)
+    created_date = db.Column(db.DateTime, index=True)
+    archived_at = db.Column(db.DateTime, default=datetime.now)
 
 class SystemLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -73,6 +304,26 @@ class SystemLog(db.Model):
     action = db.Column(db.String(50))
     details = db.Column(db.Text)
 
+class ChangeLog(db.Model):
+    """سجل التغييرات للمزامنة التدريجية: seq هو مؤشر المزامنة (cursor)"""
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)  # dress, booking
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # upsert, delete
+    changed_at = db.Column(db.DateTime, default=datetime.now)
+
+class DashboardDigest(db.Model):
+    """ملخص لوحة التحكم ليوم معين، صالح طالما لم تتغير عدادات الكتابة"""
+    day = db.Column(db.Date, primary_key=True)
+    versions = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    computed_at = db.Column(db.DateTime, default=datetime.now)
+
+class DataVersion(db.Model):
+    """عداد كتابة لكل جدول، يزيد مع كل تعديل (يُستخدم في ETag)"""
+    name = db.Column(db.String(50), primary_key=True)  # dress, booking, catalog
+    version = db.Column(db.Integer, nullable=False, default=0)
+
 # ====================================================================
 # III. دوال المساعدة والتحقق
 # ====================================================================
@@ -88,31 +339,1210 @@ def login_required(f):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def decode_image(image_data, max_size=None):
+    """فك ترميز الصورة مع التصغير المبكر لملفات JPEG"""
+    img = Image.open(io.BytesIO(image_data))
+    if max_size:
+        # نفس التصغير المبكر الذي يطبقه thumbnail() قبل تحميل البكسلات
+        img.draft(None, (max_size[0] * 2, max_size[1] * 2))
+    img.load()
+    return img
+
+def resize_image(img, max_size=(800, 800)):
+    """تصغير الصورة مع الحفاظ على النسبة"""
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return img
+
+def flatten_alpha(img):
+    """التحويل إلى RGB إذا كانت الصورة RGBA"""
+    if img.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        img = background
+    return img
+
+def encode_jpeg(img):
+    """ترميز الصورة بصيغة JPEG"""
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=85, optimize=True)
+    return output.getvalue()
+
 def compress_image(image_data, max_size=(800, 800)):
     """ضغط الصورة لتقليل حجمها"""
     try:
-        img = Image.open(io.BytesIO(image_data))
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # التحويل إلى RGB إذا كانت الصورة RGBA
-        if img.mode in ('RGBA', 'LA'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-            img = background
-        
-        output = io.BytesIO()
-        img.save(output, format='JPEG', quality=85, optimize=True)
-        return output.getvalue()
+        img = decode_image(image_data, max_size)
+        img = resize_image(img, max_size)
+        img = flatten_alpha(img)
+        return encode_jpeg(img)
     except Exception as e:
         print(f"خطأ في ضغط الصورة: {e}")
         return image_data
 
+# خصائص التشابه: مدرج ألوان 4×4×4 لوسط الصورة (حيث الفستان) ثم dHash من 64 بت لشكلها
+FEATURE_COLOR_LEVELS = 4
+FEATURE_BINS = FEATURE_COLOR_LEVELS ** 3
+FEATURE_SIZE = FEATURE_BINS * 4 + 8
+
+def image_features(image_data):
+    """خصائص بحجم ثابت FEATURE_SIZE بايت: مدرج ألوان float32 مجموعه 1 ثم dHash، أو None"""
+    try:
+        img = flatten_alpha(decode_image(image_data, (64, 64))).convert('RGB')
+    except Exception as e:
+        print(f"خطأ في حساب خصائص الصورة: {e}")
+        return None
+    width, height = img.size
+    # الوسط فقط حتى لا تطغى خلفية التصوير على ألوان الفستان
+    center = img.crop((width // 5, height // 10, width - width // 5, height - height // 10)).resize((32, 32))
+    shift = 8 - (FEATURE_COLOR_LEVELS.bit_length() - 1)
+    bins = [0] * FEATURE_BINS
+    for r, g, b in center.getdata():
+        bins[((r >> shift) * FEATURE_COLOR_LEVELS + (g >> shift)) * FEATURE_COLOR_LEVELS + (b >> shift)] += 1
+    total = sum(bins)
+    # dHash: هل كل بكسل أفتح من جاره الأيمن في نسخة رمادية 9×8
+    gray = list(img.convert('L').resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (gray[row * 9 + col] > gray[row * 9 + col + 1])
+    return struct.pack(f'<{FEATURE_BINS}f', *(count / total for count in bins)) + bits.to_bytes(8, 'big')
+
+def _acquire_image(condition):
+    """زيادة عداد أول صورة مشتركة تطابق الشرط وإرجاع معرفها، أو None"""
+    blob_id = db.session.query(ImageBlob.id).filter(condition).limit(1).scalar()
+    # صفر صفوف يعني أن الصورة حُذفت بين القراءة والتحديث
+    if blob_id is not None and db.session.execute(db.update(ImageBlob).where(ImageBlob.id == blob_id)
+                                                  .values(ref_count=ImageBlob.ref_count + 1)).rowcount:
+        return blob_id
+    return None
+
+def store_image(data, source_digest=None):
+    """معرف الصورة المشتركة لهذا المحتوى: إعادة استخدام الموجودة (مع زيادة عدادها) أو إضافتها
+
+    الصورة تُطبَّع أولاً بـ compress_image، فنفس الصورة المرفوعة لعدة فساتين تُحفظ مرة واحدة.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    for _ in range(2):
+        blob_id = _acquire_image(ImageBlob.digest == digest)
+        if blob_id is not None:
+            return blob_id
+        try:
+            with db.session.begin_nested():
+                blob = ImageBlob(digest=digest, source_digest=source_digest, data=data, size=len(data),
+                                 features=image_features(data) or b'', ref_count=1)
+                db.session.add(blob)
+            return blob.id
+        except IntegrityError:
+            # عملية أخرى أضافت نفس الصورة في نفس اللحظة
+            continue
+    raise RuntimeError('تعذر حفظ الصورة')
+
+def release_image(blob_id):
+    """إنقاص عداد الصورة المشتركة وحذفها عند آخر مرجع"""
+    if blob_id is None:
+        return
+    db.session.execute(db.update(ImageBlob).where(ImageBlob.id == blob_id)
+                       .values(ref_count=ImageBlob.ref_count - 1))
+    delete_unused_images(ImageBlob.id == blob_id)
+
+def delete_unused_images(*conditions):
+    """حذف الصور المشتركة التي لم يبق لها مرجع مع مصغراتها (حتى بدون foreign_keys في SQLite)"""
+    unused = db.select(ImageBlob.id).where(ImageBlob.ref_count <= 0, *conditions)
+    db.session.execute(db.delete(ImageThumbnail).where(ImageThumbnail.image_id.in_(unused)))
+    return db.session.execute(db.delete(ImageBlob).where(ImageBlob.ref_count <= 0, *conditions)).rowcount
+
+def upload_image(dress, file):
+    """ضغط الصورة المرفوعة وربطها بالفستان، مع تحرير صورته السابقة"""
+    previous = dress.image_id
+    data = file.read()
+    source_digest = hashlib.sha256(data).hexdigest()
+    # نفس الملف رُفع من قبل: الضغط ثابت النتيجة فتُستخدم نسخته المضغوطة دون إعادة ضغط
+    dress.image_id = _acquire_image(ImageBlob.source_digest == source_digest) \
+        or store_image(compress_image(data), source_digest)
+    dress.image_filename = secure_filename(file.filename)
+    if previous is not None:
+        db.session.flush()  # فك الارتباط بالصورة القديمة قبل حذفها
+        release_image(previous)
+
+def image_storage_report():
+    """حجم الصور المخزن فعلياً مقابل حجمها لو خُزنت نسخة لكل فستان"""
+    blobs, stored = db.session.query(db.func.count(ImageBlob.id), db.func.coalesce(db.func.sum(ImageBlob.size), 0)).one()
+    references, logical = db.session.query(db.func.count(Dress.id), db.func.coalesce(db.func.sum(ImageBlob.size), 0)) \
+        .join(ImageBlob, Dress.image_id == ImageBlob.id).one()
+    return {
+        'dresses_with_image': references,
+        'unique_images': blobs,
+        'stored_bytes': stored,
+        'logical_bytes': logical,
+        'saved_bytes': logical - stored,
+        'saved_percent': round(100 * (logical - stored) / logical, 1) if logical else 0.0,
+    }
+
+# المصغرات بنسبة 3:4 مثل صور الفساتين: العرض الأساسي في المعرض وضعفه للشاشات عالية الكثافة
+THUMB_WIDTHS = (150, 300)
+THUMB_ASPECT = (3, 4)
+
+def thumb_size(width):
+    return width, width * THUMB_ASPECT[1] // THUMB_ASPECT[0]
+
+def make_thumbnail(image_data, width):
+    """مصغرة بالمقاس المحدد تماماً (قص الزائد من الوسط) فتطابق أبعاد img في الصفحة، أو None"""
+    try:
+        img = flatten_alpha(decode_image(image_data, thumb_size(width))).convert('RGB')
+        return encode_jpeg(ImageOps.fit(img, thumb_size(width), Image.Resampling.LANCZOS))
+    except Exception as e:
+        print(f"خطأ في إنشاء المصغرة: {e}")
+        return None
+
+def thumbnails(image_ids, width):
+    """{معرف الصورة: المصغرة} للصور المطلوبة، مع إنشاء الناقص منها وحفظه"""
+    found = dict(db.session.query(ImageThumbnail.image_id, ImageThumbnail.data)
+                 .filter(ImageThumbnail.image_id.in_(image_ids), ImageThumbnail.width == width))
+    missing = [image_id for image_id in image_ids if image_id not in found]
+    if missing:
+        created = []
+        for image_id, data in db.session.query(ImageBlob.id, ImageBlob.data).filter(ImageBlob.id.in_(missing)):
+            thumbnail = make_thumbnail(data, width)
+            if thumbnail is not None:
+                found[image_id] = thumbnail
+                created.append({'image_id': image_id, 'width': width, 'data': thumbnail})
+        if created:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(ImageThumbnail.__table__.insert(), created)
+            except IntegrityError:
+                # طلب آخر أنشأ نفس المصغرات في نفس اللحظة
+                pass
+            db.session.commit()
+    return found
+
+def sprite_key(digests):
+    """مفتاح ثابت للصورة المجمعة من بصمات صورها بالترتيب"""
+    return hashlib.sha1('|'.join(digests).encode()).hexdigest()[:16]
+
+# مصفوفة خصائص صور الكتالوج في ذاكرة كل عملية: تُبنى من جديد فقط عند تغير الكتالوج
+SIMILARITY_COLOR_WEIGHT = 0.7
+_feature_index = {}
+
+def feature_index():
+    """{'ids', 'categories', 'colors' (N×FEATURE_BINS float32), 'hashes' (N×64 بت)} للفساتين التي لصورها خصائص"""
+    version = data_versions(['catalog']).get('catalog', 0)
+    cached_version, index = _feature_index.get('entry', (None, None))
+    if cached_version != version:
+        rows = db.session.query(Dress.id, Dress.category, ImageBlob.features) \
+            .join(ImageBlob, Dress.image_id == ImageBlob.id).filter(db.func.length(ImageBlob.features) == FEATURE_SIZE) \
+            .order_by(Dress.id).all()
+        packed = np.frombuffer(b''.join(row.features for row in rows), dtype=np.uint8).reshape(len(rows), FEATURE_SIZE)
+        index = {
+            'ids': np.array([row.id for row in rows], dtype=np.int64),
+            'categories': np.array([row.category or '' for row in rows], dtype=object),
+            'colors': packed[:, :FEATURE_BINS * 4].copy().view('<f4'),
+            'hashes': np.unpackbits(packed[:, FEATURE_BINS * 4:], axis=1),
+        }
+        _feature_index['entry'] = (version, index)
+    return index
+
+def similar_dresses(features, limit=12, exclude=None, category=None, available_only=False):
+    """أقرب فساتين الكتالوج لخصائص صورة: [(معرف الفستان، المسافة من 0 إلى 1)] من الأقرب"""
+    index = feature_index()
+    query = np.frombuffer(features, dtype=np.uint8)
+    # نصف مسافة L1 بين المدرجين ونسبة بتات dHash المختلفة، وكلاهما بين 0 و 1
+    color = np.abs(index['colors'] - query[:FEATURE_BINS * 4].view('<f4')).sum(axis=1) * 0.5
+    shape = np.count_nonzero(index['hashes'] != np.unpackbits(query[FEATURE_BINS * 4:]), axis=1) / 64
+    distance = SIMILARITY_COLOR_WEIGHT * color + (1 - SIMILARITY_COLOR_WEIGHT) * shape
+    mask = np.ones(len(distance), dtype=bool)
+    if exclude is not None:
+        mask &= index['ids'] != exclude
+    if category:
+        mask &= index['categories'] == category
+    candidates = np.flatnonzero(mask)
+    if not available_only and len(candidates) > limit:
+        # الأقرب limit فقط تُرتب، بدلاً من ترتيب الكتالوج كله
+        candidates = candidates[np.argpartition(distance[candidates], limit)[:limit]]
+    results = []
+    for i in candidates[np.argsort(distance[candidates], kind='stable')]:
+        dress_id = int(index['ids'][i])
+        if available_only:
+            # الإتاحة تتغير مع الحجوزات فتُقرأ من ذاكرة الفساتين لا من الفهرس
+            dress = dress_cache.get(dress_id)
+            if dress is None or not dress.is_available:
+                continue
+        results.append((dress_id, float(distance[i])))
+        if len(results) >= limit:
+            break
+    return results
+
+def backfill_image_features(batch_size=100, limit=None):
+    """حساب خصائص التشابه للصور المخزنة قبل إضافتها، على دفعات مرتبة بالمعرف"""
+    done = last_id = 0
+    while limit is None or done < limit:
+        size = batch_size if limit is None else min(batch_size, limit - done)
+        rows = db.session.query(ImageBlob.id, ImageBlob.data).filter(ImageBlob.id > last_id, ImageBlob.features == None) \
+            .order_by(ImageBlob.id).limit(size).all()
+        if not rows:
+            break
+        # b'' للصور التي تعذرت قراءتها حتى لا تُعاد محاولتها في كل مرة
+        db.session.execute(db.update(ImageBlob), [{'id': blob_id, 'features': image_features(data) or b''}
+                                                  for blob_id, data in rows])
+        bump_version('catalog')
+        db.session.commit()
+        last_id = rows[-1].id
+        done += len(rows)
+    return done
+
+# catalog يتغير فقط عند إضافة فستان أو تعديله أو حذفه (وليس مع الحجوزات)
+DATA_VERSION_NAMES = ('dress', 'booking', 'catalog')
+
+# الجداول التي تُسجل تغييراتها للمزامنة
+TRACKED_MODELS = {'Dress': 'dress', 'Booking': 'booking'}
+
+def record_changes(entity, ids, op='upsert'):
+    """إضافة صفوف إلى سجل التغييرات ضمن المعاملة الحالية"""
+    if ids:
+        db.session.execute(ChangeLog.__table__.insert(), [
+            {'entity': entity, 'entity_id': entity_id, 'op': op, 'changed_at': datetime.now()}
+            for entity_id in ids
+        ])
+
+@event.listens_for(db.session, 'after_flush')
+def track_changes(session, flush_context):
+    """تسجيل كل إضافة وتعديل وحذف للفساتين والحجوزات تلقائياً"""
+    changes = []
+    for op, objects in (('upsert', session.new), ('upsert', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            entity = TRACKED_MODELS.get(type(obj).__name__)
+            if entity and (op != 'upsert' or obj in session.new or session.is_modified(obj)):
+                changes.append({'entity': entity, 'entity_id': obj.id, 'op': op, 'changed_at': datetime.now()})
+    if changes:
+        session.connection().execute(ChangeLog.__table__.insert(), changes)
+
+def bump_version(*names):
+    """زيادة عدادات الكتابة ضمن نفس المعاملة قبل commit"""
+    db.session.execute(
+        db.update(DataVersion).where(DataVersion.name.in_(names)).values(version=DataVersion.version + 1)
+    )
+
+def data_versions(names):
+    """قراءة عدادات الكتابة باستعلام واحد"""
+    rows = db.session.query(DataVersion.name, DataVersion.version).filter(DataVersion.name.in_(names))
+    return dict(rows.all())
+
+def conditional_page(*names, daily=False):
+    """ETag ضعيف من عدادات الكتابة: الصفحة غير المتغيرة تعيد 304 دون عرض القالب
+
+    daily: الصفحات التي تعتمد على تاريخ اليوم (مثل التقارير) تتغير كل يوم.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # رسائل flash المعلقة تظهر مرة واحدة فقط، فلا يمكن إعادة النسخة المخزنة
+            if request.method != 'GET' or session.get('_flashes'):
+                return f(*args, **kwargs)
+
+            versions = data_versions(names)
+            key = '|'.join([request.full_path, str(session.get('user_email'))] +
+                           [f'{name}:{versions.get(name, 0)}' for name in names] +
+                           ([datetime.now().date().isoformat()] if daily else []))
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(f(*args, **kwargs))
+            response.set_etag(etag, weak=True)
+            # المتصفح يتحقق في كل مرة لكن دون إعادة تنزيل الصفحة
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
+
+# ضغط الاستجابات النصية الكبيرة
+COMPRESS_MIN_SIZE = 1024
+COMPRESS_MIMETYPES = {'text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript',
+                      'application/msgpack'}
+
+def gzip_stream(chunks):
+    """ضغط التدفق دفعة بدفعة: كل دفعة تُرسل مضغوطة فوراً دون انتظار نهاية الصفحة"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+@app.after_request
+def compress_response(response):
+    """ضغط الاستجابة بـ brotli أو gzip حسب ما يقبله المتصفح"""
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if response.is_streamed:
+        if request.accept_encodings['gzip']:
+            # إغلاق التدفق الأصلي حتى لو لم يُقرأ (يخرج من سياق الطلب داخله)
+            response.response = ClosingIterator(gzip_stream(response.response), getattr(response.response, 'close', None))
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(data, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+# الصفحات الطويلة تُرسل على دفعات بدلاً من بناء HTML كاملاً في الذاكرة
+STREAM_CHUNK_SIZE = 16 * 1024
+STREAM_BATCH_SIZE = 500
+# علامة في القالب: كل ما قبلها يُرسل فوراً (رأس الصفحة والفلاتر)
+STREAM_FLUSH = Markup('<!-- flush -->')
+app.add_template_global(STREAM_FLUSH, 'stream_flush')
+
+def stream_page(template_name, **context):
+    """عرض القالب كتدفق: الرأس يُرسل فوراً ثم الصفوف على دفعات أثناء قراءتها"""
+    pieces = stream_template(template_name, **context)
+
+    def chunks():
+        buffer, size = [], 0
+        for piece in pieces:
+            buffer.append(piece)
+            size += len(piece)
+            if size >= STREAM_CHUNK_SIZE or piece == STREAM_FLUSH:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield ''.join(buffer)
+
+    return Response(chunks(), mimetype='text/html')
+
 def log_action(action, details):
     """تسجيل الإجراءات في النظام"""
     log = SystemLog(action=action, details=details)
     db.session.add(log)
     db.session.commit()
 
+class BookingError(Exception):
+    """خطأ في بيانات الحجز تُعرض رسالته للمستخدم كما هي"""
+    def __init__(self, message, status=400, details=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.details = details or {}
+
+def parse_date(value):
+    """تحويل نص YYYY-MM-DD إلى تاريخ"""
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def normalize_phone(phone):
+    """أرقام الهاتف فقط بصيغة محلية موحدة: +966 5x و 00966 5x و ٠٥x تصبح 05x"""
+    digits = ''.join(str(int(ch)) for ch in (phone or '') if ch.isdecimal())
+    if digits.startswith('00'):
+        digits = digits[2:]
+    if digits.startswith('966') and len(digits) == 12:
+        digits = '0' + digits[3:]
+    return digits[:20]
+
+def find_customer(text):
+    """العميل صاحب رقم الهاتف المكتوب كاملاً، أو None"""
+    phone = normalize_phone(text)
+    if len(phone) < 7:
+        return None
+    return Customer.query.filter_by(phone=phone).first()
+
+def upsert_customer(name, phone, email):
+    """العميل صاحب الرقم (يُنشأ إن لم يوجد)، مع تحديث الاسم والبريد بآخر قيمة مدخلة"""
+    phone = normalize_phone(phone)
+    if not phone:
+        return None
+    customer = Customer.query.filter_by(phone=phone).first()
+    if customer is None:
+        try:
+            # عاملان يضيفان نفس العميل معاً: القيد الفريد يقبل واحداً والآخر يقرأه
+            with db.session.begin_nested():
+                customer = Customer(phone=phone, name=name, email=email or None)
+                db.session.add(customer)
+            return customer
+        except IntegrityError:
+            customer = Customer.query.filter_by(phone=phone).one()
+    customer.name = name or customer.name
+    customer.email = email or customer.email
+    return customer
+
+def create_booking(data):
+    """إنشاء حجز من بيانات النموذج أو JSON بعد التحقق من التعارض"""
+    try:
+        dress_id = int(data.get('dress_id', 0) or 0)
+    except (TypeError, ValueError):
+        raise BookingError('رقم الفستان غير صالح!')
+    dress = dress_cache.get(dress_id)
+    
+    if not dress:
+        raise BookingError('الفستان المحدد غير موجود!', 404)
+    
+    try:
+        booking_date = parse_date(data.get('booking_date'))
+        return_date = parse_date(data.get('return_date')) if data.get('return_date') else None
+    except (TypeError, ValueError):
+        raise BookingError('خطأ في تنسيق التاريخ!')
+    
+    # التحقق من توفر الفستان في الفترة المطلوبة
+    conflict = db.session.query(Booking.id).filter(
+        Booking.dress_id == dress_id,
+        overlapping(booking_date, return_date)
+    ).first()
+    
+    if conflict:
+        raise BookingError('هذا الفستان محجوز بالفعل في الفترة المطلوبة!', 409,
+                           {'suggestions': booking_suggestions(dress, booking_date, return_date)})
+    
+    total_price = float(data.get('total_price', 0) or 0)
+    deposit_paid = float(data.get('deposit_paid', 0) or 0)
+    remaining_balance = total_price - deposit_paid
+    
+    customer_name = (data.get('customer_name') or '').strip()
+    customer_phone = (data.get('customer_phone') or '').strip()
+    customer_email = (data.get('customer_email') or '').strip()
+    customer = upsert_customer(customer_name, customer_phone, customer_email)
+    
+    booking = Booking(
+        customer_name=customer_name,
+        customer_phone=customer_phone,
+        customer_email=customer_email,
+        customer_id=customer.id if customer else None,
+        booking_date=booking_date,
+        return_date=return_date,
+        total_price=total_price,
+        deposit_paid=deposit_paid,
+        remaining_balance=remaining_balance,
+        notes=(data.get('notes') or '').strip(),
+        dress_id=dress_id,
+        status='active'
+    )
+    
+    # تحديث حالة الفستان دون تحميل صفه وصورته (غير متاح فقط إذا بدأ الحجز اليوم أو قبله)
+    values = {'booking_count': Dress.booking_count + 1, 'last_booking_date': booking_date}
+    if booking_date <= date.today():
+        values['is_available'] = False
+    db.session.execute(db.update(Dress).where(Dress.id == dress_id).values(**values))
+    record_changes('dress', [dress_id])
+    
+    db.session.add(booking)
+    bump_version('booking', 'dress')
+    db.session.commit()
+    dress_cache.invalidate(dress_id)
+    invalidate_totals()
+    
+    log_action('ADD_BOOKING', f'حجز جديد: فستان {dress.dress_number} - العميل {booking.customer_name}')
+    return booking
+
+def stale_booking_error(booking):
+    """409 مع نسخة الحجز الحالية بعد فشل شرط الإصدار"""
+    db.session.rollback()
+    current = db.session.get(Booking, booking.id)
+    return BookingError('تم تعديل هذا الحجز من مستخدم آخر، راجع البيانات الحالية وأعد المحاولة.', 409,
+                        {'current': booking_payload(current) if current else None})
+
+def mark_returned(booking, expected_version=None):
+    """تسجيل إرجاع فستان حجز نشط وإتاحته من جديد
+
+    expected_version (اختياري) هو إصدار الحجز الذي رآه المستخدم.
+    """
+    if expected_version is not None and expected_version != booking.version:
+        raise stale_booking_error(booking)
+    if booking.status != 'active':
+        raise BookingError('هذا الحجز ليس نشطاً!', 409)
+    
+    # تحديث حالة الحجز
+    booking.status = 'returned'
+    booking.return_date = datetime.now().date()
+    
+    try:
+        # تحديث حالة الفستان (الحجز يُكتب قبله بشرط إصداره)
+        dress = dress_cache.get(booking.dress_id)
+        if dress:
+            db.session.execute(db.update(Dress).where(Dress.id == dress.id)
+                               .values(is_available=Dress.in_service))
+            record_changes('dress', [dress.id])
+        
+        bump_version('booking', 'dress')
+        db.session.commit()
+    except StaleDataError:
+        # مستخدم آخر أرجع الحجز أو عدّله بين القراءة والكتابة
+        raise stale_booking_error(booking)
+    dress_cache.invalidate(booking.dress_id)
+    
+    log_action('RETURN_BOOKING', f'إرجاع فستان: {dress.dress_number if dress else "غير معروف"} - العميل {booking.customer_name}')
+    return booking
+
+# العمليات الجماعية على الحجوزات: نتيجة لكل معرف ومعاملة واحدة للكل
+BULK_ACTIONS = {'return': 'returned', 'cancel': 'cancelled', 'reschedule': 'active'}
+BULK_MAX_IDS = 1000
+BULK_LOG_ACTIONS = {'return': 'RETURN_BOOKING', 'cancel': 'CANCEL_BOOKING', 'reschedule': 'RESCHEDULE_BOOKING'}
+
+def rented_on(day):
+    """شرط وجود حجز نشط للفستان يشمل اليوم (للاستخدام داخل استعلامات Dress)"""
+    return db.session.query(Booking.id).filter(Booking.dress_id == Dress.id, overlapping(day, day)).exists()
+
+def bulk_update_bookings(action, ids, days=0):
+    """إرجاع أو إلغاء أو تأجيل (بعدد أيام) مجموعة حجوزات نشطة
+
+    قراءة واحدة، تحديثات على مستوى المجموعة، وسجل تدقيق بإدخال واحد.
+    النتيجة لكل معرف: ok أو not_found أو not_active أو conflict أو stale
+    (تغير الحجز بين القراءة والكتابة؛ كل صف يُحدث بشرط إصداره المقروء).
+    """
+    if action not in BULK_ACTIONS:
+        raise BookingError('إجراء غير معروف!')
+    if not isinstance(ids, (list, tuple)):
+        # النص "12" أو القاموس يُقرآن حرفاً حرفاً أو مفتاحاً مفتاحاً
+        raise BookingError('معرفات الحجوزات غير صالحة!')
+    try:
+        ids = list(dict.fromkeys(int(booking_id) for booking_id in ids))
+        days = int(days or 0)
+    except (TypeError, ValueError):
+        raise BookingError('معرفات الحجوزات غير صالحة!')
+    if not ids:
+        raise BookingError('لم يتم اختيار أي حجز!')
+    if len(ids) > BULK_MAX_IDS:
+        raise BookingError(f'الحد الأقصى {BULK_MAX_IDS} حجز في العملية الواحدة!')
+    if action == 'reschedule' and not days:
+        raise BookingError('حدد عدد أيام التأجيل!')
+    
+    rows = {row.id: row for row in db.session.query(
+        Booking.id, Booking.dress_id, Booking.status, Booking.booking_date, Booking.return_date,
+        Booking.customer_name, Booking.version, Dress.dress_number
+    ).join(Dress, Booking.dress_id == Dress.id).filter(Booking.id.in_(ids))}
+    
+    results = {}
+    for booking_id in ids:
+        row = rows.get(booking_id)
+        results[booking_id] = 'not_found' if row is None else 'ok' if row.status == 'active' else 'not_active'
+    selected = [rows[booking_id] for booking_id in ids if results[booking_id] == 'ok']
+    
+    today = date.today()
+    if action == 'reschedule' and selected:
+        shift = timedelta(days=days)
+        moved = {row.id: (row.booking_date + shift, row.return_date + shift if row.return_date else None)
+                 for row in selected}
+        # كل الحجوزات المختارة تتحرك بنفس المقدار، فالتعارض ممكن فقط مع الحجوزات الأخرى
+        obstacles = {}
+        for other in db.session.query(Booking.dress_id, Booking.booking_date, Booking.return_date).filter(
+                Booking.dress_id.in_({row.dress_id for row in selected}), Booking.status == 'active',
+                Booking.id.notin_(list(moved))):
+            obstacles.setdefault(other.dress_id, []).append((other.booking_date, other.return_date))
+
+        def clashes(row):
+            start, end = moved[row.id]
+            return any((other_end is None or other_end >= start) and (end is None or other_start <= end)
+                       for other_start, other_end in obstacles.get(row.dress_id, ()))
+
+        # المرفوض يبقى في مكانه فيصبح عائقاً لغيره، فالفحص يتكرر حتى لا يظهر تعارض جديد
+        rejected = [row for row in selected if clashes(row)]
+        while rejected:
+            for row in rejected:
+                results[row.id] = 'conflict'
+                obstacles.setdefault(row.dress_id, []).append((row.booking_date, row.return_date))
+            selected = [row for row in selected if results[row.id] == 'ok']
+            rejected = [row for row in selected if clashes(row)]
+        values = {
+            'booking_date': db.case({row.id: moved[row.id][0] for row in selected}, value=Booking.id),
+            'return_date': db.case({row.id: moved[row.id][1] for row in selected}, value=Booking.id),
+        }
+    else:
+        values = {'status': BULK_ACTIONS[action], 'is_overdue': False}
+        if action == 'return':
+            values['return_date'] = today
+    
+    if selected:
+        # مقارنة وتبديل لكل الصفوف في جملة واحدة، وRETURNING يحدد الصفوف التي نجحت
+        updated = {row[0] for row in db.session.execute(
+            db.update(Booking)
+            .where(db.tuple_(Booking.id, Booking.version).in_([(row.id, row.version) for row in selected]))
+            .values(version=Booking.version + 1, **values)
+            .returning(Booking.id),
+            execution_options={'synchronize_session': False})}
+        for row in selected:
+            if row.id not in updated:
+                results[row.id] = 'stale'
+        selected = [row for row in selected if row.id in updated]
+    
+    if selected:
+        # إتاحة الفساتين تُعاد حسابها من الحجوزات النشطة المتبقية التي تشمل اليوم
+        dress_ids = sorted({row.dress_id for row in selected})
+        db.session.execute(db.update(Dress).where(Dress.id.in_(dress_ids))
+                           .values(is_available=Dress.in_service & ~rented_on(today)),
+                           execution_options={'synchronize_session': False})
+        record_changes('booking', [row.id for row in selected])
+        record_changes('dress', dress_ids)
+        now = datetime.now()
+        detail = {'return': 'إرجاع فستان', 'cancel': 'إلغاء حجز فستان', 'reschedule': f'تأجيل {days} يوم لحجز فستان'}[action]
+        db.session.execute(SystemLog.__table__.insert(), [
+            {'timestamp': now, 'action': BULK_LOG_ACTIONS[action],
+             'details': f'{detail}: {row.dress_number} - العميل {row.customer_name}'}
+            for row in selected
+        ])
+        bump_version('booking', 'dress')
+    db.session.commit()
+    if selected:
+        for dress_id in dress_ids:
+            dress_cache.invalidate(dress_id)
+    
+    return {
+        'action': action,
+        'updated': len(selected),
+        'results': [{'id': booking_id, 'result': results[booking_id]} for booking_id in ids],
+    }
+
+def overlapping(start, end):
+    """شرط الحجز النشط المتداخل مع الفترة [start, end]
+
+    تاريخ الإرجاع الفارغ (في الحجز أو الطلب) يعني فترة مفتوحة.
+    """
+    condition = (Booking.status == 'active') & \
+        ((Booking.return_date >= start) | (Booking.return_date == None))
+    if end is not None:
+        condition = condition & (Booking.booking_date <= end)
+    return condition
+
+def available_dresses_query(check_date, category='all', fabrics=(), colors=(), end_date=None):
+    """الفساتين المتاحة في تاريخ (أو فترة حتى end_date) باستعلام واحد (NOT EXISTS)"""
+    busy = db.session.query(Booking.id).filter(
+        Booking.dress_id == Dress.id,
+        overlapping(check_date, end_date or check_date)
+    ).exists()
+    
+    query = Dress.query.filter_by(is_available=True).filter(~busy)
+    if category != 'all':
+        query = query.filter_by(category=category)
+    return filter_by_tags(query, fabrics, colors)
+
+# أعمدة مشتركة بين الحجوزات الحالية والمؤرشفة
+HISTORY_COLUMNS = ('id', 'dress_id', 'customer_id', 'customer_name', 'customer_phone', 'customer_email', 'booking_date',
+                   'return_date', 'deposit_paid', 'total_price', 'remaining_balance', 'notes', 'status',
+                   'created_date')
+
+def booking_history():
+    """كل الحجوزات (الحالية والمؤرشفة) كاستعلام فرعي واحد UNION ALL مع عمود archived"""
+    hot = db.select(*[getattr(Booking, name) for name in HISTORY_COLUMNS], db.literal(False).label('archived'))
+    cold = db.select(*[getattr(BookingArchive, name) for name in HISTORY_COLUMNS], db.literal(True).label('archived'))
+    return db.union_all(hot, cold).subquery('booking_history')
+
+# اقتراحات عند التعارض: أقرب فترة حرة قبل الطلب وبعده وفساتين مشابهة متاحة
+SUGGESTION_SIMILAR_LIMIT = 5
+
+def busy_intervals(dress_id, since):
+    """فترات الحجوزات النشطة للفستان من تاريخ معين، مرتبة ومدمجة (date.max للمفتوحة)"""
+    rows = db.session.query(Booking.booking_date, Booking.return_date).filter(
+        Booking.dress_id == dress_id,
+        overlapping(since, None)
+    ).order_by(Booking.booking_date)
+    merged = []
+    for start, end in rows:
+        end = end or date.max
+        # الفترات المتداخلة أو المتلاصقة لا يوجد بينها يوم حر
+        if merged and (start - merged[-1][1]).days <= 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def free_windows(intervals, start, length, earliest):
+    """أقرب بداية حرة لفترة طولها length يوماً قبل start وبعده (أو None)
+
+    مسح للفجوات بين الفترات المشغولة المرتبة، والقبلية لا تبدأ قبل earliest.
+    """
+    gaps = []
+    cursor = earliest
+    for busy_start, busy_end in intervals:
+        if busy_start > cursor:
+            gaps.append((cursor, busy_start - timedelta(days=1)))
+        if busy_end == date.max:
+            cursor = None
+            break
+        cursor = max(cursor, busy_end + timedelta(days=1))
+    if cursor is not None:
+        gaps.append((cursor, date.max))
+
+    after = before = None
+    for gap_start, gap_end in gaps:
+        candidate = max(gap_start, start)
+        if candidate <= gap_end and (gap_end - candidate).days >= length:
+            after = candidate
+            break
+    for gap_start, gap_end in reversed(gaps):
+        if gap_start > start or (gap_end - gap_start).days < length:
+            continue
+        candidate = start if (gap_end - start).days >= length else gap_end - timedelta(days=length)
+        if candidate >= gap_start:
+            before = candidate
+            break
+    return before, after
+
+def booking_suggestions(dress, start, end):
+    """فترات بديلة لنفس الفستان وفساتين من نفس التصنيف والمقاس متاحة في الفترة المطلوبة"""
+    length = (end - start).days if end else 0
+    intervals = busy_intervals(dress.id, min(start, date.today()))
+    before, after = free_windows(intervals, start, length, date.today())
+
+    # نفس شرط التعارض عند الحجز، لا is_available الحالية: الفستان المؤجر اليوم قد يكون متاحاً في الفترة المطلوبة
+    busy = db.session.query(Booking.id).filter(Booking.dress_id == Dress.id, overlapping(start, end)).exists()
+    similar = Dress.query.filter(Dress.category == dress.category, Dress.size == dress.size,
+                                 Dress.id != dress.id, ~busy) \
+        .with_entities(Dress.id, Dress.dress_number, Dress.model_name, Dress.rental_price) \
+        .order_by(Dress.booking_count.desc(), Dress.id).limit(SUGGESTION_SIMILAR_LIMIT)
+
+    def window(begin):
+        if begin is None:
+            return None
+        return {'booking_date': begin, 'return_date': begin + timedelta(days=length) if end else None}
+
+    return {
+        'before': window(before),
+        'after': window(after),
+        'similar': [dict(row._mapping) for row in similar],
+    }
+
+# الملفات الثابتة تُقدم بأسماء تحتوي بصمة محتواها وتُخزن في المتصفح لمدة عام
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+def build_asset_manifest():
+    """بناء جدول البصمات: css/base.css -> css/base.<hash>.css"""
+    manifest = {}
+    for folder, _, files in os.walk(app.static_folder):
+        for name in files:
+            path = os.path.join(folder, name)
+            logical = os.path.relpath(path, app.static_folder).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:10]
+            stem, ext = os.path.splitext(logical)
+            manifest[logical] = f'{stem}.{digest}{ext}'
+    return manifest
+
+ASSET_MANIFEST = build_asset_manifest()
+
+@app.template_global()
+def asset_url(name):
+    """رابط الملف الثابت مع بصمته لإلغاء النسخ القديمة المخزنة"""
+    if app.debug:
+        # في وضع التطوير تظهر تعديلات CSS دون إعادة تشغيل
+        ASSET_MANIFEST.update(build_asset_manifest())
+    return url_for('asset', filename=ASSET_MANIFEST.get(name, name))
+
+class LazyValue:
+    """قيمة تُحسب فقط إذا استخدمها القالب فعلاً"""
+    def __init__(self, func):
+        self._func = func
+
+    def __html__(self):
+        return escape(self._func())
+
+    def __str__(self):
+        return str(self._func())
+
+# إجماليات القوالب: تُخزن مؤقتاً لكل عملية وتُلغى عند الكتابة
+TOTALS_CACHE_SECONDS = 30
+_totals_cache = {}
+
+def cached_total(name):
+    """إرجاع إجمالي الفساتين أو الحجوزات من الذاكرة المؤقتة"""
+    value, expires = _totals_cache.get(name, (None, 0))
+    if time.monotonic() >= expires:
+        if name == 'dresses':
+            value = Dress.query.count()
+        else:
+            value = Booking.query.count() + BookingArchive.query.count()
+        _totals_cache[name] = (value, time.monotonic() + TOTALS_CACHE_SECONDS)
+    return value
+
+def invalidate_totals():
+    """إلغاء الإجماليات المخزنة بعد إضافة أو حذف"""
+    _totals_cache.clear()
+
+# بيانات الفساتين (دون الصورة) تُخزن لكل عملية: LRU بحد أقصى ومدة صلاحية
+DRESS_CACHE_SIZE = 2048
+DRESS_CACHE_SECONDS = 300
+# فحص سجل التغييرات (تعديلات العمليات الأخرى) مرة كل N ثانية على الأكثر لكل عملية، لا في كل طلب
+DRESS_CACHE_SYNC_SECONDS = 1.0
+
+DressInfo = namedtuple('DressInfo', [
+    'id', 'dress_number', 'model_name', 'category', 'color', 'fabric_types', 'rental_price', 'size',
+    'details', 'image_filename', 'created_date', 'is_available', 'in_service', 'booking_count', 'last_booking_date',
+    'version', 'image_id', 'has_image',
+])
+DRESS_INFO_COLUMNS = [getattr(Dress, name) for name in DressInfo._fields[:-1]] + [Dress.image_id.isnot(None)]
+
+class DressCache:
+    """ذاكرة قراءة لبيانات الفساتين حسب المعرف أو رقم الفستان
+
+    مسارات الكتابة تلغي الفستان بعد commit، وتعديلات العمليات الأخرى تُكتشف
+    من سجل التغييرات خلال sync_interval ثانية.
+    """
+    def __init__(self, max_size=DRESS_CACHE_SIZE, ttl=DRESS_CACHE_SECONDS, sync_interval=DRESS_CACHE_SYNC_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self._next_sync = 0.0
+        self._entries = OrderedDict()  # id -> (DressInfo, وقت الانتهاء)
+        self._ids_by_number = {}
+        self._lock = threading.Lock()
+        self._last_seq = None
+        # يزيد مع كل إلغاء، فالقراءة التي بدأت قبله لا تحفظ نتيجتها
+        self._generation = 0
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, dress_id):
+        self._sync()
+        return self._read(self._fresh(dress_id), Dress.id == dress_id)
+
+    def get_by_number(self, dress_number):
+        self._sync()
+        with self._lock:
+            dress_id = self._ids_by_number.get(dress_number)
+        return self._read(self._fresh(dress_id), Dress.dress_number == dress_number)
+
+    def invalidate(self, dress_id):
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.pop(dress_id, None)
+            if entry is not None:
+                self._ids_by_number.pop(entry[0].dress_number, None)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._ids_by_number.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'sync_seconds': self.sync_interval,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _fresh(self, dress_id):
+        with self._lock:
+            entry = self._entries.get(dress_id)
+            if entry is None or time.monotonic() >= entry[1]:
+                return None
+            self._entries.move_to_end(dress_id)
+            return entry[0]
+
+    def _read(self, info, condition):
+        with self._lock:
+            if info is not None:
+                self.hits += 1
+                return info
+            self.misses += 1
+            generation = self._generation
+        row = db.session.query(*DRESS_INFO_COLUMNS).filter(condition).first()
+        if row is None:
+            return None
+        info = DressInfo(*row)
+        with self._lock:
+            # إلغاء أثناء القراءة: القيمة قد تكون أقدم من الكتابة فلا تُحفظ
+            if self._generation != generation:
+                return info
+            self._entries[info.id] = (info, time.monotonic() + self.ttl)
+            self._entries.move_to_end(info.id)
+            self._ids_by_number[info.dress_number] = info.id
+            while len(self._entries) > self.max_size:
+                _, (old, _) = self._entries.popitem(last=False)
+                if self._ids_by_number.get(old.dress_number) == old.id:
+                    del self._ids_by_number[old.dress_number]
+                self.evictions += 1
+        return info
+
+    def _sync(self):
+        """إلغاء الفساتين التي تغيرت في عمليات أخرى منذ آخر فحص"""
+        if g.get('dress_cache_synced'):
+            return
+        g.dress_cache_synced = True
+        now = time.monotonic()
+        with self._lock:
+            # خيط واحد يفحص السجل في كل فترة، والباقي يقرأ من الذاكرة مباشرة
+            if self._last_seq is not None and now < self._next_sync:
+                return
+            self._next_sync = now + self.sync_interval
+        if self._last_seq is None:
+            self.clear()
+            self._last_seq = db.session.query(db.func.max(ChangeLog.seq)).scalar() or 0
+            return
+        # مدة الصلاحية تغطي أي تغيير يفوته المؤشر (مثل تسلسل Postgres غير المرتب)
+        rows = db.session.query(ChangeLog.seq, ChangeLog.entity, ChangeLog.entity_id) \
+            .filter(ChangeLog.seq > self._last_seq).order_by(ChangeLog.seq).all()
+        for seq, entity, entity_id in rows:
+            if entity == 'dress':
+                self.invalidate(entity_id)
+        if rows:
+            with self._lock:
+                self._last_seq = max(self._last_seq, rows[-1].seq)
+
+dress_cache = DressCache()
+
+# قيم التصنيف والمقاس مع عددها، والأقمشة والألوان من الوسوم: تُحسب فقط عند تغير الكتالوج
+FACET_COLUMNS = ('category', 'size')
+_facet_cache = {}
+
+def split_tags(value):
+    """'ساتان حريري، شيفون, تول' -> ['تول', 'ساتان حريري', 'شيفون']"""
+    return sorted({' '.join(part.split()) for part in re.split('[,،]', value or '') if part.strip()})
+
+def tag_keys(fabric_types, color):
+    return [('fabric', name) for name in split_tags(fabric_types)] + [('color', name) for name in split_tags(color)]
+
+def tags_for(fabric_types, color):
+    """وسوم القماش واللون لنصوص الفستان، مع إنشاء الوسوم الجديدة"""
+    wanted = tag_keys(fabric_types, color)
+    if not wanted:
+        return []
+    existing = {(tag.kind, tag.name): tag for tag in Tag.query.filter(
+        db.tuple_(Tag.kind, Tag.name).in_(wanted))}
+    for key in wanted:
+        if key not in existing:
+            existing[key] = Tag(kind=key[0], name=key[1])
+            db.session.add(existing[key])
+    return [existing[key] for key in wanted]
+
+def migrate_dress_tags(batch_size=500):
+    """إنشاء وسوم الفساتين التي ليس لها وسوم من النصوص المفصولة بالفواصل
+
+    تعمل على دفعات مرتبة بالمعرف، ويمكن إعادة تشغيلها بأمان.
+    """
+    untagged = ~db.session.query(dress_tag.c.dress_id).filter(dress_tag.c.dress_id == Dress.id).exists()
+    tag_ids = {(kind, name): tag_id for tag_id, kind, name in db.session.query(Tag.id, Tag.kind, Tag.name)}
+    last_id = 0
+    migrated = 0
+    while True:
+        rows = db.session.query(Dress.id, Dress.fabric_types, Dress.color) \
+            .filter(Dress.id > last_id, untagged).order_by(Dress.id).limit(batch_size).all()
+        if not rows:
+            break
+        keys = {dress_id: tag_keys(fabric_types, color) for dress_id, fabric_types, color in rows}
+        missing = {key for dress_keys in keys.values() for key in dress_keys} - tag_ids.keys()
+        if missing:
+            db.session.execute(Tag.__table__.insert(), [{'kind': kind, 'name': name} for kind, name in missing])
+            tag_ids.update({(kind, name): tag_id for tag_id, kind, name in db.session.query(
+                Tag.id, Tag.kind, Tag.name).filter(db.tuple_(Tag.kind, Tag.name).in_(missing))})
+        links = [{'dress_id': dress_id, 'tag_id': tag_ids[key]} for dress_id, dress_keys in keys.items()
+                 for key in dress_keys]
+        if links:
+            db.session.execute(dress_tag.insert(), links)
+            bump_version('catalog')
+            migrated += len({link['dress_id'] for link in links})
+        db.session.commit()
+        last_id = rows[-1].id
+    return migrated
+
+def migrate_dress_images(batch_size=50):
+    """نقل الصور المخزنة في جدول الفساتين إلى صور مشتركة في image_blob حسب بصمتها
+
+    الصور المحفوظة مضغوطة أصلاً فتُحسب بصمتها كما هي؛ دفعات صغيرة لأن كل صف يحمل
+    صورة كاملة، ويمكن إعادة تشغيلها وتكمل ما لم يُنقل.
+    """
+    migrated = 0
+    while True:
+        rows = db.session.query(Dress.id, Dress.image_id, Dress.image_data) \
+            .filter(Dress.image_data != None).order_by(Dress.id).limit(batch_size).all()
+        if not rows:
+            break
+        for dress_id, previous, image_data in rows:
+            blob_id = store_image(image_data)
+            db.session.execute(db.update(Dress).where(Dress.id == dress_id).values(
+                image_id=blob_id, image_data=None))
+            release_image(previous)
+        ids = [row.id for row in rows]
+        record_changes('dress', ids)
+        bump_version('dress', 'catalog')
+        db.session.commit()
+        for dress_id in ids:
+            dress_cache.invalidate(dress_id)
+        migrated += len(ids)
+    return migrated
+
+def recount_images():
+    """تصحيح عدادات الصور المشتركة من مراجع الفساتين الفعلية وحذف الصور غير المستخدمة"""
+    references = db.select(db.func.count(Dress.id)).where(Dress.image_id == ImageBlob.id).scalar_subquery()
+    fixed = db.session.execute(db.update(ImageBlob).where(ImageBlob.ref_count != references)
+                               .values(ref_count=references)).rowcount
+    removed = delete_unused_images()
+    db.session.commit()
+    return {'fixed': fixed, 'removed': removed}
+
+# استراحة بين دفعات الربط حتى يجد الكتّاب فرصة للقفل
+MIGRATION_BATCH_PAUSE = 0.01
+
+def migrate_customers(batch_size=500, pause=MIGRATION_BATCH_PAUSE):
+    """ربط الحجوزات القديمة (الحالية والمؤرشفة) بعملاء موحدين حسب رقم الهاتف
+
+    دفعات مرتبة بالمعرف، كل دفعة في معاملة قصيرة فلا تُحجب الكتابة؛ يمكن
+    مقاطعتها وإعادة تشغيلها، وتكمل ما لم يُربط بعد.
+    """
+    linked = created = 0
+    for model in (Booking, BookingArchive):
+        # الحجوزات الحالية تُحدث بشرط إصدارها، والأرشيف لا يُعدل من مكان آخر
+        version = getattr(model, 'version', db.literal(None))
+        last_id = 0
+        while True:
+            rows = db.session.query(model.id, model.customer_name, model.customer_phone, model.customer_email,
+                                    version.label('version')) \
+                .filter(model.id > last_id, model.customer_id == None, model.customer_phone != None,
+                        model.customer_phone != '') \
+                .order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            # آخر حجز في الدفعة يحدد اسم العميل الجديد وبريده
+            latest = {}
+            for row in rows:
+                phone = normalize_phone(row.customer_phone)
+                if phone:
+                    latest[phone] = row
+            customer_ids = dict(db.session.query(Customer.phone, Customer.id).filter(Customer.phone.in_(latest)))
+            missing = [phone for phone in latest if phone not in customer_ids]
+            try:
+                if missing:
+                    db.session.execute(Customer.__table__.insert(), [
+                        {'phone': phone, 'name': latest[phone].customer_name,
+                         'email': latest[phone].customer_email or None, 'created_date': datetime.now()}
+                        for phone in missing
+                    ])
+                    customer_ids.update(db.session.query(Customer.phone, Customer.id)
+                                        .filter(Customer.phone.in_(missing)))
+                updates = [{'id': row.id, 'customer_id': customer_ids[normalize_phone(row.customer_phone)]}
+                           for row in rows if normalize_phone(row.customer_phone)]
+                if model is Booking:
+                    versions = {row.id: row.version for row in rows}
+                    for update in updates:
+                        update['version'] = versions[update['id']]
+                if updates:
+                    db.session.execute(db.update(model), updates)
+                    bump_version('booking')
+                db.session.commit()
+            except (IntegrityError, StaleDataError):
+                # حجز جديد أضاف أحد العملاء، أو حجز عُدّل أثناء الدفعة: إعادتها تقرأ الحالة الجديدة
+                db.session.rollback()
+                continue
+            linked += len(updates)
+            created += len(missing)
+            last_id = rows[-1].id
+            time.sleep(pause)
+    return {'bookings': linked, 'customers': created}
+
+def filter_by_tags(query, fabrics=(), colors=()):
+    """الفساتين التي تحتوي كل الأقمشة المختارة وأحد الألوان المختارة
+
+    الأقمشة تُطابق بسلسلة ربط على المفتاح (dress_id, tag_id) تبدأ من أندر وسم.
+    """
+    for kind, names, match_all in (('fabric', set(fabrics), True), ('color', set(colors), False)):
+        names.discard('')
+        if not names:
+            continue
+        counts = dict(catalog_facets()[kind])
+        tag_ids = [tag_id for tag_id, _ in sorted(
+            db.session.query(Tag.id, Tag.name).filter(Tag.kind == kind, Tag.name.in_(names)),
+            key=lambda row: counts.get(row.name, 0))]
+        if not tag_ids or (match_all and len(tag_ids) < len(names)):
+            return query.filter(db.false())
+        if match_all:
+            first = dress_tag.alias()
+            tagged = db.session.query(first.c.dress_id).filter(first.c.tag_id == tag_ids[0])
+            for tag_id in tag_ids[1:]:
+                other = dress_tag.alias()
+                tagged = tagged.join(other, (other.c.dress_id == first.c.dress_id) & (other.c.tag_id == tag_id))
+        else:
+            tagged = db.session.query(dress_tag.c.dress_id).filter(dress_tag.c.tag_id.in_(tag_ids))
+        query = query.filter(Dress.id.in_(tagged))
+    return query
+
+# ترتيب قائمة الفساتين: ?sort=
+DRESS_SORTS = {
+    'number': (Dress.dress_number,),
+    'price': (Dress.rental_price, Dress.id),
+    'price_desc': (Dress.rental_price.desc(), Dress.id),
+    'popular': (Dress.booking_count.desc(), Dress.id),
+}
+
+def price_arg(args, name):
+    """حد السعر من الطلب، أو None إذا كان فارغاً أو غير صالح"""
+    try:
+        return float(args.get(name, ''))
+    except ValueError:
+        return None
+
+def filter_catalog(query, args):
+    """تصفية الفساتين حسب التصنيف والمقاسات ونطاق السعر والوسوم والبحث في استعلام واحد"""
+    category = args.get('category', 'all')
+    sizes = [size for size in args.getlist('size') if size]
+    min_price = price_arg(args, 'min_price')
+    max_price = price_arg(args, 'max_price')
+    search = args.get('search', '')
+    
+    query = filter_by_tags(query, args.getlist('fabric'), args.getlist('color'))
+    if category != 'all':
+        query = query.filter(Dress.category == category)
+    if sizes:
+        query = query.filter(Dress.size.in_(sizes))
+    if min_price is not None:
+        query = query.filter(Dress.rental_price >= min_price)
+    if max_price is not None:
+        query = query.filter(Dress.rental_price <= max_price)
+    if search:
+        query = query.filter(
+            (Dress.dress_number.contains(search)) |
+            (Dress.model_name.contains(search)) |
+            (Dress.color.contains(search))
+        )
+    return query
+
+def catalog_facets():
+    """{'category': [(القيمة، العدد)، ...], 'size', 'fabric', 'color'} مرتبة حسب القيمة"""
+    version = data_versions(['catalog']).get('catalog', 0)
+    cached_version, facets = _facet_cache.get('entry', (None, None))
+    if cached_version != version:
+        counts = {}
+        # كل وجه يُجمع حسب عموده فقط، فلا تتضاعف الصفوف بعدد تركيبات الأعمدة الأخرى
+        for name in FACET_COLUMNS:
+            column = getattr(Dress, name)
+            rows = db.session.query(column, db.func.count(Dress.id)).filter(column != '').group_by(column)
+            counts[name] = {value: count for value, count in rows if value}
+        # الأقمشة والألوان من جدول الوسوم (الفستان قد يحمل أكثر من قماش)
+        counts['fabric'] = {}
+        counts['color'] = {}
+        tag_rows = db.session.query(Tag.kind, Tag.name, db.func.count(dress_tag.c.dress_id)) \
+            .join(dress_tag, dress_tag.c.tag_id == Tag.id).group_by(Tag.id)
+        for kind, name, count in tag_rows:
+            counts[kind][name] = count
+        facets = {name: sorted(values.items()) for name, values in counts.items()}
+        _facet_cache['entry'] = (version, facets)
+    return facets
+
+@app.context_processor
+def inject_now():
+    """إضافة now إلى سياق القوالب"""
+    return {'now': datetime.now()}
+
+@app.context_processor
+def inject_totals():
+    """إضافة total_bookings و total_dresses إلى سياق القوالب دون استعلام مسبق"""
+    return {
+        'total_bookings': LazyValue(lambda: cached_total('bookings')),
+        'total_dresses': LazyValue(lambda: cached_total('dresses')),
+    }
+
 def create_initial_data():
     """إنشاء البيانات الأولية"""
     # إضافة بعض الفساتين الاختبارية
@@ -183,6 +1613,16 @@ def login():
     
     return render_template('login.html')
 
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    """تقديم ملف ثابت ببصمته مع تخزين دائم في المتصفح"""
+    logical = next((name for name, fingerprinted in ASSET_MANIFEST.items() if fingerprinted == filename), None)
+    if logical is None:
+        abort(404)
+    response = send_from_directory(app.static_folder, logical, max_age=ASSET_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
+
 @app.route('/logout')
 def logout():
     log_action('LOGOUT', f'تسجيل خروج: {session.get("user_email")}')
@@ -192,59 +1632,101 @@ def logout():
 
 @app.route('/')
 @login_required
+@conditional_page('dress', 'booking', daily=True)
 def dashboard():
-    today = datetime.now().date()
-    
-    # إحصائيات سريعة
-    total_dresses = Dress.query.count()
-    available_dresses = Dress.query.filter_by(is_available=True).count()
-    active_bookings = Booking.query.filter_by(status='active').count()
-    
-    # الحجوزات القادمة
-    upcoming_bookings = Booking.query.filter(
-        Booking.booking_date >= today,
-        Booking.status == 'active'
-    ).order_by(Booking.booking_date).limit(10).all()
-    
-    # الفساتين التي يجب إرجاعها اليوم
-    due_today = Booking.query.filter(
-        Booking.return_date == today,
-        Booking.status == 'active'
-    ).all()
-    
+    # الإحصائيات والقوائم تُقرأ من ملخص اليوم المحسوب مسبقاً
+    digest = dashboard_digest()
     return render_template('dashboard.html',
-                         total_dresses=total_dresses,
-                         available_dresses=available_dresses,
-                         active_bookings=active_bookings,
-                         upcoming_bookings=upcoming_bookings,
-                         due_today=due_today)
+                         total_dresses=digest['total_dresses'],
+                         available_dresses=digest['available_dresses'],
+                         active_bookings=digest['active_bookings'],
+                         upcoming_bookings=digest['upcoming'],
+                         due_today=digest['due_today'],
+                         overdue_bookings=digest['overdue'])
 
 @app.route('/dresses')
 @login_required
+@conditional_page('dress')
 def dresses_list():
-    category = request.args.get('category', 'all')
-    search = request.args.get('search', '')
-    
-    query = Dress.query
-    
-    if category != 'all':
-        query = query.filter_by(category=category)
+    sort = request.args.get('sort', 'number')
+    query = filter_catalog(Dress.query, request.args)
+    facets = catalog_facets()
+    if request.args.get('view') == 'gallery':
+        return dresses_gallery(query, sort, facets)
     
-    if search:
-        query = query.filter(
-            (Dress.dress_number.contains(search)) |
-            (Dress.model_name.contains(search)) |
-            (Dress.color.contains(search))
-        )
+    # الصورة والتفاصيل لا تظهر في الجدول، والصفوف تُقرأ على دفعات أثناء العرض
+    dresses = query.options(defer(Dress.image_data), defer(Dress.details)) \
+        .order_by(*DRESS_SORTS.get(sort, DRESS_SORTS['number'])).yield_per(STREAM_BATCH_SIZE)
+    return stream_page('dresses.html',
+                       dresses=dresses,
+                       view_url=url_for('dresses_list', **{**request.args.to_dict(flat=False), 'view': 'gallery'}),
+                       categories=facets['category'],
+                       sizes=facets['size'],
+                       fabrics=facets['fabric'],
+                       colors=facets['color'],
+                       current_sizes=request.args.getlist('size'),
+                       current_fabrics=request.args.getlist('fabric'),
+                       current_colors=request.args.getlist('color'),
+                       current_category=request.args.get('category', 'all'),
+                       min_price=request.args.get('min_price', ''),
+                       max_price=request.args.get('max_price', ''),
+                       current_sort=sort,
+                       search_query=request.args.get('search', ''))
+
+GALLERY_PAGE_SIZE = 48
+SPRITE_COLUMNS = 8
+
+def dresses_gallery(query, sort, facets):
+    """عرض الفساتين كبطاقات بمصغرات، صفحة بعد صفحة
+
+    sprite=1 يجمع مصغرات الصفحة في صورة واحدة بدلاً من طلب لكل فستان.
+    """
+    page = max(request.args.get('page', 1, type=int), 1)
+    rows = query.outerjoin(ImageBlob, Dress.image_id == ImageBlob.id).with_entities(
+        Dress.id, Dress.dress_number, Dress.model_name, Dress.category, Dress.color, Dress.rental_price,
+        Dress.is_available, Dress.image_id, ImageBlob.digest) \
+        .order_by(*DRESS_SORTS.get(sort, DRESS_SORTS['number'])) \
+        .offset((page - 1) * GALLERY_PAGE_SIZE).limit(GALLERY_PAGE_SIZE + 1).all()
+    dresses = rows[:GALLERY_PAGE_SIZE]
     
-    dresses = query.order_by(Dress.dress_number).all()
-    categories = db.session.query(Dress.category).distinct().all()
+    sprite_url, cells = None, {}
+    if request.args.get('sprite') == '1':
+        # الصورة المشتركة بين أكثر من فستان تظهر في خلية واحدة
+        images = {dress.image_id: dress.digest for dress in dresses if dress.digest}
+        positions = {image_id: i for i, image_id in enumerate(images)}
+        width, height = thumb_size(THUMB_WIDTHS[0])
+        cells = {dress.id: (positions[dress.image_id] % SPRITE_COLUMNS * width,
+                            positions[dress.image_id] // SPRITE_COLUMNS * height)
+                 for dress in dresses if dress.image_id in positions}
+        if images:
+            sprite_url = url_for('image_sprite', ids=','.join(map(str, images)), v=sprite_key(list(images.values())))
     
-    return render_template('dresses.html',
+    args = request.args.to_dict(flat=False)
+    table_args = {name: values for name, values in args.items() if name not in ('view', 'page', 'sprite')}
+    return render_template('gallery.html',
+                         gallery=True,
                          dresses=dresses,
-                         categories=categories,
-                         current_category=category,
-                         search_query=search)
+                         view_url=url_for('dresses_list', **table_args),
+                         has_next=len(rows) > GALLERY_PAGE_SIZE,
+                         page=page,
+                         page_url=lambda number, **changes: url_for('dresses_list', **{**args, 'page': number, **changes}),
+                         thumb_widths=THUMB_WIDTHS,
+                         thumb_size=thumb_size(THUMB_WIDTHS[0]),
+                         sprite=request.args.get('sprite') == '1',
+                         sprite_url=sprite_url,
+                         sprite_cells=cells,
+                         categories=facets['category'],
+                         sizes=facets['size'],
+                         fabrics=facets['fabric'],
+                         colors=facets['color'],
+                         current_sizes=request.args.getlist('size'),
+                         current_fabrics=request.args.getlist('fabric'),
+                         current_colors=request.args.getlist('color'),
+                         current_category=request.args.get('category', 'all'),
+                         min_price=request.args.get('min_price', ''),
+                         max_price=request.args.get('max_price', ''),
+                         current_sort=sort,
+                         search_query=request.args.get('search', ''))
 
 @app.route('/dresses/add', methods=['GET', 'POST'])
 @login_required
@@ -254,7 +1736,7 @@ def add_dress():
             dress_number = request.form.get('dress_number', '').strip().upper()
             
             # التحقق من عدم تكرار رقم الفستان
-            if Dress.query.filter_by(dress_number=dress_number).first():
+            if dress_cache.get_by_number(dress_number):
                 flash(f'رقم الفستان {dress_number} مسجل مسبقاً!', 'danger')
                 return redirect(url_for('add_dress'))
             
@@ -267,24 +1749,22 @@ def add_dress():
                 rental_price=float(request.form.get('rental_price', 0) or 0),
                 size=request.form.get('size', '').strip(),
                 details=request.form.get('details', '').strip(),
-                is_available=request.form.get('is_available') == 'on'
+                in_service=request.form.get('in_service') == 'on'
             )
+            dress.is_available = dress.in_service
+            dress.tags = tags_for(dress.fabric_types, dress.color)
             
-            # معالجة الصورة
+            # معالجة الصورة (ضغطها ثم مشاركتها إن كانت محفوظة لفستان آخر)
             if 'image' in request.files:
                 file = request.files['image']
                 if file and file.filename and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    image_data = file.read()
-                    
-                    # ضغط الصورة
-                    compressed_data = compress_image(image_data)
-                    
-                    dress.image_data = compressed_data
-                    dress.image_filename = filename
+                    upload_image(dress, file)
             
             db.session.add(dress)
+            bump_version('dress', 'catalog')
             db.session.commit()
+            dress_cache.invalidate(dress.id)
+            invalidate_totals()
             
             log_action('ADD_DRESS', f'تم إضافة فستان جديد: {dress_number}')
             flash(f'تم إضافة الفستان {dress_number} بنجاح!', 'success')
@@ -299,51 +1779,89 @@ def add_dress():
 @app.route('/dresses/<int:dress_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_dress(dress_id):
-    dress = Dress.query.get_or_404(dress_id)
+    dress = dress_cache.get(dress_id)
+    if dress is None:
+        abort(404)
     
     if request.method == 'POST':
+        dress = db.session.get(Dress, dress_id, options=[defer(Dress.image_data)]) or abort(404)
         try:
-            dress.model_name = request.form.get('model_name', '').strip()
-            dress.category = request.form.get('category', '').strip()
-            dress.color = request.form.get('color', '').strip()
-            dress.fabric_types = request.form.get('fabric_types', '').strip()
-            dress.rental_price = float(request.form.get('rental_price', 0) or 0)
-            dress.size = request.form.get('size', '').strip()
-            dress.details = request.form.get('details', '').strip()
-            dress.is_available = request.form.get('is_available') == 'on'
+            values = dress_form_values(request.form)
+            # النموذج يحمل الإصدار الذي عُرض؛ اختلافه يعني أن مستخدماً آخر عدّل الفستان بعد فتحه
+            if request.form.get('version', type=int) not in (None, dress.version):
+                return dress_conflict(dress, values)
+            enabled = values['in_service'] and not dress.in_service
+            for name, value in values.items():
+                setattr(dress, name, value)
+            if not dress.in_service:
+                dress.is_available = False
+            elif enabled:
+                # الحجوزات تغير الإتاحة دون الإصدار، فتُحسب داخل UPDATE لا من قراءة سابقة
+                dress.is_available = ~rented_on(date.today())
+            dress.tags = tags_for(dress.fabric_types, dress.color)
             
-            # تحديث الصورة إذا تم رفع واحدة جديدة
+            # تحديث الصورة إذا تم رفع واحدة جديدة (الصورة المشتركة تُحذف مع آخر فستان يستخدمها)
             if 'image' in request.files:
                 file = request.files['image']
                 if file and file.filename and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    image_data = file.read()
-                    
-                    # ضغط الصورة
-                    compressed_data = compress_image(image_data)
-                    
-                    dress.image_data = compressed_data
-                    dress.image_filename = filename
-                elif request.form.get('remove_image') == '1':
-                    dress.image_data = None
-                    dress.image_filename = None
+                    upload_image(dress, file)
+                elif request.form.get('remove_image') == '1' and dress.image_id is not None:
+                    previous, dress.image_id, dress.image_filename = dress.image_id, None, None
+                    db.session.flush()
+                    release_image(previous)
             
+            bump_version('dress', 'catalog')
             db.session.commit()
+            dress_cache.invalidate(dress_id)
             
             log_action('EDIT_DRESS', f'تم تعديل الفستان: {dress.dress_number}')
             flash(f'تم تعديل الفستان {dress.dress_number} بنجاح!', 'success')
             return redirect(url_for('dresses_list'))
             
+        except StaleDataError:
+            # تعديل آخر التزم بين القراءة والكتابة (UPDATE ... WHERE version=?)
+            db.session.rollback()
+            return dress_conflict(db.session.get(Dress, dress_id, options=[defer(Dress.image_data)]) or abort(404),
+                                  values)
         except Exception as e:
             db.session.rollback()
             flash(f'خطأ في تعديل الفستان: {str(e)}', 'danger')
     
     return render_template('edit_dress.html', dress=dress)
 
+# حقول نموذج تعديل الفستان وأسماؤها في رسالة التعارض
+DRESS_FORM_FIELDS = {
+    'model_name': 'اسم النموذج',
+    'category': 'التصنيف',
+    'color': 'اللون',
+    'fabric_types': 'أنواع الأقمشة',
+    'rental_price': 'السعر',
+    'size': 'المقاس',
+    'details': 'تفاصيل إضافية',
+    'in_service': 'متاح للحجز',
+}
+
+def dress_form_values(form):
+    values = {name: form.get(name, '').strip() for name in DRESS_FORM_FIELDS}
+    values['rental_price'] = float(form.get('rental_price', 0) or 0)
+    values['in_service'] = form.get('in_service') == 'on'
+    return values
+
+def dress_conflict(dress, submitted):
+    """409: نموذج التعديل بقيم المستخدم وإصدار الفستان الحالي، مع الحقول التي اختلفت"""
+    changes = []
+    for name, label in DRESS_FORM_FIELDS.items():
+        current = getattr(dress, name)
+        if (current if current is not None else '') != submitted[name]:
+            changes.append((label, current, submitted[name]))
+    return render_template('edit_dress.html', dress=dress, values=submitted, conflict=changes), 409
+
 @app.route('/dresses/<int:dress_id>/delete', methods=['POST'])
 @login_required
 def delete_dress(dress_id):
-    dress = Dress.query.get_or_404(dress_id)
+    dress = dress_cache.get(dress_id)
+    if dress is None:
+        abort(404)
     
     # التحقق من عدم وجود حجوزات نشطة للفستان
     active_bookings = Booking.query.filter_by(dress_id=dress_id, status='active').first()
@@ -353,8 +1871,13 @@ def delete_dress(dress_id):
     
     try:
         log_action('DELETE_DRESS', f'تم حذف الفستان: {dress.dress_number}')
-        db.session.delete(dress)
+        db.session.delete(db.session.get(Dress, dress_id, options=[defer(Dress.image_data)]))
+        db.session.flush()
+        release_image(dress.image_id)
+        bump_version('dress', 'booking', 'catalog')
         db.session.commit()
+        dress_cache.invalidate(dress_id)
+        invalidate_totals()
         flash(f'تم حذف الفستان {dress.dress_number} بنجاح!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -365,9 +1888,16 @@ def delete_dress(dress_id):
 @app.route('/dresses/<int:dress_id>/image')
 @login_required
 def dress_image(dress_id):
-    dress = Dress.query.get_or_404(dress_id)
+    dress = dress_cache.get(dress_id)
+    if dress is None:
+        abort(404)
     
-    if not dress.image_data:
+    # الصورة وحدها تُقرأ من قاعدة البيانات، والفساتين بدون صورة لا تحتاج استعلاماً
+    blob = None
+    if dress.has_image:
+        blob = db.session.query(ImageBlob.digest, ImageBlob.data).filter(ImageBlob.id == dress.image_id).first()
+    
+    if blob is None:
         # إنشاء صورة افتراضية بسيطة
         img = Image.new('RGB', (300, 400), color='lightgray')
         img_io = io.BytesIO()
@@ -375,74 +1905,71 @@ def dress_image(dress_id):
         img_io.seek(0)
         return send_file(img_io, mimetype='image/jpeg')
     
-    return send_file(io.BytesIO(dress.image_data), mimetype='image/jpeg')
+    # بصمة المحتوى ثابتة للصورة المشتركة فتصلح ETag للمتصفح
+    response = send_file(io.BytesIO(blob.data), mimetype='image/jpeg', etag=blob.digest)
+    return response.make_conditional(request)
+
+# محتوى الصورة المشتركة لا يتغير أبداً، فالمصغرة بعنوان بصمتها تُخزن في المتصفح دون إعادة تحقق
+IMMUTABLE_CACHE = 'private, max-age=31536000, immutable'
+
+@app.route('/images/<digest>/thumb-<int:width>.jpg')
+@login_required
+def image_thumbnail(digest, width):
+    if width not in THUMB_WIDTHS:
+        abort(404)
+    image_id = db.session.query(ImageBlob.id).filter(ImageBlob.digest == digest).scalar()
+    data = thumbnails([image_id], width).get(image_id) if image_id is not None else None
+    if data is None:
+        abort(404)
+    response = send_file(io.BytesIO(data), mimetype='image/jpeg')
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    return response
+
+@app.route('/images/sprite.jpg')
+@login_required
+def image_sprite():
+    """مصغرات صفحة المعرض في صورة واحدة، بترتيب ids وبعدد SPRITE_COLUMNS في كل صف"""
+    ids = [int(value) for value in request.args.get('ids', '').split(',') if value.isdigit()][:GALLERY_PAGE_SIZE]
+    digests = dict(db.session.query(ImageBlob.id, ImageBlob.digest).filter(ImageBlob.id.in_(ids))) if ids else {}
+    if not digests:
+        abort(404)
+    key = sprite_key([digests.get(image_id, '') for image_id in ids])
+    if request.if_none_match.contains(key):
+        response = make_response('', 304)
+    else:
+        width, height = thumb_size(THUMB_WIDTHS[0])
+        rows = (len(ids) + SPRITE_COLUMNS - 1) // SPRITE_COLUMNS
+        sheet = Image.new('RGB', (min(len(ids), SPRITE_COLUMNS) * width, rows * height), 'lightgray')
+        found = thumbnails(list(digests), THUMB_WIDTHS[0])
+        for i, image_id in enumerate(ids):
+            if image_id in found:
+                sheet.paste(Image.open(io.BytesIO(found[image_id])), (i % SPRITE_COLUMNS * width, i // SPRITE_COLUMNS * height))
+        response = send_file(io.BytesIO(encode_jpeg(sheet)), mimetype='image/jpeg')
+    response.set_etag(key)
+    # العنوان الذي أنشأته الصفحة يحمل المفتاح نفسه، فلا يتغير محتواه
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE if request.args.get('v') == key else 'private, no-cache'
+    return response
 
 @app.route('/booking/add', methods=['GET', 'POST'])
 @login_required
 def add_booking():
-    dresses = Dress.query.filter_by(is_available=True).order_by(Dress.dress_number).all()
+    dresses = Dress.query.options(load_only(Dress.dress_number, Dress.model_name, Dress.rental_price)) \
+        .filter_by(is_available=True).order_by(Dress.dress_number).all()
     
     if request.method == 'POST':
         try:
-            dress_id = int(request.form.get('dress_id', 0))
-            dress = Dress.query.get(dress_id)
-            
-            if not dress:
-                flash('الفستان المحدد غير موجود!', 'danger')
-                return redirect(url_for('add_booking'))
-            
-            booking_date_str = request.form.get('booking_date')
-            return_date_str = request.form.get('return_date')
-            
-            try:
-                booking_date = datetime.strptime(booking_date_str, '%Y-%m-%d').date()
-                return_date = datetime.strptime(return_date_str, '%Y-%m-%d').date() if return_date_str else None
-            except ValueError:
-                flash('خطأ في تنسيق التاريخ!', 'danger')
-                return redirect(url_for('add_booking'))
-            
-            # التحقق من توفر الفستان في التاريخ المطلوب
-            conflict = Booking.query.filter(
-                Booking.dress_id == dress_id,
-                Booking.status == 'active',
-                ((Booking.booking_date <= booking_date) & (Booking.return_date >= booking_date)) |
-                ((Booking.booking_date <= return_date) & (Booking.return_date >= return_date))
-            ).first()
-            
-            if conflict:
-                flash('هذا الفستان محجوز بالفعل في الفترة المطلوبة!', 'danger')
-                return redirect(url_for('add_booking'))
-            
-            total_price = float(request.form.get('total_price', 0) or 0)
-            deposit_paid = float(request.form.get('deposit_paid', 0) or 0)
-            remaining_balance = total_price - deposit_paid
-            
-            booking = Booking(
-                customer_name=request.form.get('customer_name', '').strip(),
-                customer_phone=request.form.get('customer_phone', '').strip(),
-                customer_email=request.form.get('customer_email', '').strip(),
-                booking_date=booking_date,
-                return_date=return_date,
-                total_price=total_price,
-                deposit_paid=deposit_paid,
-                remaining_balance=remaining_balance,
-                notes=request.form.get('notes', '').strip(),
-                dress_id=dress_id,
-                status='active'
-            )
-            
-            # تحديث حالة الفستان
-            dress.is_available = False
-            dress.booking_count += 1
-            dress.last_booking_date = booking_date
-            
-            db.session.add(booking)
-            db.session.commit()
-            
-            log_action('ADD_BOOKING', f'حجز جديد: فستان {dress.dress_number} - العميل {booking.customer_name}')
+            create_booking(request.form)
             flash('تم إضافة الحجز بنجاح!', 'success')
             return redirect(url_for('bookings_list'))
             
+        except BookingError as e:
+            db.session.rollback()
+            flash(e.message, 'danger')
+            # عند التعارض تُعرض الاقتراحات مع بيانات النموذج دون إعادة توجيه
+            if 'suggestions' in e.details:
+                return render_template('add_booking.html', dresses=dresses,
+                                       suggestions=e.details['suggestions'])
+            return redirect(url_for('add_booking'))
         except Exception as e:
             db.session.rollback()
             flash(f'خطأ في إضافة الحجز: {str(e)}', 'danger')
@@ -451,6 +1978,7 @@ def add_booking():
 
 @app.route('/bookings')
 @login_required
+@conditional_page('booking', 'dress')
 def bookings_list():
     status = request.args.get('status', 'active')
     search = request.args.get('search', '')
@@ -460,50 +1988,59 @@ def bookings_list():
     if status != 'all':
         query = query.filter_by(status=status)
     
-    if search:
+    # رقم هاتف كامل يُبحث عنه بفهرس العملاء، وغيره بالبحث النصي
+    customer = find_customer(search) if search else None
+    if customer:
+        query = query.filter(Booking.customer_id == customer.id)
+    elif search:
         query = query.filter(
             (Booking.customer_name.contains(search)) |
             (Booking.customer_phone.contains(search)) |
             (Booking.customer_email.contains(search))
         )
     
-    bookings = query.order_by(Booking.booking_date.desc()).all()
+    # رقم الفستان يُقرأ في نفس الاستعلام، والصفوف تُقرأ على دفعات أثناء العرض
+    bookings = query.options(joinedload(Booking.dress).load_only(Dress.dress_number)) \
+        .order_by(Booking.booking_date.desc()).yield_per(STREAM_BATCH_SIZE)
     
-    return render_template('bookings.html',
-                         bookings=bookings,
-                         current_status=status,
-                         search_query=search)
+    return stream_page('bookings.html',
+                       bookings=bookings,
+                       current_status=status,
+                       search_query=search)
 
 @app.route('/bookings/<int:booking_id>/return', methods=['POST'])
 @login_required
 def return_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
     
-    if booking.status != 'active':
-        flash('هذا الحجز ليس نشطاً!', 'danger')
-        return redirect(url_for('bookings_list'))
-    
     try:
-        # تحديث حالة الحجز
-        booking.status = 'returned'
-        booking.return_date = datetime.now().date()
-        
-        # تحديث حالة الفستان
-        dress = Dress.query.get(booking.dress_id)
-        if dress:
-            dress.is_available = True
-        
-        db.session.commit()
-        
-        log_action('RETURN_BOOKING', f'إرجاع فستان: {dress.dress_number if dress else "غير معروف"} - العميل {booking.customer_name}')
+        mark_returned(booking)
         flash('تم تسجيل إرجاع الفستان بنجاح!', 'success')
         
+    except BookingError as e:
+        flash(e.message, 'danger')
     except Exception as e:
         db.session.rollback()
         flash(f'خطأ في تسجيل الإرجاع: {str(e)}', 'danger')
     
     return redirect(url_for('bookings_list'))
 
+@app.route('/bookings/bulk', methods=['POST'])
+@login_required
+def bulk_bookings():
+    try:
+        result = bulk_update_bookings(request.form.get('action'), request.form.getlist('booking_ids'),
+                                      request.form.get('days'))
+    except BookingError as e:
+        db.session.rollback()
+        flash(e.message, 'danger')
+        return redirect(url_for('bookings_list'))
+    
+    skipped = len(result['results']) - result['updated']
+    flash(f'تم تحديث {result["updated"]} حجز' + (f'، وتم تخطي {skipped} (غير نشط أو متعارض)' if skipped else ''),
+          'success' if result['updated'] else 'danger')
+    return redirect(url_for('bookings_list'))
+
 @app.route('/availability', methods=['GET', 'POST'])
 @login_required
 def check_availability():
@@ -514,1010 +2051,1144 @@ def check_availability():
     if request.method == 'POST':
         date_str = request.form.get('check_date')
         category = request.form.get('category', 'all')
+        fabrics = request.form.getlist('fabric')
+        colors = request.form.getlist('color')
         
         if date_str:
             try:
-                check_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+                check_date = parse_date(date_str)
                 
                 # البحث عن الفساتين المتاحة في هذا التاريخ
-                query = Dress.query.filter_by(is_available=True)
-                
-                if category != 'all':
-                    query = query.filter_by(category=category)
-                
-                all_dresses = query.all()
-                
-                for dress in all_dresses:
-                    # التحقق من عدم وجود حجز نشط في هذا التاريخ
-                    conflict = Booking.query.filter(
-                        Booking.dress_id == dress.id,
-                        Booking.status == 'active',
-                        (Booking.booking_date <= check_date) &
-                        ((Booking.return_date >= check_date) | (Booking.return_date == None))
-                    ).first()
-                    
-                    if not conflict:
-                        available_dresses.append(dress)
+                available_dresses = available_dresses_query(check_date, category, fabrics, colors) \
+                    .options(defer(Dress.image_data), defer(Dress.details)).all()
                 
                 is_available = True if available_dresses else False
                 
             except ValueError:
                 flash('خطأ في تنسيق التاريخ!', 'danger')
     
-    categories = db.session.query(Dress.category).distinct().all()
-    
+    facets = catalog_facets()
     return render_template('availability.html',
                          is_available=is_available,
                          available_dresses=available_dresses,
-                         categories=categories)
+                         categories=facets['category'],
+                         fabrics=facets['fabric'],
+                         colors=facets['color'])
 
 @app.route('/reports')
 @login_required
+@conditional_page('booking', 'dress', daily=True)
 def reports():
     # إحصائيات الشهر الحالي
     today = datetime.now().date()
     first_day_of_month = today.replace(day=1)
     last_day_of_month = (first_day_of_month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
     
+    # الإحصائيات تشمل الحجوزات المؤرشفة
+    history = booking_history()
+    
     # عدد الحجوزات هذا الشهر
-    monthly_bookings = Booking.query.filter(
-        Booking.created_date >= first_day_of_month,
-        Booking.created_date <= last_day_of_month
-    ).count()
+    monthly_bookings = db.session.query(db.func.count()).select_from(history).filter(
+        history.c.created_date >= first_day_of_month,
+        history.c.created_date <= last_day_of_month
+    ).scalar()
     
     # إجمالي الإيرادات هذا الشهر
-    monthly_revenue = db.session.query(db.func.sum(Booking.deposit_paid)).filter(
-        Booking.created_date >= first_day_of_month,
-        Booking.created_date <= last_day_of_month
+    monthly_revenue = db.session.query(db.func.sum(history.c.deposit_paid)).filter(
+        history.c.created_date >= first_day_of_month,
+        history.c.created_date <= last_day_of_month
     ).scalar() or 0
     
     # الفساتين الأكثر طلباً
     popular_dresses = db.session.query(
         Dress.dress_number,
         Dress.model_name,
-        db.func.count(Booking.id).label('booking_count')
-    ).join(Booking).group_by(Dress.id).order_by(db.desc('booking_count')).limit(5).all()
+        db.func.count(history.c.id).label('booking_count')
+    ).join(history, history.c.dress_id == Dress.id).group_by(Dress.id) \
+        .order_by(db.desc('booking_count')).limit(5).all()
     
     return render_template('reports.html',
                          monthly_bookings=monthly_bookings,
                          monthly_revenue=monthly_revenue,
                          popular_dresses=popular_dresses)
 
-# ====================================================================
-# V. تعريف القوالب HTML
-# ====================================================================
+HISTORY_PAGE_SIZE = 100
 
-# القالب الأساسي
-BASE_TEMPLATE = """<!DOCTYPE html>
-<html lang="ar" dir="rtl">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>THE Bride - نظام إدارة الفساتين</title>
-    <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; font-family: Tahoma, Arial, sans-serif; }
-        body { background: #f5f5f5; color: #333; }
-        
-        /* الشريط الجانبي */
-        .sidebar {
-            width: 250px;
-            background: #8B4513;
-            color: white;
-            height: 100vh;
-            position: fixed;
-            right: 0;
-            top: 0;
-            padding: 20px;
-            box-shadow: 2px 0 10px rgba(0,0,0,0.1);
-        }
-        .sidebar h2 { color: #FFD700; margin-bottom: 20px; text-align: center; }
-        .sidebar a {
-            color: white;
-            text-decoration: none;
-            display: block;
-            padding: 12px 15px;
-            margin: 5px 0;
-            border-radius: 5px;
-            transition: 0.3s;
-        }
-        .sidebar a:hover { background: #A0522D; }
-        .sidebar a.active { background: #A0522D; border-right: 4px solid #FFD700; }
-        
-        /* المحتوى الرئيسي */
-        .main-content { margin-right: 270px; padding: 20px; }
-        .header {
-            background: white;
-            padding: 20px;
-            border-radius: 10px;
-            margin-bottom: 20px;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-        .header h1 { color: #8B4513; }
-        .logout-btn { background: #dc3545; color: white; padding: 8px 15px; border-radius: 5px; text-decoration: none; }
-        .logout-btn:hover { background: #c82333; }
-        
-        /* البطاقات */
-        .cards { display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; margin-bottom: 30px; }
-        .card { background: white; padding: 20px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
-        .card h3 { color: #8B4513; margin-bottom: 10px; }
-        .card .number { font-size: 32px; font-weight: bold; color: #8B4513; }
-        
-        /* الجداول */
-        table { width: 100%; border-collapse: collapse; background: white; border-radius: 10px; overflow: hidden; }
-        th { background: #8B4513; color: white; padding: 15px; text-align: right; }
-        td { padding: 12px 15px; border-bottom: 1px solid #eee; }
-        tr:hover { background: #f9f9f9; }
-        
-        /* النماذج */
-        .form-container { background: white; padding: 30px; border-radius: 10px; max-width: 800px; margin: 0 auto; }
-        .form-group { margin-bottom: 20px; }
-        label { display: block; margin-bottom: 8px; color: #555; font-weight: bold; }
-        input, select, textarea {
-            width: 100%;
-            padding: 12px;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-            font-size: 16px;
-        }
-        input:focus, select:focus, textarea:focus { border-color: #8B4513; outline: none; }
-        
-        /* الأزرار */
-        .btn { display: inline-block; padding: 12px 25px; border: none; border-radius: 5px; cursor: pointer; font-size: 16px; text-decoration: none; }
-        .btn-primary { background: #8B4513; color: white; }
-        .btn-primary:hover { background: #654321; }
-        .btn-success { background: #28a745; color: white; }
-        .btn-danger { background: #dc3545; color: white; }
-        
-        /* التنبيهات */
-        .alert { padding: 15px; border-radius: 5px; margin-bottom: 20px; }
-        .alert-success { background: #d4edda; color: #155724; border: 1px solid #c3e6cb; }
-        .alert-danger { background: #f8d7da; color: #721c24; border: 1px solid #f5c6cb; }
-        
-        /* متجاوب */
-        @media (max-width: 768px) {
-            .sidebar { width: 100%; height: auto; position: relative; }
-            .main-content { margin-right: 0; }
-        }
-    </style>
-</head>
-<body>
-    <div class="sidebar">
-        <h2>👰 THE Bride</h2>
-        <a href="{{ url_for('dashboard') }}" class="{{ 'active' if request.endpoint == 'dashboard' else '' }}">📊 لوحة التحكم</a>
-        <a href="{{ url_for('dresses_list') }}" class="{{ 'active' if request.endpoint == 'dresses_list' else '' }}">👗 الفساتين</a>
-        <a href="{{ url_for('add_dress') }}" class="{{ 'active' if request.endpoint == 'add_dress' else '' }}">➕ إضافة فستان</a>
-        <a href="{{ url_for('bookings_list') }}" class="{{ 'active' if request.endpoint in ['bookings_list', 'add_booking'] else '' }}">📅 الحجوزات</a>
-        <a href="{{ url_for('check_availability') }}" class="{{ 'active' if request.endpoint == 'check_availability' else '' }}">🔍 التحقق من الإتاحة</a>
-        <a href="{{ url_for('reports') }}" class="{{ 'active' if request.endpoint == 'reports' else '' }}">📈 التقارير</a>
-    </div>
-    
-    <div class="main-content">
-        <div class="header">
-            <h1>{% block title %}THE Bride{% endblock %}</h1>
-            <div>
-                <span>مرحباً بك!</span>
-                <a href="{{ url_for('logout') }}" class="logout-btn">تسجيل الخروج</a>
-            </div>
-        </div>
-        
-        {% with messages = get_flashed_messages(with_categories=true) %}
-            {% if messages %}
-                {% for category, message in messages %}
-                    <div class="alert alert-{{ category }}">{{ message }}</div>
-                {% endfor %}
-            {% endif %}
-        {% endwith %}
-        
-        {% block content %}{% endblock %}
-    </div>
-</body>
-</html>
-"""
-
-# قالب تسجيل الدخول
-LOGIN_TEMPLATE = """<!DOCTYPE html>
-<html lang="ar" dir="rtl">
-<head>
-    <meta charset="UTF-8">
-    <title>تسجيل الدخول - THE Bride</title>
-    <style>
-        body { 
-            background: linear-gradient(135deg, #8B4513 0%, #D2691E 100%);
-            height: 100vh;
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            font-family: Tahoma, Arial, sans-serif;
-        }
-        .login-box {
-            background: white;
-            padding: 40px;
-            border-radius: 10px;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.3);
-            width: 100%;
-            max-width: 400px;
-            text-align: center;
-        }
-        .login-box h1 { color: #8B4513; margin-bottom: 30px; }
-        .form-group { margin-bottom: 20px; text-align: right; }
-        label { display: block; margin-bottom: 8px; color: #555; }
-        input {
-            width: 100%;
-            padding: 12px;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-            font-size: 16px;
-        }
-        button {
-            width: 100%;
-            padding: 14px;
-            background: #8B4513;
-            color: white;
-            border: none;
-            border-radius: 5px;
-            font-size: 18px;
-            cursor: pointer;
-            margin-top: 20px;
-        }
-        button:hover { background: #654321; }
-        .login-info {
-            margin-top: 20px;
-            padding: 15px;
-            background: #f8f9fa;
-            border-radius: 5px;
-            text-align: right;
-            font-size: 14px;
-        }
-        .login-info strong { color: #8B4513; }
-    </style>
-</head>
-<body>
-    <div class="login-box">
-        <h1>👰 THE Bride</h1>
-        
-        {% with messages = get_flashed_messages(with_categories=true) %}
-            {% if messages %}
-                {% for category, message in messages %}
-                    <div style="padding: 10px; background: {% if category == 'danger' %}#f8d7da{% else %}#d4edda{% endif %}; 
-                                color: {% if category == 'danger' %}#721c24{% else %}#155724{% endif %};
-                                border-radius: 5px; margin-bottom: 20px;">
-                        {{ message }}
-                    </div>
-                {% endfor %}
-            {% endif %}
-        {% endwith %}
-        
-        <form method="POST">
-            <div class="form-group">
-                <label>البريد الإلكتروني:</label>
-                <input type="email" name="email" required autofocus>
-            </div>
-            <div class="form-group">
-                <label>كلمة المرور:</label>
-                <input type="password" name="password" required>
-            </div>
-            <button type="submit">تسجيل الدخول</button>
-        </form>
-        
-        <div class="login-info">
-            <p><strong>بيانات الدخول:</strong></p>
-            <p>البريد: 7oda10035@gmail.com</p>
-            <p>كلمة المرور: Ma7moowd10035</p>
-        </div>
-    </div>
-</body>
-</html>
-"""
-
-# قالب لوحة التحكم
-DASHBOARD_TEMPLATE = """{% extends "base.html" %}
-
-{% block title %}لوحة التحكم{% endblock %}
-
-{% block content %}
-<h1 style="color: #8B4513; margin-bottom: 30px;">📊 لوحة التحكم</h1>
-
-<div class="cards">
-    <div class="card">
-        <h3>إجمالي الفساتين</h3>
-        <div class="number">{{ total_dresses }}</div>
-    </div>
-    <div class="card">
-        <h3>الفساتين المتاحة</h3>
-        <div class="number">{{ available_dresses }}</div>
-    </div>
-    <div class="card">
-        <h3>الحجوزات النشطة</h3>
-        <div class="number">{{ active_bookings }}</div>
-    </div>
-</div>
-
-<div style="display: grid; grid-template-columns: 1fr 1fr; gap: 20px; margin-top: 30px;">
-    <div>
-        <h2 style="color: #8B4513; margin-bottom: 15px;">📅 الحجوزات القادمة</h2>
-        <div style="background: white; padding: 20px; border-radius: 10px;">
-            {% if upcoming_bookings %}
-                {% for booking in upcoming_bookings %}
-                <div style="padding: 10px; border-bottom: 1px solid #eee;">
-                    <strong>{{ booking.customer_name }}</strong><br>
-                    فستان: {{ booking.dress.dress_number }}<br>
-                    التاريخ: {{ booking.booking_date.strftime('%Y-%m-%d') }}
-                </div>
-                {% endfor %}
-            {% else %}
-                <p style="text-align: center; color: #666;">لا توجد حجوزات قادمة</p>
-            {% endif %}
-        </div>
-    </div>
-    
-    <div>
-        <h2 style="color: #8B4513; margin-bottom: 15px;">📋 الفساتين التي يجب إرجاعها اليوم</h2>
-        <div style="background: white; padding: 20px; border-radius: 10px;">
-            {% if due_today %}
-                {% for booking in due_today %}
-                <div style="padding: 10px; border-bottom: 1px solid #eee;">
-                    <strong>{{ booking.customer_name }}</strong><br>
-                    فستان: {{ booking.dress.dress_number }}<br>
-                    هاتف: {{ booking.customer_phone }}
-                </div>
-                {% endfor %}
-            {% else %}
-                <p style="text-align: center; color: #666;">لا توجد فساتين مستحقة اليوم</p>
-            {% endif %}
-        </div>
-    </div>
-</div>
-
-<div style="margin-top: 30px; text-align: center;">
-    <a href="{{ url_for('add_booking') }}" class="btn btn-primary" style="margin: 5px;">➕ إضافة حجز جديد</a>
-    <a href="{{ url_for('add_dress') }}" class="btn btn-success" style="margin: 5px;">👗 إضافة فستان جديد</a>
-    <a href="{{ url_for('check_availability') }}" class="btn btn-primary" style="margin: 5px;">🔍 التحقق من الإتاحة</a>
-</div>
-{% endblock %}
-"""
-
-# قالب عرض الفساتين
-DRESSES_TEMPLATE = """{% extends "base.html" %}
-
-{% block title %}الفساتين{% endblock %}
-
-{% block content %}
-<h1 style="color: #8B4513; margin-bottom: 20px;">👗 إدارة الفساتين</h1>
-
-<div style="margin-bottom: 20px; display: flex; gap: 10px;">
-    <input type="text" id="search" placeholder="بحث..." value="{{ search_query }}" 
-           style="flex: 1; padding: 10px; border: 1px solid #ddd; border-radius: 5px;">
-    <select id="category" style="padding: 10px; border: 1px solid #ddd; border-radius: 5px;">
-        <option value="all">جميع التصنيفات</option>
-        {% for cat in categories %}
-        <option value="{{ cat[0] }}" {% if current_category == cat[0] %}selected{% endif %}>{{ cat[0] }}</option>
-        {% endfor %}
-    </select>
-    <a href="{{ url_for('add_dress') }}" class="btn btn-primary">➕ إضافة فستان</a>
-</div>
-
-<div style="background: white; border-radius: 10px; overflow: hidden;">
-    <table>
-        <thead>
-            <tr>
-                <th>رقم الفستان</th>
-                <th>النموذج</th>
-                <th>التصنيف</th>
-                <th>اللون</th>
-                <th>السعر</th>
-                <th>الحالة</th>
-                <th>الإجراءات</th>
-            </tr>
-        </thead>
-        <tbody>
-            {% for dress in dresses %}
-            <tr>
-                <td><strong>{{ dress.dress_number }}</strong></td>
-                <td>{{ dress.model_name }}</td>
-                <td>{{ dress.category }}</td>
-                <td>{{ dress.color }}</td>
-                <td>{{ "%.2f"|format(dress.rental_price) }} ريال</td>
-                <td>
-                    <span style="padding: 5px 10px; border-radius: 15px; 
-                                 background: {% if dress.is_available %}#d4edda{% else %}#f8d7da{% endif %};
-                                 color: {% if dress.is_available %}#155724{% else %}#721c24{% endif %};">
-                        {{ "متاح" if dress.is_available else "محجوز" }}
-                    </span>
-                </td>
-                <td>
-                    <a href="{{ url_for('edit_dress', dress_id=dress.id) }}" class="btn" 
-                       style="background: #ffc107; color: #212529; padding: 5px 10px;">تعديل</a>
-                    {% if dress.is_available %}
-                    <form action="{{ url_for('delete_dress', dress_id=dress.id) }}" method="POST" 
-                          style="display: inline;" onsubmit="return confirm('هل أنت متأكد؟');">
-                        <button type="submit" class="btn btn-danger" style="padding: 5px 10px;">حذف</button>
-                    </form>
-                    {% endif %}
-                    <a href="{{ url_for('add_booking') }}?dress_id={{ dress.id }}" 
-                       class="btn btn-success" style="padding: 5px 10px;">حجز</a>
-                </td>
-            </tr>
-            {% else %}
-            <tr>
-                <td colspan="7" style="text-align: center; padding: 40px;">لا توجد فساتين</td>
-            </tr>
-            {% endfor %}
-        </tbody>
-    </table>
-</div>
-
-<script>
-document.getElementById('search').addEventListener('keyup', function(e) {
-    if (e.key === 'Enter') {
-        window.location.href = `?search=${this.value}&category=${document.getElementById('category').value}`;
-    }
-});
-document.getElementById('category').addEventListener('change', function() {
-    window.location.href = `?search=${document.getElementById('search').value}&category=${this.value}`;
-});
-</script>
-{% endblock %}
-"""
-
-# قالب إضافة فستان
-ADD_DRESS_TEMPLATE = """{% extends "base.html" %}
-
-{% block title %}إضافة فستان جديد{% endblock %}
-
-{% block content %}
-<h1 style="color: #8B4513; margin-bottom: 30px;">👗 إضافة فستان جديد</h1>
-
-<div class="form-container">
-    <form method="POST" enctype="multipart/form-data">
-        <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 20px;">
-            <div class="form-group">
-                <label>رقم الفستان *</label>
-                <input type="text" name="dress_number" required placeholder="مثال: 1001A">
-            </div>
-            
-            <div class="form-group">
-                <label>اسم النموذج</label>
-                <input type="text" name="model_name" placeholder="مثال: The Royal Princess">
-            </div>
-            
-            <div class="form-group">
-                <label>التصنيف</label>
-                <select name="category">
-                    <option value="فستان زفاف">فستان زفاف</option>
-                    <option value="سواريه">سواريه</option>
-                    <option value="فستان سهرة">فستان سهرة</option>
-                    <option value="فستان خطوبة">فستان خطوبة</option>
-                    <option value="أخرى">أخرى</option>
-                </select>
-            </div>
-            
-            <div class="form-group">
-                <label>اللون</label>
-                <input type="text" name="color" placeholder="مثال: أبيض عاجي">
-            </div>
-            
-            <div class="form-group">
-                <label>أنواع الأقمشة</label>
-                <input type="text" name="fabric_types" placeholder="مثال: ساتان, شيفون, دانتيل">
-            </div>
-            
-            <div class="form-group">
-                <label>السعر (ريال)</label>
-                <input type="number" name="rental_price" step="0.01" value="0">
-            </div>
-            
-            <div class="form-group">
-                <label>المقاس</label>
-                <select name="size">
-                    <option value="XS">XS</option>
-                    <option value="S">S</option>
-                    <option value="M" selected>M</option>
-                    <option value="L">L</option>
-                    <option value="XL">XL</option>
-                    <option value="XXL">XXL</option>
-                </select>
-            </div>
-        </div>
-        
-        <div class="form-group">
-            <label>تفاصيل إضافية</label>
-            <textarea name="details" rows="3" placeholder="أي تفاصيل إضافية عن الفستان..."></textarea>
-        </div>
-        
-        <div class="form-group">
-            <label>صورة الفستان (اختياري)</label>
-            <input type="file" name="image" accept="image/*">
-            <small style="color: #666;">يمكن رفع صور PNG, JPG, JPEG, GIF (حتى 16MB)</small>
-        </div>
-        
-        <div class="form-group">
-            <label style="display: inline-block; margin-right: 10px;">
-                <input type="checkbox" name="is_available" checked> متاح للحجز
-            </label>
-        </div>
-        
-        <div style="text-align: center; margin-top: 30px;">
-            <button type="submit" class="btn btn-primary" style="padding: 12px 30px;">💾 حفظ الفستان</button>
-            <a href="{{ url_for('dresses_list') }}" class="btn" 
-               style="background: #6c757d; color: white; padding: 12px 30px; margin-right: 10px;">إلغاء</a>
-        </div>
-    </form>
-</div>
-{% endblock %}
-"""
-
-# قالب تعديل فستان
-EDIT_DRESS_TEMPLATE = """{% extends "base.html" %}
-
-{% block title %}تعديل فستان{% endblock %}
-
-{% block content %}
-<h1 style="color: #8B4513; margin-bottom: 30px;">✏️ تعديل فستان: {{ dress.dress_number }}</h1>
-
-<div class="form-container">
-    <form method="POST" enctype="multipart/form-data">
-        {% if dress.image_data %}
-        <div style="text-align: center; margin-bottom: 20px;">
-            <img src="{{ url_for('dress_image', dress_id=dress.id) }}" 
-                 style="max-width: 300px; max-height: 400px; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1);">
-            <br>
-            <label style="margin-top: 10px; display: inline-block;">
-                <input type="checkbox" name="remove_image" value="1"> إزالة الصورة
-            </label>
-        </div>
-        {% endif %}
-        
-        <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 20px;">
-            <div class="form-group">
-                <label>رقم الفستان</label>
-                <input type="text" value="{{ dress.dress_number }}" readonly style="background: #f8f9fa;">
-                <small style="color: #666;">لا يمكن تغيير رقم الفستان</small>
-            </div>
-            
-            <div class="form-group">
-                <label>اسم النموذج</label>
-                <input type="text" name="model_name" value="{{ dress.model_name or '' }}">
-            </div>
-            
-            <div class="form-group">
-                <label>التصنيف</label>
-                <select name="category">
-                    <option value="فستان زفاف" {% if dress.category == 'فستان زفاف' %}selected{% endif %}>فستان زفاف</option>
-                    <option value="سواريه" {% if dress.category == 'سواريه' %}selected{% endif %}>سواريه</option>
-                    <option value="فستان سهرة" {% if dress.category == 'فستان سهرة' %}selected{% endif %}>فستان سهرة</option>
-                    <option value="فستان خطوبة" {% if dress.category == 'فستان خطوبة' %}selected{% endif %}>فستان خطوبة</option>
-                    <option value="أخرى" {% if dress.category == 'أخرى' %}selected{% endif %}>أخرى</option>
-                </select>
-            </div>
-            
-            <div class="form-group">
-                <label>اللون</label>
-                <input type="text" name="color" value="{{ dress.color or '' }}">
-            </div>
-            
-            <div class="form-group">
-                <label>أنواع الأقمشة</label>
-                <input type="text" name="fabric_types" value="{{ dress.fabric_types or '' }}">
-            </div>
-            
-            <div class="form-group">
-                <label>السعر (ريال)</label>
-                <input type="number" name="rental_price" step="0.01" value="{{ dress.rental_price or 0 }}">
-            </div>
-            
-            <div class="form-group">
-                <label>المقاس</label>
-                <select name="size">
-                    {% for size in ['XS', 'S', 'M', 'L', 'XL', 'XXL'] %}
-                    <option value="{{ size }}" {% if dress.size == size %}selected{% endif %}>{{ size }}</option>
-                    {% endfor %}
-                </select>
-            </div>
-        </div>
-        
-        <div class="form-group">
-            <label>تفاصيل إضافية</label>
-            <textarea name="details" rows="3">{{ dress.details or '' }}</textarea>
-        </div>
-        
-        <div class="form-group">
-            <label>صورة جديدة (اختياري)</label>
-            <input type="file" name="image" accept="image/*">
-            <small style="color: #666;">يمكن رفع صور PNG, JPG, JPEG, GIF</small>
-        </div>
-        
-        <div class="form-group">
-            <label style="display: inline-block; margin-right: 10px;">
-                <input type="checkbox" name="is_available" {% if dress.is_available %}checked{% endif %}> متاح للحجز
-            </label>
-        </div>
-        
-        <div style="text-align: center; margin-top: 30px;">
-            <button type="submit" class="btn btn-primary" style="padding: 12px 30px;">💾 حفظ التعديلات</button>
-            <a href="{{ url_for('dresses_list') }}" class="btn" 
-               style="background: #6c757d; color: white; padding: 12px 30px; margin-right: 10px;">إلغاء</a>
-        </div>
-    </form>
-</div>
-{% endblock %}
-"""
-
-# قالب إضافة حجز
-ADD_BOOKING_TEMPLATE = """{% extends "base.html" %}
-
-{% block title %}إضافة حجز جديد{% endblock %}
-
-{% block content %}
-<h1 style="color: #8B4513; margin-bottom: 30px;">📝 إضافة حجز جديد</h1>
-
-<div class="form-container">
-    <form method="POST">
-        <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 20px;">
-            <div class="form-group">
-                <label>اختر الفستان *</label>
-                <select name="dress_id" required>
-                    <option value="">-- اختر فستان --</option>
-                    {% for dress in dresses %}
-                    <option value="{{ dress.id }}" {% if request.args.get('dress_id')|int == dress.id %}selected{% endif %}>
-                        {{ dress.dress_number }} - {{ dress.model_name }} ({{ dress.rental_price }} ريال)
-                    </option>
-                    {% endfor %}
-                </select>
-            </div>
-            
-            <div class="form-group">
-                <label>اسم العميل *</label>
-                <input type="text" name="customer_name" required>
-            </div>
-            
-            <div class="form-group">
-                <label>رقم الهاتف</label>
-                <input type="text" name="customer_phone">
-            </div>
-            
-            <div class="form-group">
-                <label>البريد الإلكتروني</label>
-                <input type="email" name="customer_email">
-            </div>
-            
-            <div class="form-group">
-                <label>تاريخ الحجز *</label>
-                <input type="date" name="booking_date" required value="{{ now.strftime('%Y-%m-%d') }}">
-            </div>
-            
-            <div class="form-group">
-                <label>تاريخ الإرجاع</label>
-                <input type="date" name="return_date">
-            </div>
-            
-            <div class="form-group">
-                <label>السعر الإجمالي (ريال)</label>
-                <input type="number" name="total_price" step="0.01" value="0">
-            </div>
-            
-            <div class="form-group">
-                <label>المبلغ المدفوع (ريال)</label>
-                <input type="number" name="deposit_paid" step="0.01" value="0">
-            </div>
-        </div>
-        
-        <div class="form-group">
-            <label>ملاحظات</label>
-            <textarea name="notes" rows="3" placeholder="أي ملاحظات حول الحجز..."></textarea>
-        </div>
-        
-        <div style="text-align: center; margin-top: 30px;">
-            <button type="submit" class="btn btn-primary" style="padding: 12px 30px;">💾 حفظ الحجز</button>
-            <a href="{{ url_for('bookings_list') }}" class="btn" 
-               style="background: #6c757d; color: white; padding: 12px 30px; margin-right: 10px;">إلغاء</a>
-        </div>
-    </form>
-</div>
-
-<script>
-// تعيين الحد الأدنى للتاريخ هو اليوم
-const today = new Date().toISOString().split('T')[0];
-document.querySelector('input[name="booking_date"]').min = today;
-document.querySelector('input[name="return_date"]').min = today;
-</script>
-{% endblock %}
-"""
-
-# قالب عرض الحجوزات
-BOOKINGS_TEMPLATE = """{% extends "base.html" %}
-
-{% block title %}الحجوزات{% endblock %}
-
-{% block content %}
-<h1 style="color: #8B4513; margin-bottom: 20px;">📅 إدارة الحجوزات</h1>
-
-<div style="margin-bottom: 20px; display: flex; gap: 10px;">
-    <input type="text" id="search" placeholder="بحث باسم العميل أو الهاتف..." value="{{ search_query }}"
-           style="flex: 1; padding: 10px; border: 1px solid #ddd; border-radius: 5px;">
-    <select id="status" style="padding: 10px; border: 1px solid #ddd; border-radius: 5px;">
-        <option value="all" {% if current_status == 'all' %}selected{% endif %}>جميع الحالات</option>
-        <option value="active" {% if current_status == 'active' %}selected{% endif %}>نشطة</option>
-        <option value="returned" {% if current_status == 'returned' %}selected{% endif %}>تم الإرجاع</option>
-    </select>
-    <a href="{{ url_for('add_booking') }}" class="btn btn-primary">➕ إضافة حجز</a>
-</div>
-
-<div style="background: white; border-radius: 10px; overflow: hidden;">
-    <table>
-        <thead>
-            <tr>
-                <th>العميل</th>
-                <th>الفستان</th>
-                <th>تاريخ الحجز</th>
-                <th>تاريخ الإرجاع</th>
-                <th>المبلغ المدفوع</th>
-                <th>الحالة</th>
-                <th>الإجراءات</th>
-            </tr>
-        </thead>
-        <tbody>
-            {% for booking in bookings %}
-            <tr>
-                <td>
-                    <strong>{{ booking.customer_name }}</strong><br>
-                    <small>{{ booking.customer_phone }}</small>
-                </td>
-                <td>{{ booking.dress.dress_number }}</td>
-                <td>{{ booking.booking_date.strftime('%Y-%m-%d') }}</td>
-                <td>{{ booking.return_date.strftime('%Y-%m-%d') if booking.return_date else '-' }}</td>
-                <td>{{ "%.2f"|format(booking.deposit_paid) }} ريال</td>
-                <td>
-                    <span style="padding: 5px 10px; border-radius: 15px; 
-                                 background: {% if booking.status == 'active' %}#d4edda{% else %}#d1ecf1{% endif %};
-                                 color: {% if booking.status == 'active' %}#155724{% else %}#0c5460{% endif %};">
-                        {{ "نشط" if booking.status == 'active' else "تم الإرجاع" }}
-                    </span>
-                </td>
-                <td>
-                    {% if booking.status == 'active' %}
-                    <form action="{{ url_for('return_booking', booking_id=booking.id) }}" method="POST" 
-                          style="display: inline;" onsubmit="return confirm('هل تريد تسجيل إرجاع هذا الفستان؟');">
-                        <button type="submit" class="btn btn-success" style="padding: 5px 10px;">إرجاع</button>
-                    </form>
-                    {% endif %}
-                </td>
-            </tr>
-            {% else %}
-            <tr>
-                <td colspan="7" style="text-align: center; padding: 40px;">لا توجد حجوزات</td>
-            </tr>
-            {% endfor %}
-        </tbody>
-    </table>
-</div>
-
-<script>
-document.getElementById('search').addEventListener('keyup', function(e) {
-    if (e.key === 'Enter') {
-        window.location.href = `?search=${this.value}&status=${document.getElementById('status').value}`;
-    }
-});
-document.getElementById('status').addEventListener('change', function() {
-    window.location.href = `?search=${document.getElementById('search').value}&status=${this.value}`;
-});
-</script>
-{% endblock %}
-"""
-
-# قالب التحقق من الإتاحة
-AVAILABILITY_TEMPLATE = """{% extends "base.html" %}
-
-{% block title %}التحقق من الإتاحة{% endblock %}
-
-{% block content %}
-<h1 style="color: #8B4513; margin-bottom: 30px;">🔍 التحقق من إتاحة الفساتين</h1>
-
-<div class="form-container" style="max-width: 600px;">
-    <form method="POST">
-        <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 20px;">
-            <div class="form-group">
-                <label>التاريخ المطلوب *</label>
-                <input type="date" name="check_date" required value="{{ now.strftime('%Y-%m-%d') }}">
-            </div>
-            
-            <div class="form-group">
-                <label>التصنيف</label>
-                <select name="category">
-                    <option value="all">جميع التصنيفات</option>
-                    {% for cat in categories %}
-                    <option value="{{ cat[0] }}">{{ cat[0] }}</option>
-                    {% endfor %}
-                </select>
-            </div>
-        </div>
-        
-        <div style="text-align: center; margin-top: 20px;">
-            <button type="submit" class="btn btn-primary" style="padding: 12px 30px;">🔍 تحقق من الإتاحة</button>
-        </div>
-    </form>
-</div>
-
-{% if is_available is not none %}
-<div style="margin-top: 40px;">
-    {% if is_available %}
-    <div style="background: #d4edda; color: #155724; padding: 20px; border-radius: 10px; margin-bottom: 20px;">
-        <h2 style="color: #155724;">✅ يوجد {{ available_dresses|length }} فستان(ات) متاح(ة) في هذا التاريخ</h2>
-    </div>
-    
-    <div style="background: white; border-radius: 10px; overflow: hidden;">
-        <table>
-            <thead>
-                <tr>
-                    <th>رقم الفستان</th>
-                    <th>النموذج</th>
-                    <th>التصنيف</th>
-                    <th>اللون</th>
-                    <th>السعر</th>
-                    <th>الإجراء</th>
-                </tr>
-            </thead>
-            <tbody>
-                {% for dress in available_dresses %}
-                <tr>
-                    <td><strong>{{ dress.dress_number }}</strong></td>
-                    <td>{{ dress.model_name }}</td>
-                    <td>{{ dress.category }}</td>
-                    <td>{{ dress.color }}</td>
-                    <td>{{ "%.2f"|format(dress.rental_price) }} ريال</td>
-                    <td>
-                        <a href="{{ url_for('add_booking') }}?dress_id={{ dress.id }}" 
-                           class="btn btn-success" style="padding: 5px 10px;">حجز</a>
-                    </td>
-                </tr>
-                {% endfor %}
-            </tbody>
-        </table>
-    </div>
-    {% else %}
-    <div style="background: #f8d7da; color: #721c24; padding: 20px; border-radius: 10px; text-align: center;">
-        <h2 style="color: #721c24;">❌ لا توجد فساتين متاحة في التاريخ المحدد</h2>
-        <p style="margin-top: 10px;">يرجى اختيار تاريخ آخر أو التحقق من الفساتين في تصنيف مختلف.</p>
-    </div>
-    {% endif %}
-</div>
-{% endif %}
-
-<script>
-// تعيين الحد الأدنى للتاريخ هو اليوم
-const today = new Date().toISOString().split('T')[0];
-document.querySelector('input[name="check_date"]').min = today;
-</script>
-{% endblock %}
-"""
-
-# قالب التقارير
-REPORTS_TEMPLATE = """{% extends "base.html" %}
-
-{% block title %}التقارير{% endblock %}
-
-{% block content %}
-<h1 style="color: #8B4513; margin-bottom: 30px;">📈 التقارير والإحصائيات</h1>
-
-<div class="cards">
-    <div class="card">
-        <h3>عدد الحجوزات هذا الشهر</h3>
-        <div class="number">{{ monthly_bookings }}</div>
-    </div>
-    
-    <div class="card">
-        <h3>إجمالي الإيرادات هذا الشهر</h3>
-        <div class="number">{{ "%.2f"|format(monthly_revenue) }} ريال</div>
-    </div>
-</div>
-
-<div style="margin-top: 40px;">
-    <h2 style="color: #8B4513; margin-bottom: 20px;">🏆 الفساتين الأكثر طلباً</h2>
-    <div style="background: white; border-radius: 10px; overflow: hidden;">
-        <table>
-            <thead>
-                <tr>
-                    <th>رقم الفستان</th>
-                    <th>النموذج</th>
-                    <th>عدد مرات الحجز</th>
-                </tr>
-            </thead>
-            <tbody>
-                {% for dress in popular_dresses %}
-                <tr>
-                    <td><strong>{{ dress[0] }}</strong></td>
-                    <td>{{ dress[1] }}</td>
-                    <td>{{ dress[2] }} مرة</td>
-                </tr>
-                {% else %}
-                <tr>
-                    <td colspan="3" style="text-align: center; padding: 40px;">لا توجد بيانات</td>
-                </tr>
-                {% endfor %}
-            </tbody>
-        </table>
-    </div>
-</div>
-
-<div style="margin-top: 40px; background: white; padding: 20px; border-radius: 10px;">
-    <h2 style="color: #8B4513; margin-bottom: 20px;">📊 معلومات النظام</h2>
-    <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 20px;">
-        <div>
-            <h3 style="color: #555;">إجمالي الفساتين:</h3>
-            <p style="font-size: 24px; font-weight: bold; color: #8B4513;">{{ total_dresses }}</p>
-        </div>
-        <div>
-            <h3 style="color: #555;">إجمالي الحجوزات:</h3>
-            <p style="font-size: 24px; font-weight: bold; color: #8B4513;">{{ total_bookings }}</p>
-        </div>
-    </div>
-</div>
-{% endblock %}
-"""
+@app.route('/customers/<int:customer_id>')
+@login_required
+@conditional_page('booking', 'dress')
+def customer_history(customer_id):
+    customer = Customer.query.get_or_404(customer_id)
+    
+    # فهرس customer_id في الجدولين يحدد الحجوزات مباشرة
+    history = booking_history()
+    bookings = db.session.query(history, Dress.dress_number) \
+        .outerjoin(Dress, Dress.id == history.c.dress_id) \
+        .filter(history.c.customer_id == customer.id) \
+        .order_by(history.c.booking_date.desc(), history.c.id.desc()).all()
+    
+    return render_template('customer.html',
+                         customer=customer,
+                         bookings=bookings,
+                         total_paid=sum(booking.deposit_paid or 0 for booking in bookings),
+                         active_count=sum(1 for booking in bookings if booking.status == 'active'))
+
+@app.route('/bookings/history')
+@login_required
+@conditional_page('booking', 'dress')
+def booking_history_view():
+    search = request.args.get('search', '').strip()
+    dress_number = request.args.get('dress', '').strip().upper()
+    page = max(request.args.get('page', 1, type=int), 1)
+    
+    history = booking_history()
+    query = db.session.query(history, Dress.dress_number).outerjoin(Dress, Dress.id == history.c.dress_id)
+    customer = find_customer(search) if search else None
+    if customer:
+        query = query.filter(history.c.customer_id == customer.id)
+    elif search:
+        query = query.filter(
+            (history.c.customer_name.contains(search)) |
+            (history.c.customer_phone.contains(search)) |
+            (history.c.customer_email.contains(search))
+        )
+    if dress_number:
+        query = query.filter(Dress.dress_number == dress_number)
+    
+    rows = query.order_by(history.c.booking_date.desc(), history.c.id.desc()) \
+        .offset((page - 1) * HISTORY_PAGE_SIZE).limit(HISTORY_PAGE_SIZE + 1).all()
+    
+    return render_template('history.html',
+                         bookings=rows[:HISTORY_PAGE_SIZE],
+                         has_next=len(rows) > HISTORY_PAGE_SIZE,
+                         page=page,
+                         search_query=search,
+                         dress_query=dress_number)
 
 # ====================================================================
-# VI. إنشاء الملفات والتشغيل
+# V. واجهة JSON (الإصدار الأول)
 # ====================================================================
 
-def create_templates():
-    """إنشاء جميع قوالب HTML"""
-    templates_dir = 'templates'
-    if not os.path.exists(templates_dir):
-        os.makedirs(templates_dir)
-        print(f"تم إنشاء مجلد القوالب: {templates_dir}")
-    
-    # جميع القوالب المطلوبة
-    templates = {
-        'base.html': BASE_TEMPLATE,
-        'login.html': LOGIN_TEMPLATE,
-        'dashboard.html': DASHBOARD_TEMPLATE,
-        'dresses.html': DRESSES_TEMPLATE,
-        'add_dress.html': ADD_DRESS_TEMPLATE,
-        'edit_dress.html': EDIT_DRESS_TEMPLATE,
-        'add_booking.html': ADD_BOOKING_TEMPLATE,
-        'bookings.html': BOOKINGS_TEMPLATE,
-        'availability.html': AVAILABILITY_TEMPLATE,
-        'reports.html': REPORTS_TEMPLATE,
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 500
+
+# الحقول المتاحة لكل مورد، والحقول الافتراضية لا تشمل الصورة والنصوص الطويلة
+DRESS_API_FIELDS = {
+    'id': Dress.id,
+    'dress_number': Dress.dress_number,
+    'model_name': Dress.model_name,
+    'category': Dress.category,
+    'color': Dress.color,
+    'fabric_types': Dress.fabric_types,
+    'rental_price': Dress.rental_price,
+    'size': Dress.size,
+    'is_available': Dress.is_available,
+    'booking_count': Dress.booking_count,
+    'last_booking_date': Dress.last_booking_date,
+    'created_date': Dress.created_date,
+    'version': Dress.version,
+    'has_image': Dress.image_id.isnot(None),
+    'details': Dress.details,
+    'image': db.select(ImageBlob.data).where(ImageBlob.id == Dress.image_id).scalar_subquery(),
+}
+DRESS_DEFAULT_FIELDS = [name for name in DRESS_API_FIELDS if name not in ('details', 'image')]
+
+BOOKING_API_FIELDS = {
+    'id': Booking.id,
+    'dress_id': Booking.dress_id,
+    'dress_number': Dress.dress_number,
+    'customer_name': Booking.customer_name,
+    'customer_phone': Booking.customer_phone,
+    'customer_email': Booking.customer_email,
+    'booking_date': Booking.booking_date,
+    'return_date': Booking.return_date,
+    'deposit_paid': Booking.deposit_paid,
+    'total_price': Booking.total_price,
+    'remaining_balance': Booking.remaining_balance,
+    'status': Booking.status,
+    'created_date': Booking.created_date,
+    'version': Booking.version,
+    'notes': Booking.notes,
+}
+BOOKING_DEFAULT_FIELDS = [name for name in BOOKING_API_FIELDS if name != 'notes']
+
+def _json_default(value):
+    """تحويل التواريخ في json القياسية"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'لا يمكن تحويل {type(value).__name__} إلى JSON')
+
+def json_response(payload, status=200):
+    """استجابة JSON بـ orjson إن وُجد وإلا json القياسية"""
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+    return Response(body, status=status, mimetype='application/json')
+
+def api_error(message, status=400):
+    return json_response({'error': message}, status)
+
+def json_object():
+    """جسم الطلب JSON كقاموس ({} إذا كان فارغاً)، و None إذا لم يكن كائناً"""
+    data = request.get_json(silent=True)
+    if data is None and not request.get_data():
+        return {}
+    return data if isinstance(data, dict) else None
+
+def api_login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('logged_in'):
+            return api_error('يجب تسجيل الدخول', 401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+def selected_fields(available, default):
+    """الحقول المطلوبة من ?fields=a,b (المعرف مضمن دائماً لترقيم الصفحات)"""
+    requested = request.args.get('fields')
+    if not requested:
+        return default
+    names = ['id'] + [name.strip() for name in requested.split(',') if name.strip() and name.strip() != 'id']
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        abort(api_error(f"حقول غير معروفة: {', '.join(unknown)}"))
+    return names
+
+def keyset_page(query, id_column, fields, available):
+    """صفحة من النتائج بعد المعرف ?after=N مرتبة بالمعرف"""
+    try:
+        limit = min(max(int(request.args.get('limit', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        abort(api_error('limit و after يجب أن تكون أرقاماً'))
+
+    rows = query.with_entities(*[available[name].label(name) for name in fields]) \
+        .filter(id_column > after).order_by(id_column).limit(limit + 1).all()
+
+    items = row_items(rows[:limit])
+    return {'items': items, 'next_after': items[-1]['id'] if len(rows) > limit else None}
+
+def row_items(rows):
+    """تحويل صفوف with_entities إلى قواميس (الصورة بترميز base64)"""
+    items = []
+    for row in rows:
+        item = dict(row._mapping)
+        if item.get('image') is not None:
+            item['image'] = base64.b64encode(item['image']).decode('ascii')
+        items.append(item)
+    return items
+
+def booking_payload(booking):
+    return {
+        'id': booking.id,
+        'dress_id': booking.dress_id,
+        'customer_name': booking.customer_name,
+        'booking_date': booking.booking_date,
+        'return_date': booking.return_date,
+        'status': booking.status,
+        'remaining_balance': booking.remaining_balance,
+        'version': booking.version,
     }
+
+@app.route('/api/v1/dresses')
+@api_login_required
+@conditional_page('dress')
+def api_dresses():
+    query = filter_catalog(Dress.query, request.args)
+    fields = selected_fields(DRESS_API_FIELDS, DRESS_DEFAULT_FIELDS)
+    return json_response(keyset_page(query, Dress.id, fields, DRESS_API_FIELDS))
+
+@app.route('/api/v1/bookings')
+@api_login_required
+@conditional_page('booking', 'dress')
+def api_bookings():
+    status = request.args.get('status', 'active')
+    search = request.args.get('search', '')
     
-    for filename, content in templates.items():
-        filepath = os.path.join(templates_dir, filename)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"تم كتابة الملف: {filepath}")
+    query = Booking.query.join(Dress, Booking.dress_id == Dress.id)
+    if status != 'all':
+        query = query.filter(Booking.status == status)
+    if search:
+        query = query.filter(
+            (Booking.customer_name.contains(search)) |
+            (Booking.customer_phone.contains(search)) |
+            (Booking.customer_email.contains(search))
+        )
+    
+    fields = selected_fields(BOOKING_API_FIELDS, BOOKING_DEFAULT_FIELDS)
+    return json_response(keyset_page(query, Booking.id, fields, BOOKING_API_FIELDS))
+
+@app.route('/api/v1/availability')
+@api_login_required
+@conditional_page('booking', 'dress')
+def api_availability():
+    try:
+        check_date = parse_date(request.args.get('date'))
+    except (TypeError, ValueError):
+        return api_error('خطأ في تنسيق التاريخ!')
+    
+    query = available_dresses_query(check_date, request.args.get('category', 'all'),
+                                    request.args.getlist('fabric'), request.args.getlist('color'))
+    fields = selected_fields(DRESS_API_FIELDS, DRESS_DEFAULT_FIELDS)
+    page = keyset_page(query, Dress.id, fields, DRESS_API_FIELDS)
+    page['date'] = check_date
+    return json_response(page)
+
+@app.route('/api/v1/dresses/<int:dress_id>/suggestions')
+@api_login_required
+def api_dress_suggestions(dress_id):
+    dress = dress_cache.get(dress_id)
+    if dress is None:
+        return api_error('الفستان غير موجود', 404)
+    try:
+        start = parse_date(request.args.get('date'))
+        # بدون تاريخ إرجاع يُبحث عن يوم واحد
+        end = parse_date(request.args['return_date']) if request.args.get('return_date') else start
+    except (TypeError, ValueError):
+        return api_error('خطأ في تنسيق التاريخ!')
+    
+    payload = booking_suggestions(dress, start, end)
+    payload['requested_free'] = db.session.query(Booking.id).filter(
+        Booking.dress_id == dress_id, overlapping(start, end)).first() is None
+    return json_response(payload)
+
+SIMILAR_DEFAULT_LIMIT = 12
+SIMILAR_MAX_LIMIT = 100
+
+def similar_response(features, exclude=None):
+    """ترتيب الكتالوج حسب التشابه مع خصائص الصورة حسب limit و category و available"""
+    limit = min(max(request.args.get('limit', SIMILAR_DEFAULT_LIMIT, type=int), 1), SIMILAR_MAX_LIMIT)
+    ranked = similar_dresses(features, limit, exclude=exclude, category=request.args.get('category'),
+                             available_only=request.args.get('available') == '1')
+    results = []
+    for dress_id, distance in ranked:
+        dress = dress_cache.get(dress_id)
+        if dress is not None:
+            results.append({
+                'id': dress.id, 'dress_number': dress.dress_number, 'model_name': dress.model_name,
+                'category': dress.category, 'color': dress.color, 'rental_price': dress.rental_price,
+                'is_available': dress.is_available, 'distance': round(distance, 4),
+                'image': url_for('dress_image', dress_id=dress.id),
+            })
+    return json_response({'results': results})
+
+@app.route('/api/v1/dresses/<int:dress_id>/similar')
+@api_login_required
+def api_similar_dresses(dress_id):
+    """فساتين تشبه صورة هذا الفستان"""
+    if np is None:
+        return api_error('البحث بالتشابه يتطلب تثبيت numpy', 503)
+    dress = dress_cache.get(dress_id)
+    if dress is None:
+        return api_error('الفستان غير موجود', 404)
+    features = None
+    if dress.has_image:
+        features = db.session.query(ImageBlob.features).filter(ImageBlob.id == dress.image_id).scalar()
+    if not features:
+        return api_error('لا توجد خصائص لصورة هذا الفستان', 404)
+    return similar_response(features, exclude=dress_id)
+
+@app.route('/api/v1/dresses/similar', methods=['POST'])
+@api_login_required
+def api_similar_to_photo():
+    """فساتين تشبه صورة يعرضها العميل (حقل image في multipart)"""
+    if np is None:
+        return api_error('البحث بالتشابه يتطلب تثبيت numpy', 503)
+    file = request.files.get('image')
+    if not file or not file.filename:
+        return api_error('الصورة مطلوبة')
+    features = image_features(file.read())
+    if features is None:
+        return api_error('تعذر قراءة الصورة')
+    return similar_response(features)
+
+@app.route('/api/v1/facets')
+@api_login_required
+@conditional_page('catalog')
+def api_facets():
+    return json_response({name: [{'value': value, 'count': count} for value, count in values]
+                          for name, values in catalog_facets().items()})
+
+@app.route('/api/v1/stats/cache')
+@api_login_required
+def api_cache_stats():
+    return json_response({'dress': dress_cache.stats()})
+
+@app.route('/api/v1/stats/images')
+@api_login_required
+def api_image_stats():
+    return json_response(image_storage_report())
+
+@app.route('/api/v1/bookings', methods=['POST'])
+@api_login_required
+def api_add_booking():
+    data = json_object() if request.is_json else request.form
+    if data is None:
+        return api_error('جسم الطلب يجب أن يكون كائن JSON')
+    try:
+        booking = create_booking(data)
+    except BookingError as e:
+        db.session.rollback()
+        return json_response({'error': e.message, **e.details}, e.status)
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return api_error(f'خطأ في إضافة الحجز: {str(e)}')
+    return json_response(booking_payload(booking), 201)
+
+@app.route('/api/v1/bookings/<int:booking_id>/return', methods=['POST'])
+@api_login_required
+def api_return_booking(booking_id):
+    booking = db.session.get(Booking, booking_id)
+    if booking is None:
+        return api_error('الحجز غير موجود', 404)
+    data = json_object()
+    if data is None:
+        return api_error('جسم الطلب يجب أن يكون كائن JSON')
+    version = data.get('version')
+    if version is not None:
+        try:
+            version = int(version)
+        except (TypeError, ValueError):
+            return api_error('version يجب أن يكون رقماً')
+    try:
+        mark_returned(booking, version)
+    except BookingError as e:
+        return json_response({'error': e.message, **e.details}, e.status)
+    return json_response(booking_payload(booking))
+
+@app.route('/api/v1/bookings/bulk', methods=['POST'])
+@api_login_required
+def api_bulk_bookings():
+    data = json_object()
+    if data is None:
+        return api_error('جسم الطلب يجب أن يكون كائن JSON')
+    ids, days = data.get('ids', []), data.get('days')
+    # أرقام JSON صحيحة فقط: لا نصوص ولا كسور ولا true/false
+    if not isinstance(ids, list) or not all(type(booking_id) is int for booking_id in ids):
+        return api_error('ids يجب أن تكون قائمة أرقام صحيحة')
+    if days is not None and type(days) is not int:
+        return api_error('days يجب أن يكون رقماً صحيحاً')
+    try:
+        result = bulk_update_bookings(data.get('action'), ids, days)
+    except BookingError as e:
+        db.session.rollback()
+        return api_error(e.message, e.status)
+    return json_response(result)
+
+# مزامنة الأجهزة اللوحية: نسخة كاملة أولاً ثم التغييرات فقط بعد المؤشر ?since=
+SYNC_ID_BATCH = 500
+# في Postgres قد تُكتب معاملة بمؤشر أقل بعد معاملة بمؤشر أعلى، فالفجوة الأحدث من هذه المدة تُعتبر معلقة
+SYNC_SETTLE_SECONDS = 60
+SYNC_GAP_SCAN = 1000
+
+def sync_bookings_query():
+    """الحجوزات التي تحتاجها الفروع دون اتصال: النشطة التي لم يحن موعد إرجاعها"""
+    return Booking.query.join(Dress, Booking.dress_id == Dress.id).filter(
+        Booking.status == 'active',
+        (Booking.return_date >= date.today()) | (Booking.return_date == None)
+    )
+
+def sync_rows(query, id_column, fields, available, ids=None):
+    """صفوف المزامنة، مقيدة بقائمة معرفات على دفعات عند التحديث التدريجي"""
+    columns = [available[name].label(name) for name in fields]
+    if ids is None:
+        return row_items(query.with_entities(*columns).order_by(id_column).all())
+    ids = sorted(ids)
+    items = []
+    for start in range(0, len(ids), SYNC_ID_BATCH):
+        batch = ids[start:start + SYNC_ID_BATCH]
+        items.extend(row_items(query.with_entities(*columns).filter(id_column.in_(batch)).order_by(id_column).all()))
+    return items
+
+def changed_since(since, cursor):
+    """آخر عملية لكل سجل تغير بين المؤشرين: {entity: {id: op}}"""
+    changes = {'dress': {}, 'booking': {}}
+    rows = db.session.query(ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op) \
+        .filter(ChangeLog.seq > since, ChangeLog.seq <= cursor).order_by(ChangeLog.seq)
+    for entity, entity_id, op in rows:
+        changes[entity][entity_id] = op
+    return changes
+
+def sync_cursor(latest):
+    """أعلى مؤشر ليس تحته فجوة حديثة: التغييرات بعده تُعاد في المزامنة التالية
+
+    في SQLite الكتابة متسلسلة فلا فجوات والمؤشر هو آخر تغيير.
+    """
+    settled = datetime.now() - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    rows = db.session.query(ChangeLog.seq, ChangeLog.changed_at) \
+        .filter(ChangeLog.seq <= latest).order_by(ChangeLog.seq.desc()).limit(SYNC_GAP_SCAN).all()
+    cursor = latest
+    for (seq, changed_at), lower in zip(rows, rows[1:] + [None]):
+        if changed_at is None or changed_at < settled:
+            break
+        if lower is None:
+            # كل السجل الممسوح حديث: ما تحته غير معروف
+            cursor = seq - 1 if len(rows) == SYNC_GAP_SCAN else cursor
+        elif lower.seq != seq - 1:
+            cursor = lower.seq
+    return cursor
+
+def sync_payload(since):
+    """النسخة الكاملة (since=0) أو الفرق منذ المؤشر مع قائمة المحذوفات"""
+    # آخر مؤشر يُقرأ أولاً في نفس المعاملة، فأي تغيير لاحق يظهر في المزامنة التالية
+    latest, oldest = db.session.query(db.func.max(ChangeLog.seq), db.func.min(ChangeLog.seq)).one()
+    latest = latest or 0
+    cursor = sync_cursor(latest)
+    # مؤشر من المستقبل (قاعدة بيانات جديدة) أو أقدم من السجل المحفوظ يتطلب نسخة كاملة
+    full = since <= 0 or since > latest or (oldest is not None and since < oldest - 1)
+
+    if full:
+        return {
+            'cursor': cursor,
+            'full': True,
+            'dresses': sync_rows(Dress.query, Dress.id, DRESS_DEFAULT_FIELDS, DRESS_API_FIELDS),
+            'bookings': sync_rows(sync_bookings_query(), Booking.id, BOOKING_DEFAULT_FIELDS, BOOKING_API_FIELDS),
+            'deleted': {'dresses': [], 'bookings': []},
+        }
+
+    changes = changed_since(since, latest)
+    payload = {'cursor': cursor, 'full': False, 'deleted': {}}
+    for entity, key, query, id_column, fields, available in (
+        ('dress', 'dresses', Dress.query, Dress.id, DRESS_DEFAULT_FIELDS, DRESS_API_FIELDS),
+        ('booking', 'bookings', sync_bookings_query(), Booking.id, BOOKING_DEFAULT_FIELDS, BOOKING_API_FIELDS),
+    ):
+        upserts = [entity_id for entity_id, op in changes[entity].items() if op == 'upsert']
+        items = sync_rows(query, id_column, fields, available, upserts)
+        found = {item['id'] for item in items}
+        payload[key] = items
+        # المحذوف، أو الحجز الذي لم يعد قادماً (أُرجع أو أُلغي)، يُرسل كشاهد حذف
+        payload['deleted'][key] = sorted(entity_id for entity_id in changes[entity] if entity_id not in found)
+    return payload
+
+@app.route('/api/v1/sync')
+@api_login_required
+def api_sync():
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return api_error('since يجب أن يكون رقماً')
+
+    payload = sync_payload(since)
+    if msgpack is not None and request.accept_mimetypes.best_match(
+            ['application/json', 'application/msgpack']) == 'application/msgpack':
+        return Response(msgpack.packb(payload, default=_json_default), mimetype='application/msgpack')
+    return json_response(payload)
 
 # ====================================================================
-# VII. نقطة البداية
+# VI. مهام الصيانة الدورية
 # ====================================================================
 
-if __name__ == '__main__':
-    # إضافة now إلى سياق القوالب
-    @app.context_processor
-    def inject_now():
-        return {'now': datetime.now()}
+DASHBOARD_UPCOMING_LIMIT = 10
+DASHBOARD_OVERDUE_LIMIT = 20
+# تشغيل الصيانة داخل عمليات الخادم كل N ثانية (0 = معطل، والبديل: flask --app app maintenance في cron)
+MAINTENANCE_INTERVAL = int(os.environ.get('MAINTENANCE_INTERVAL', 3600))
+MAINTENANCE_BATCH_SIZE = 500
+
+def _digest_rows(*conditions, order_by=None, limit=None):
+    """حجوزات نشطة مع رقم الفستان كقواميس قابلة للحفظ في JSON"""
+    rows = db.session.query(Booking.id, Booking.customer_name, Booking.customer_phone, Dress.dress_number,
+                            Booking.booking_date, Booking.return_date) \
+        .join(Dress, Booking.dress_id == Dress.id) \
+        .filter(Booking.status == 'active', *conditions).order_by(order_by).limit(limit)
+    return [{
+        'id': row.id,
+        'customer_name': row.customer_name,
+        'customer_phone': row.customer_phone,
+        'dress_number': row.dress_number,
+        'booking_date': row.booking_date.isoformat(),
+        'return_date': row.return_date.isoformat() if row.return_date else None,
+    } for row in rows]
+
+def build_dashboard_digest(today):
+    """حساب إحصائيات لوحة التحكم وقوائم اليوم"""
+    return {
+        'total_dresses': Dress.query.count(),
+        'available_dresses': Dress.query.filter_by(is_available=True).count(),
+        'active_bookings': Booking.query.filter_by(status='active').count(),
+        'upcoming': _digest_rows(Booking.booking_date >= today,
+                                 order_by=Booking.booking_date, limit=DASHBOARD_UPCOMING_LIMIT),
+        'due_today': _digest_rows(Booking.return_date == today, order_by=Booking.id),
+        'overdue': _digest_rows(Booking.return_date < today,
+                                order_by=Booking.return_date, limit=DASHBOARD_OVERDUE_LIMIT),
+    }
+
+def dashboard_digest(today=None):
+    """ملخص اليوم من قاعدة البيانات، ويُعاد حسابه فقط إذا تغيرت الفساتين أو الحجوزات"""
+    today = today or date.today()
+    versions = json.dumps(data_versions(DATA_VERSION_NAMES), sort_keys=True)
+    digest = db.session.get(DashboardDigest, today)
+    if digest is not None and digest.versions == versions:
+        return json.loads(digest.payload)
+    
+    payload = build_dashboard_digest(today)
+    try:
+        db.session.merge(DashboardDigest(day=today, versions=versions, payload=json.dumps(payload, ensure_ascii=False),
+                                         computed_at=datetime.now()))
+        db.session.commit()
+    except IntegrityError:
+        # عملية أخرى حفظت نفس اليوم في نفس اللحظة
+        db.session.rollback()
+    return payload
+
+# الحجوزات المغلقة منذ أكثر من N شهراً تُنقل إلى جدول الأرشيف
+ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', 6))
+
+def months_before(day, months):
+    month = day.month - months
+    year = day.year + (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date(year, month, min(day.day, 28))
+
+def archive_bookings(months=None, batch_size=MAINTENANCE_BATCH_SIZE, today=None):
+    """نقل الحجوزات المغلقة القديمة إلى الأرشيف على دفعات
+
+    كل دفعة (نسخ ثم حذف) في معاملة مستقلة، فالمقاطعة لا تفقد بيانات وإعادة
+    التشغيل تكمل من حيث توقفت.
+    """
+    months = ARCHIVE_AFTER_MONTHS if months is None else months
+    cutoff = months_before(today or date.today(), months)
+    closed = Booking.status.in_(('returned', 'cancelled')) & \
+        (db.func.coalesce(Booking.return_date, Booking.booking_date) < cutoff)
+    columns = list(HISTORY_COLUMNS) + ['is_overdue']
+    archived = 0
+    while True:
+        ids = [row[0] for row in db.session.query(Booking.id).filter(closed).order_by(Booking.id).limit(batch_size)]
+        if not ids:
+            break
+        db.session.execute(BookingArchive.__table__.insert().from_select(
+            columns + ['archived_at'],
+            db.select(*[getattr(Booking, name) for name in columns], db.literal(datetime.now()))
+            .where(Booking.id.in_(ids))
+        ))
+        db.session.execute(db.delete(Booking).where(Booking.id.in_(ids)))
+        # المزامنة تشمل الحجوزات النشطة فقط، فلا حاجة لتسجيل الأرشفة في سجل المزامنة
+        bump_version('booking')
+        db.session.commit()
+        archived += len(ids)
+    return archived
+
+def _update_in_batches(model, ids, values):
+    """أعمدة محسوبة (الإتاحة، التأخر) فلا يتغير الإصدار الذي يشترطه المستخدم عند التعديل أو الإرجاع"""
+    for start in range(0, len(ids), MAINTENANCE_BATCH_SIZE):
+        batch = ids[start:start + MAINTENANCE_BATCH_SIZE]
+        db.session.execute(db.update(model).where(model.id.in_(batch)).values(**values))
+
+def run_maintenance(today=None):
+    """إتاحة الفساتين حسب حجوزات اليوم، تعليم الحجوزات المتأخرة، الأرشفة، ربط الحجوزات بالعملاء،
+    تصحيح عدادات الصور المشتركة، حساب خصائص التشابه لدفعة من الصور القديمة، وحساب ملخص اليوم
+
+    تُحدث فقط الصفوف التي تغيرت، ويمكن تشغيلها أي عدد من المرات.
+    """
+    today = today or date.today()
+    rented_now = rented_on(today)
     
-    # إضافة total_bookings إلى سياق القوالب
-    @app.context_processor
-    def inject_totals():
-        return {'total_bookings': Booking.query.count()}
+    # الفستان متاح إذا لم يُوقف يدوياً (in_service) ولم يكن لديه حجز نشط يشمل اليوم
+    to_free = [row[0] for row in db.session.query(Dress.id).filter(
+        Dress.is_available == False, Dress.in_service == True, ~rented_now)]
+    to_rent = [row[0] for row in db.session.query(Dress.id).filter(
+        Dress.is_available != False, (Dress.in_service == False) | rented_now)]
+    _update_in_batches(Dress, to_free, {'is_available': True})
+    _update_in_batches(Dress, to_rent, {'is_available': False})
     
-    # إنشاء مجلد التحميلات
-    if not os.path.exists(app.config['UPLOAD_FOLDER']):
-        os.makedirs(app.config['UPLOAD_FOLDER'])
+    late = (Booking.status == 'active') & (Booking.return_date < today)
+    to_flag = [row[0] for row in db.session.query(Booking.id).filter(late, Booking.is_overdue != True)]
+    to_clear = [row[0] for row in db.session.query(Booking.id).filter(
+        Booking.status == 'active', Booking.is_overdue == True, ~late)]
+    _update_in_batches(Booking, to_flag, {'is_overdue': True})
+    _update_in_batches(Booking, to_clear, {'is_overdue': False})
     
-    # إنشاء القوالب
-    create_templates()
+    changed_dresses = to_free + to_rent
+    changed_bookings = to_flag + to_clear
+    record_changes('dress', changed_dresses)
+    record_changes('booking', changed_bookings)
+    if changed_dresses or changed_bookings:
+        bump_version(*[name for name, ids in (('dress', changed_dresses), ('booking', changed_bookings)) if ids])
+    db.session.commit()
+    for dress_id in changed_dresses:
+        dress_cache.invalidate(dress_id)
     
-    # إنشاء قاعدة البيانات والبيانات الأولية
+    archived = archive_bookings(today=today)
+    customers = migrate_customers(MAINTENANCE_BATCH_SIZE)
+    images = recount_images()
+    features = backfill_image_features(limit=MAINTENANCE_BATCH_SIZE)
+    dashboard_digest(today)
+    result = {'freed': len(to_free), 'rented': len(to_rent),
+              'overdue': len(to_flag), 'cleared': len(to_clear), 'archived': archived,
+              'linked': customers['bookings'], 'orphan_images': images['removed'], 'image_features': features}
+    if changed_dresses or changed_bookings or archived or customers['bookings'] or images['fixed'] or features:
+        log_action('MAINTENANCE', json.dumps(result))
+    return result
+
+@app.cli.command('maintenance')
+def maintenance_command():
+    """تشغيل مهمة الصيانة مرة واحدة (مناسبة لـ cron)"""
+    create_app()
+    with app.app_context():
+        print(run_maintenance())
+
+@app.cli.command('archive')
+@click.option('--months', type=int, default=None, help='عمر الحجز المغلق بالأشهر قبل أرشفته')
+@click.option('--batch-size', type=int, default=MAINTENANCE_BATCH_SIZE)
+def archive_command(months, batch_size):
+    """أرشفة الحجوزات المغلقة القديمة على دفعات"""
+    create_app()
+    with app.app_context():
+        archived = archive_bookings(months, batch_size)
+        print(f'تمت أرشفة {archived} حجز')
+
+@app.cli.command('migrate-customers')
+@click.option('--batch-size', type=int, default=MAINTENANCE_BATCH_SIZE)
+def migrate_customers_command(batch_size):
+    """ربط الحجوزات القديمة بجدول العملاء على دفعات"""
+    create_app()
+    with app.app_context():
+        print(migrate_customers(batch_size))
+
+@app.cli.command('images')
+@click.option('--recount', is_flag=True, help='تصحيح عدادات المراجع وحذف الصور غير المستخدمة أولاً')
+def images_command(recount):
+    """تقرير مساحة الصور المشتركة والمساحة الموفرة بإزالة التكرار"""
+    create_app()
+    with app.app_context():
+        if recount:
+            print(recount_images())
+        print(image_storage_report())
+
+@app.cli.command('image-features')
+@click.option('--batch-size', type=int, default=100)
+def image_features_command(batch_size):
+    """حساب خصائص التشابه البصري لكل الصور المخزنة قبل إضافتها"""
+    create_app()
     with app.app_context():
-        db.create_all()
-        create_initial_data()
+        print(f'تم حساب خصائص {backfill_image_features(batch_size)} صورة')
+
+def start_maintenance_thread(interval):
+    """تشغيل الصيانة في خيط خلفي؛ قفل الملف يجعل عاملاً واحداً فقط ينفذها في كل دورة"""
+    def loop():
+        while True:
+            with instance_lock('maintenance.lock', blocking=False) as acquired:
+                if acquired:
+                    try:
+                        # الجلسة تُغلق مع سياق التطبيق
+                        with app.app_context():
+                            run_maintenance()
+                    except Exception as e:
+                        print(f"خطأ في مهمة الصيانة: {e}")
+            time.sleep(interval)
+    
+    thread = threading.Thread(target=loop, name='maintenance', daemon=True)
+    thread.start()
+    return thread
+
+# عملية -> خيط الصيانة: بعد fork يبدأ كل عامل خيطه الخاص
+_maintenance_threads = {}
+_maintenance_lock = threading.Lock()
+
+@app.before_request
+def ensure_maintenance_thread():
+    """خيط صيانة واحد لكل عملية تخدم الطلبات (gunicorn.conf.py يستدعيها بعد تحميل كل عامل)
+
+    لا يبدأ في create_app: مع preload تنفذها عملية gunicorn الأم قبل fork فلا يصل الخيط إلى العمال.
+    """
+    interval = app.config.get('MAINTENANCE_INTERVAL', MAINTENANCE_INTERVAL)
+    if not interval or os.getpid() in _maintenance_threads:
+        return
+    with _maintenance_lock:
+        if os.getpid() not in _maintenance_threads:
+            _maintenance_threads[os.getpid()] = start_maintenance_thread(interval)
+
+# ====================================================================
+# VII. النسخ الاحتياطي والاستعادة
+# ====================================================================
+
+# النسخ يتم على خطوات من الصفحات مع استراحة بينها حتى لا تتوقف الكتابة
+BACKUP_DIR = os.environ.get('BACKUP_DIR')
+BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', 1024))
+BACKUP_STEP_PAUSE = float(os.environ.get('BACKUP_STEP_PAUSE', 0.005))
+# بدون WAL كل كتابة من اتصال آخر تعيد النسخ من البداية؛ بعد هذا العدد يُكمل في خطوة واحدة
+BACKUP_MAX_RESTARTS = 3
+BACKUP_TABLES = ('dress', 'booking', 'system_log')
+
+class BackupRestarted(Exception):
+    """تغيرت قاعدة البيانات أثناء النسخ أكثر من BACKUP_MAX_RESTARTS مرة"""
+
+def backup_directory():
+    return BACKUP_DIR or os.path.join(app.instance_path, 'backups')
+
+def is_sqlite():
+    return db.engine.url.get_backend_name() == 'sqlite'
+
+def _sqlite_copy(source, dest, pages=BACKUP_PAGES_PER_STEP, pause=BACKUP_STEP_PAUSE):
+    """نسخ اتصال SQLite إلى آخر بواجهة backup مع قياس أطول خطوة"""
+    stats = {'steps': 0, 'restarts': 0, 'max_step_ms': 0.0, 'pages': 0}
+    state = {'last': time.perf_counter(), 'remaining': None}
+
+    def progress(status, remaining, total):
+        now = time.perf_counter()
+        stats['steps'] += 1
+        stats['pages'] = total
+        stats['max_step_ms'] = max(stats['max_step_ms'], (now - state['last']) * 1000)
+        if state['remaining'] is not None and remaining > state['remaining']:
+            stats['restarts'] += 1
+            if stats['restarts'] > BACKUP_MAX_RESTARTS:
+                raise BackupRestarted()
+        state['remaining'] = remaining
+        # الاستراحة بين الخطوات تترك القفل للكتّاب
+        if remaining and pause:
+            time.sleep(pause)
+        state['last'] = time.perf_counter()
+
+    start = time.perf_counter()
+    # مع WAL معاملة قراءة مفتوحة تثبّت لقطة واحدة لكل الخطوات دون أن تمنع الكتابة
+    wal = source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    if wal:
+        source.execute('BEGIN')
+        source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+    try:
+        source.backup(dest, pages=pages, progress=progress)
+    except BackupRestarted:
+        # بدون WAL: إكمال النسخ في خطوة واحدة تمنع الكتابة لمدة النسخ فقط
+        state['last'] = time.perf_counter()
+        source.backup(dest, pages=-1, progress=progress)
+    finally:
+        if wal:
+            source.rollback()
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+def pg_command(program, *args):
+    """أمر pg_dump/pg_restore مع رابط libpq، وكلمة المرور في PGPASSWORD لا في سطر الأوامر"""
+    url = db.engine.url
+    env = dict(os.environ)
+    if url.password:
+        env['PGPASSWORD'] = url.password
+    dsn = url.set(drivername='postgresql', password=None).render_as_string(hide_password=False)
+    return [program, f'--dbname={dsn}', *args], env
+
+def backup_database(target, include_images=True, pages=BACKUP_PAGES_PER_STEP, pause=BACKUP_STEP_PAUSE):
+    """نسخة متسقة من قاعدة البيانات أثناء عمل التطبيق
+
+    بدون include_images تُحذف الصور من النسخة (لا من القاعدة) وتُحفظ بـ backup_images.
+    """
+    start = time.perf_counter()
+    if not is_sqlite():
+        # pg_dump لا يستثني عموداً، فالصور تبقى داخل النسخة (المضغوطة) على Postgres
+        command, env = pg_command('pg_dump', '--format=custom', '--no-owner', f'--file={target}')
+        subprocess.run(command, env=env, check=True)
+        return {'seconds': time.perf_counter() - start, 'bytes': os.path.getsize(target)}
+
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    partial = target + '.partial'
+    source = db.engine.raw_connection()
+    dest = sqlite3.connect(partial)
+    try:
+        stats = _sqlite_copy(source.driver_connection, dest, pages, pause)
+        if not include_images:
+            # البصمة والحجم يبقيان في image_blob، والمحتوى يُعاد من مخزن البصمات
+            dest.execute("UPDATE image_blob SET data = X''")
+            dest.execute('UPDATE dress SET image_data = NULL')
+            # المصغرات تُنشأ من جديد عند طلبها
+            dest.execute('DELETE FROM image_thumbnail')
+            dest.commit()
+            dest.execute('VACUUM')
+    finally:
+        dest.close()
+        source.close()
+    os.replace(partial, target)
+    stats['bytes'] = os.path.getsize(target)
+    stats['total_seconds'] = time.perf_counter() - start
+    return stats
+
+def _write_atomic(path, data):
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+def image_object_path(directory, digest):
+    return os.path.join(directory, 'objects', digest[:2], digest)
+
+def backup_images(directory):
+    """نسخ تزايدي للصور المشتركة بمفتاح SHA-256 لمحتواها
+
+    البصمات تُقرأ بدون الصور، ولا يُقرأ ويُكتب إلا محتوى البصمات غير الموجودة في المخزن.
+    """
+    start = time.perf_counter()
+    digests = [row[0] for row in db.session.query(ImageBlob.digest).order_by(ImageBlob.id)]
+    missing = [digest for digest in digests if not os.path.exists(image_object_path(directory, digest))]
+    stats = {'images': len(digests), 'written': 0, 'bytes_written': 0}
+    for i in range(0, len(missing), SYNC_ID_BATCH):
+        batch = missing[i:i + SYNC_ID_BATCH]
+        for digest, image_data in db.session.query(ImageBlob.digest, ImageBlob.data).filter(ImageBlob.digest.in_(batch)):
+            path = image_object_path(directory, digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write_atomic(path, image_data)
+            stats['written'] += 1
+            stats['bytes_written'] += len(image_data)
+    stats['seconds'] = time.perf_counter() - start
+    return stats
+
+def table_counts(connection):
+    return {table: connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in BACKUP_TABLES}
+
+def pg_dump_counts(snapshot):
+    """أعداد صفوف الجداول الأساسية في نسخة pg_dump (سطر لكل صف في كتل COPY)
+
+    يقرأ بيانات الملف كلها، فيفشل مع النسخ الناقصة أو التالفة.
+    """
+    counts = dict.fromkeys(BACKUP_TABLES, 0)
+    process = subprocess.Popen(['pg_restore', '--data-only', '--file=-', snapshot], stdout=subprocess.PIPE)
+    table = None
+    with process.stdout:
+        for line in process.stdout:
+            if table is None:
+                if line.startswith(b'COPY '):
+                    # COPY public.dress (id, ...) FROM stdin;
+                    name = line.split()[1].decode().split('.')[-1].strip('"')
+                    table = name if name in counts else ''
+            elif line == b'\\.\n':
+                table = None
+            elif table:
+                counts[table] += 1
+    if process.wait() != 0:
+        raise ValueError(f'النسخة غير صالحة: pg_restore أنهى بالرمز {process.returncode}')
+    return counts
+
+def verify_snapshot(path):
+    """فحص سلامة النسخة قبل الاستعادة: integrity_check والجداول الأساسية"""
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        result = connection.execute('PRAGMA integrity_check(1)').fetchone()[0]
+        if result != 'ok':
+            raise ValueError(f'النسخة تالفة: {result}')
+        return table_counts(connection)
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f'النسخة غير صالحة: {e}')
+    finally:
+        connection.close()
+
+def read_image_object(directory, digest):
+    with open(image_object_path(directory, digest), 'rb') as f:
+        image_data = f.read()
+    if hashlib.sha256(image_data).hexdigest() != digest:
+        raise ValueError(f'صورة تالفة في النسخة: {digest}')
+    return image_data
+
+def restore_images(connection, directory):
+    """إعادة الصور من مخزن البصمات إلى نسخة بدون صور، مع التحقق من كل بصمة"""
+    tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'image_blob' not in tables:
+        # نسخ ما قبل الصور المشتركة تحمل صورها داخل dress.image_data
+        return 0
+    restored = 0
+    for blob_id, digest in connection.execute('SELECT id, digest FROM image_blob WHERE length(data) = 0').fetchall():
+        restored += connection.execute('UPDATE image_blob SET data = ? WHERE id = ?',
+                                       (read_image_object(directory, digest), blob_id)).rowcount
+    connection.commit()
+    return restored
+
+def restore_database(snapshot, images_dir=None):
+    """استعادة نسخة بعد التحقق منها، ثم مقارنة أعداد الصفوف بعد الاستعادة"""
+    if not is_sqlite():
+        expected = pg_dump_counts(snapshot)
+        stats = {}
+        db.session.remove()
+        command, env = pg_command('pg_restore', '--clean', '--if-exists', '--no-owner', snapshot)
+        subprocess.run(command, env=env, check=True)
+        restored = {table: db.session.execute(db.text(f'SELECT COUNT(*) FROM {table}')).scalar()
+                    for table in BACKUP_TABLES}
+        db.session.rollback()
+    else:
+        stats, restored, expected = _restore_sqlite(snapshot, images_dir)
+    if restored != expected:
+        raise ValueError(f'أعداد الصفوف بعد الاستعادة لا تطابق النسخة: {restored} != {expected}')
+
+    # كل ما في الذاكرة أصبح قديماً
+    dress_cache.clear()
+    _facet_cache.clear()
+    _feature_index.clear()
+    invalidate_totals()
+    bump_version(*DATA_VERSION_NAMES)
+    db.session.commit()
+    # نسخة أقدم من الصور المشتركة تحتاج الأعمدة الجديدة ونقل صورها
+    db.create_all()
+    create_missing_columns()
+    stats['migrated_images'] = migrate_dress_images()
+    stats['rows'] = restored
+    return stats
+
+def _restore_sqlite(snapshot, images_dir):
+    expected = verify_snapshot(snapshot)
+    stats = {'images': 0}
+    with tempfile.TemporaryDirectory() as work:
+        # الصور تُعاد إلى نسخة مؤقتة فيبقى ملف النسخة الأصلي كما هو
+        staged = os.path.join(work, 'restore.db')
+        source = sqlite3.connect(staged)
+        original = sqlite3.connect(snapshot)
+        original.backup(source)
+        original.close()
+        try:
+            if images_dir:
+                stats['images'] = restore_images(source, images_dir)
+            db.session.remove()
+            dest = db.engine.raw_connection()
+            try:
+                stats.update(_sqlite_copy(source, dest.driver_connection))
+                restored = table_counts(dest.driver_connection)
+            finally:
+                dest.close()
+        finally:
+            source.close()
+    return stats, restored, expected
+
+def backup_name(suffix):
+    return f"the_bride-{datetime.now().strftime('%Y%m%d-%H%M%S')}{suffix}"
+
+@app.route('/backup')
+@login_required
+def download_backup():
+    """تنزيل نسخة كاملة (مع الصور) دون إيقاف التطبيق
+
+    النسخة تُكتب إلى ملف مؤقت أولاً، ففشل pg_dump في منتصفها يعطي 500 لا ملفاً ناقصاً.
+    """
+    work = tempfile.mkdtemp(prefix='the_bride_backup_')
+    path = os.path.join(work, backup_name('.db' if is_sqlite() else '.dump'))
+    try:
+        stats = backup_database(path)
+    except subprocess.CalledProcessError as e:
+        shutil.rmtree(work, ignore_errors=True)
+        app.logger.error('فشل pg_dump بالرمز %s', e.returncode)
+        abort(500)
+    except Exception:
+        shutil.rmtree(work, ignore_errors=True)
+        raise
+    log_action('BACKUP', json.dumps({'bytes': stats['bytes'], 'seconds': round(stats['seconds'], 3)}))
+    response = send_file(path, as_attachment=True, download_name=os.path.basename(path))
+    response.call_on_close(lambda: shutil.rmtree(work, ignore_errors=True))
+    return response
+
+@app.cli.command('backup')
+@click.option('--dir', 'directory', default=None, help='مجلد النسخ (افتراضياً BACKUP_DIR أو instance/backups)')
+@click.option('--with-images', is_flag=True, help='تضمين الصور في ملف النسخة بدلاً من مخزن البصمات')
+def backup_command(directory, with_images):
+    """نسخة من قاعدة البيانات، والصور المشتركة في مخزن تزايدي بمفتاح البصمة"""
+    create_app()
+    with app.app_context():
+        directory = directory or backup_directory()
+        target = os.path.join(directory, backup_name('.db' if is_sqlite() else '.dump'))
+        print(target, backup_database(target, include_images=with_images))
+        if not with_images and is_sqlite():
+            print(os.path.join(directory, 'images'), backup_images(os.path.join(directory, 'images')))
+
+@app.cli.command('restore')
+@click.argument('snapshot')
+@click.option('--images', 'images_dir', default=None, help='مخزن الصور الذي أُنشئ مع النسخة')
+def restore_command(snapshot, images_dir):
+    """استعادة نسخة بعد التحقق منها (أوقف العمال أولاً)"""
+    create_app()
+    with app.app_context():
+        try:
+            print(restore_database(snapshot, images_dir))
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+# ====================================================================
+# VIII. تهيئة التطبيق
+# ====================================================================
+
+def create_missing_columns():
+    """create_all لا يضيف الأعمدة الجديدة إلى الجداول الموجودة مسبقاً"""
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(db.engine.dialect)}'
+            if column.server_default is not None:
+                # db.false() تصبح 0 في SQLite و false في Postgres
+                ddl += f' DEFAULT {column.server_default.arg.compile(db.engine)}'
+            db.session.execute(db.text(ddl))
+    db.session.commit()
+
+def create_missing_indexes():
+    """create_all لا يضيف الفهارس الجديدة إلى الجداول الموجودة مسبقاً"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+@contextmanager
+def instance_lock(name, blocking=True):
+    """قفل ملف في مجلد instance بين العمليات؛ يعطي False إذا كان مأخوذاً ومع blocking=False"""
+    with open(os.path.join(app.instance_path, name), 'w') as lock:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def initialize_database():
+    """إنشاء الجداول والبيانات الأولية مرة واحدة حتى مع عدة عمليات"""
+    os.makedirs(app.instance_path, exist_ok=True)
+    # قفل ملف يمنع عمال gunicorn (بدون --preload) من التهيئة في نفس الوقت
+    with instance_lock('init.lock'):
+        with app.app_context():
+            db.create_all()
+            create_missing_columns()
+            create_missing_indexes()
+            for name in DATA_VERSION_NAMES:
+                if db.session.get(DataVersion, name) is None:
+                    db.session.add(DataVersion(name=name, version=0))
+            db.session.commit()
+            create_initial_data()
+            migrate_dress_tags()
+            migrate_dress_images()
+            db.session.remove()
+
+def create_app(config=None):
+    """تجهيز التطبيق: الإعدادات وقاعدة البيانات والتهيئة لمرة واحدة
+
+    الاستخدام مع gunicorn: gunicorn --config gunicorn.conf.py "app:create_app()"
+    الاستدعاءات اللاحقة تعيد نفس التطبيق دون تهيئة جديدة.
+    """
+    if 'sqlalchemy' in app.extensions:
+        return app
+
+    if config:
+        app.config.update(config)
+        if 'SQLALCHEMY_ENGINE_OPTIONS' not in config:
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    db.init_app(app)
+
+    # إنشاء مجلد التحميلات
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    # إنشاء قاعدة البيانات والبيانات الأولية
+    initialize_database()
+    return app
+
+# ====================================================================
+# IX. نقطة البداية
+# ====================================================================
+
+if __name__ == '__main__':
+    create_app()
     
     print("\n" + "="*60)
     print("✅ نظام THE Bride جاهز للعمل!")
     print("="*60)
-    print(f"📊 الوصول عبر: http://127.0.0.1:5000/")
+    port = int(os.environ.get('PORT', 5000))
+    print(f"📊 الوصول عبر: http://127.0.0.1:{port}/")
     print(f"🔑 بيانات الدخول:")
     print(f"   📧 البريد: 7oda10035@gmail.com")
     print(f"   🔐 كلمة المرور: Ma7moowd10035")
@@ -1533,4 +3204,4 @@ if __name__ == '__main__':
     print("\n🚀 جاري تشغيل النظام...")
     
     # تشغيل التطبيق
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
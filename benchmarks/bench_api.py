@@ -0,0 +1,145 @@
+"""مقارنة إنتاجية واجهة JSON مع صفحات HTML المقابلة
+
+لكل عملية يقيس عدد الطلبات في الثانية وحجم الاستجابة لكل من مسار JSON
+(/api/v1/...) وصفحة HTML التي تعرض نفس البيانات. قوائم JSON تُقرأ كاملة
+عبر ترقيم الصفحات (after) حتى تكون المقارنة على نفس عدد الصفوف.
+وأخيراً يتحقق أن المدخلات غير الصالحة تعيد 400 بصيغة أخطاء الواجهة لا 500.
+
+مثال:
+    python benchmarks/bench_api.py --dresses 2000 --bookings 5000 --seconds 2
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+from common import logged_in_client, make_app, seed
+
+
+def fetch_all(client, url):
+    """قراءة كل صفحات قائمة JSON وإرجاع مجموع البايتات"""
+    total = 0
+    after = 0
+    while after is not None:
+        separator = '&' if '?' in url else '?'
+        response = client.get(f'{url}{separator}limit=500&after={after}')
+        total += len(response.data)
+        after = response.get_json()['next_after']
+    return total
+
+
+def throughput(func, seconds):
+    """تشغيل الدالة بشكل متكرر وإرجاع (طلب/ث، آخر حجم)"""
+    count = 0
+    size = 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        size = func()
+        count += 1
+    return count / (time.perf_counter() - start), size
+
+
+INVALID_REQUESTS = [
+    ('/api/v1/bookings', []),
+    ('/api/v1/bookings', 'نص'),
+    ('/api/v1/bookings', {'dress_id': 'abc', 'booking_date': '2050-01-01'}),
+    ('/api/v1/bookings', {'dress_id': [1], 'booking_date': '2050-01-01'}),
+    ('/api/v1/bookings/1/return', [1]),
+    ('/api/v1/bookings/bulk', [1]),
+    ('/api/v1/bookings/bulk', {'action': 'return', 'ids': '12'}),
+    ('/api/v1/bookings/bulk', {'action': 'return', 'ids': [{}]}),
+    ('/api/v1/bookings/bulk', {'action': 'return', 'ids': [1.5]}),
+    ('/api/v1/bookings/bulk', {'action': 'return', 'ids': [True]}),
+    ('/api/v1/bookings/bulk', {'action': 'return', 'ids': {'1': 1}}),
+    ('/api/v1/bookings/bulk', {'action': 'reschedule', 'ids': [1], 'days': 1.5}),
+    ('/api/v1/dresses?limit=abc', None),
+]
+
+
+def check_invalid(client):
+    """كل طلب غير صالح يعيد 400 مع حقل error"""
+    failures = []
+    for url, body in INVALID_REQUESTS:
+        response = client.get(url) if body is None else client.post(url, json=body)
+        if response.status_code != 400 or 'error' not in (response.get_json(silent=True) or {}):
+            failures.append((url, body, response.status_code))
+    print(f'\nمدخلات غير صالحة: {len(INVALID_REQUESTS) - len(failures)}/{len(INVALID_REQUESTS)} تعيد 400'
+          + (f'، الفاشلة: {failures}' if failures else ''))
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=2000)
+    parser.add_argument('--bookings', type=int, default=5000)
+    parser.add_argument('--seconds', type=float, default=2)
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    seed(the_bride, args.dresses, args.bookings)
+    client = logged_in_client(app)
+    client.get('/')
+    check_date = (date.today() + timedelta(days=30)).isoformat()
+    counter = iter(range(10 ** 9))
+
+    def html_add_booking():
+        day = date(2040, 1, 1) + timedelta(days=3 * next(counter))
+        response = client.post('/booking/add', data={
+            'dress_id': 1, 'customer_name': 'قياس', 'booking_date': day.isoformat(),
+            'return_date': (day + timedelta(days=1)).isoformat(),
+        })
+        client.get('/bookings?status=none')  # استهلاك رسالة flash
+        return len(response.data)
+
+    def api_add_booking():
+        day = date(2040, 1, 1) + timedelta(days=3 * next(counter))
+        response = client.post('/api/v1/bookings', json={
+            'dress_id': 2, 'customer_name': 'قياس', 'booking_date': day.isoformat(),
+            'return_date': (day + timedelta(days=1)).isoformat(),
+        })
+        return len(response.data)
+
+    def active_booking_id():
+        with app.app_context():
+            booking = the_bride.Booking.query.filter_by(status='active').order_by(
+                the_bride.Booking.id.desc()).first()
+            return booking.id
+
+    def html_return():
+        response = client.post(f'/bookings/{active_booking_id()}/return')
+        client.get('/bookings?status=none')
+        return len(response.data)
+
+    def api_return():
+        return len(client.post(f'/api/v1/bookings/{active_booking_id()}/return').data)
+
+    cases = [
+        ('قائمة الفساتين',
+         lambda: len(client.get('/dresses').data),
+         lambda: fetch_all(client, '/api/v1/dresses')),
+        ('قائمة الحجوزات',
+         lambda: len(client.get('/bookings?status=all').data),
+         lambda: fetch_all(client, '/api/v1/bookings?status=all')),
+        ('الإتاحة',
+         lambda: len(client.post('/availability', data={'check_date': check_date, 'category': 'all'}).data),
+         lambda: fetch_all(client, f'/api/v1/availability?date={check_date}')),
+        ('إضافة حجز', html_add_booking, api_add_booking),
+        ('إرجاع حجز', html_return, api_return),
+    ]
+
+    print(f"JSON: {'orjson' if the_bride.orjson else 'json القياسية'}\n")
+    print(f"{'العملية':<16}{'HTML طلب/ث':>12}{'JSON طلب/ث':>12}{'التسريع':>9}{'HTML KB':>10}{'JSON KB':>10}")
+    for name, html_func, api_func in cases:
+        html_rate, html_size = throughput(html_func, args.seconds)
+        api_rate, api_size = throughput(api_func, args.seconds)
+        print(f'{name:<16}{html_rate:>12.1f}{api_rate:>12.1f}{api_rate / html_rate:>8.1f}x'
+              f'{html_size / 1024:>10.1f}{api_size / 1024:>10.1f}')
+
+    ok = check_invalid(client)
+    print('✅ لا أخطاء 500 للمدخلات غير الصالحة' if ok else '❌ مدخلات غير صالحة لم تُرفض بـ 400')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
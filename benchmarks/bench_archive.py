@@ -0,0 +1,127 @@
+"""قياس أرشفة الحجوزات المغلقة وأثرها على حجم جدول الحجوزات
+
+- حجم جدول booking قبل الأرشفة وبعدها
+- زمن استعلامات المسار الساخن (التعارض، الإتاحة، لوحة التحكم) قبل وبعد
+- تطابق التقارير وإجمالي الحجوزات قبل الأرشفة وبعدها
+- مقاطعة الأرشفة في منتصفها ثم استئنافها دون فقد أو تكرار
+
+مثال:
+    python benchmarks/bench_archive.py --dresses 5000 --bookings 100000
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+from common import logged_in_client, make_app, seed
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def hot_queries(the_bride, repeat):
+    """أزمنة استعلامات المسار الساخن بالمللي ثانية"""
+    Booking = the_bride.Booking
+    today = date.today()
+    dress_ids = [row[0] for row in the_bride.db.session.query(the_bride.Dress.id).limit(200)]
+
+    def conflicts():
+        for dress_id in dress_ids:
+            Booking.query.filter(Booking.dress_id == dress_id, Booking.status == 'active',
+                                 the_bride.overlapping(today, today + timedelta(days=3))).first()
+
+    return {
+        'التعارض (200 فستان)': best_of(conflicts, repeat)[0],
+        'الإتاحة': best_of(lambda: the_bride.available_dresses_query(today).count(), repeat)[0],
+        'لوحة التحكم': best_of(lambda: the_bride.build_dashboard_digest(today), repeat)[0],
+    }
+
+
+def history_totals(the_bride):
+    """عدد الحجوزات ومجموع العربون لكل شهر عبر الجدولين"""
+    history = the_bride.booking_history()
+    month = the_bride.db.func.strftime('%Y-%m', history.c.created_date)
+    return the_bride.db.session.query(month, the_bride.db.func.count(), the_bride.db.func.sum(history.c.deposit_paid)) \
+        .group_by(month).order_by(month).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=5000)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    seed(the_bride, args.dresses, args.bookings)
+    client = logged_in_client(app)
+    client.get('/')
+
+    with app.app_context():
+        db = the_bride.db
+        before_count = the_bride.Booking.query.count()
+        before_totals = history_totals(the_bride)
+        before_report = client.get('/reports').data
+        before_times = hot_queries(the_bride, args.repeat)
+
+        # مقاطعة بعد دفعتين: الدفعة الثالثة تفشل قبل الالتزام
+        bump_version = the_bride.bump_version
+        calls = []
+
+        def failing_bump(*names):
+            calls.append(names)
+            if len(calls) == 3:
+                raise RuntimeError('انقطاع مصطنع')
+            bump_version(*names)
+
+        the_bride.bump_version = failing_bump
+        try:
+            the_bride.archive_bookings(args.months, args.batch_size)
+        except RuntimeError:
+            db.session.rollback()
+        the_bride.bump_version = bump_version
+        partial = the_bride.BookingArchive.query.count()
+        print(f'بعد المقاطعة: {partial} في الأرشيف، {the_bride.Booking.query.count()} في الجدول')
+
+        start = time.perf_counter()
+        archived = the_bride.archive_bookings(args.months, args.batch_size)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f'الاستئناف: {archived} حجز في {elapsed:.0f} ms')
+
+        after_count = the_bride.Booking.query.count()
+        archive_count = the_bride.BookingArchive.query.count()
+        the_bride.invalidate_totals()
+        after_report = client.get('/reports').data
+        after_totals = history_totals(the_bride)
+        after_times = hot_queries(the_bride, args.repeat)
+
+    print(f'\nجدول booking: {before_count} ← {after_count} (الأرشيف {archive_count})')
+    print(f'{"الاستعلام":<22}{"قبل":>10}{"بعد":>10}')
+    for name, value in before_times.items():
+        print(f'{name:<22}{value:>8.2f}ms{after_times[name]:>8.2f}ms')
+
+    ok = True
+    if after_count + archive_count != before_count:
+        print('❌ عدد الحجوزات الكلي تغير')
+        ok = False
+    if before_totals != after_totals:
+        print('❌ الإحصائيات الشهرية تغيرت بعد الأرشفة')
+        ok = False
+    if before_report != after_report:
+        print('❌ صفحة التقارير تغيرت بعد الأرشفة')
+        ok = False
+    if ok:
+        print('✅ التقارير والإجماليات متطابقة، ولا فقد أو تكرار بعد الاستئناف')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""قياس النسخ الاحتياطي أثناء الكتابة، والنسخ التزايدي للصور، والاستعادة المتحقق منها
+
+- سرعة النسخ (MB/s) وزمن توقف الكاتب (أطول كتابة و p99) أثناء نسخ على خطوات
+  مقابل نسخ في خطوة واحدة، مع كاتب مستمر في خيط آخر
+- النسخ التزايدي للصور: أول تشغيل ثم تشغيل بعد تغيير عدد قليل من الصور
+- الاستعادة من نسخة بدون صور + مخزن البصمات، ومقارنة الصفوف والصور بالأصل
+
+مثال:
+    python benchmarks/bench_backup.py --dresses 3000 --images 1000 --image-kb 150
+    python benchmarks/bench_backup.py --profile default   # بدون WAL
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import Writer, make_app, seed
+
+
+def images_signature(the_bride):
+    rows = the_bride.db.session.query(the_bride.Dress.id, the_bride.ImageBlob.data) \
+        .join(the_bride.ImageBlob, the_bride.Dress.image_id == the_bride.ImageBlob.id).order_by(the_bride.Dress.id)
+    digest = hashlib.sha256()
+    for dress_id, image_data in rows:
+        digest.update(str(dress_id).encode() + hashlib.sha256(image_data).digest())
+    return digest.hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=3000)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--images', type=int, default=1000)
+    parser.add_argument('--image-kb', type=int, default=150)
+    parser.add_argument('--profile', choices=['production', 'default'], default='production')
+    parser.add_argument('--write-interval', type=float, default=0.002)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='the_bride_backup_bench_')
+    db_path = os.path.join(work, 'live.db')
+    app, the_bride = make_app(db_path, SQLITE_PROFILE=args.profile)
+    seed(the_bride, args.dresses, args.bookings)
+    rng = random.Random(7)
+    Dress = the_bride.Dress
+
+    with app.app_context():
+        db = the_bride.db
+        ids = [row[0] for row in db.session.query(Dress.id).order_by(Dress.id).limit(args.images)]
+        # 10% من الصور مكررة بين أكثر من فستان
+        pool = [os.urandom(args.image_kb * 1024) for _ in range(max(len(ids) * 9 // 10, 1))]
+        for dress_id in ids:
+            db.session.execute(db.update(Dress).where(Dress.id == dress_id).values(
+                image_id=the_bride.store_image(rng.choice(pool))))
+        db.session.commit()
+        size_mb = os.path.getsize(db_path) / 1024 / 1024
+        print(f'القاعدة: {size_mb:.1f} MB، {len(ids)} صورة، الوضع {args.profile}')
+
+        print(f'\n{"طريقة النسخ":<18}{"الزمن":>9}{"MB/s":>9}{"خطوات":>7}{"إعادات":>7}{"كتابات":>8}{"أطول كتابة":>12}{"p99":>10}')
+        for label, pages in (('خطوة واحدة', -1), ('على خطوات', the_bride.BACKUP_PAGES_PER_STEP)):
+            writer = Writer(db_path, args.write_interval)
+            writer.start()
+            time.sleep(0.2)
+            stats = the_bride.backup_database(os.path.join(work, f'full{pages}.db'), pages=pages)
+            writes, worst, p99 = writer.stop()
+            print(f'{label:<18}{stats["seconds"]:>8.2f}s{size_mb / stats["seconds"]:>9.0f}{stats["steps"]:>7}'
+                  f'{stats["restarts"]:>7}{writes:>8}{worst:>10.1f}ms{p99:>8.1f}ms')
+
+        snapshot = os.path.join(work, 'snapshot.db')
+        stats = the_bride.backup_database(snapshot, include_images=False)
+        print(f'\nنسخة بدون صور: {stats["bytes"] / 1024 / 1024:.1f} MB في {stats["total_seconds"]:.2f}s')
+
+        images_dir = os.path.join(work, 'images')
+        first = the_bride.backup_images(images_dir)
+        print(f'الصور (أول تشغيل): {first["written"]} ملف، {first["bytes_written"] / 1024 / 1024:.1f} MB '
+              f'في {first["seconds"]:.2f}s')
+
+        # تغيير 10 صور كما في مسار التعديل: الصورة الجديدة أولاً ثم تحرير القديمة
+        for dress_id in ids[:10]:
+            dress = db.session.get(Dress, dress_id)
+            previous = dress.image_id
+            dress.image_id = the_bride.store_image(os.urandom(args.image_kb * 1024))
+            db.session.flush()
+            the_bride.release_image(previous)
+        db.session.commit()
+        second = the_bride.backup_images(images_dir)
+        print(f'الصور (تزايدي بعد تعديل 10): {second["images"]} بصمة، كُتب {second["written"]} '
+              f'({second["bytes_written"] / 1024 / 1024:.1f} MB) في {second["seconds"] * 1000:.0f} ms')
+
+        snapshot = os.path.join(work, 'snapshot2.db')
+        the_bride.backup_database(snapshot, include_images=False)
+        expected_images = images_signature(the_bride)
+        expected_rows = the_bride.verify_snapshot(snapshot)
+
+        # إتلاف البيانات الحية ثم الاستعادة
+        db.session.execute(db.delete(the_bride.Booking))
+        db.session.execute(db.update(the_bride.ImageBlob).values(data=b''))
+        db.session.commit()
+        start = time.perf_counter()
+        restored = the_bride.restore_database(snapshot, images_dir)
+        elapsed = time.perf_counter() - start
+        print(f'\nالاستعادة: {restored["rows"]}، {restored["images"]} صورة في {elapsed:.2f}s')
+
+        ok = images_signature(the_bride) == expected_images and restored['rows'] == expected_rows
+        with open(snapshot, 'r+b') as f:
+            f.seek(4096 * 3)
+            f.write(b'\0' * 4096)
+        try:
+            the_bride.verify_snapshot(snapshot)
+            print('❌ النسخة التالفة اجتازت الفحص')
+            ok = False
+        except ValueError as e:
+            print(f'النسخة التالفة رُفضت: {e}')
+
+    print('✅ الاستعادة مطابقة للأصل' if ok else '❌ الاستعادة لا تطابق الأصل')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""قياس العمليات الجماعية على الحجوزات مقابل طلب لكل حجز
+
+- زمن إرجاع N حجز بطلب واحد (/api/v1/bookings/bulk) مقابل N طلب إرجاع منفصل
+- نتائج كل معرف: غير موجود، غير نشط، تعارض التأجيل
+- سلسلة تعارضات: حجز مختار يُرفض فيبقى مكانه ويمنع تأجيل حجز قبله إلى نفس الأيام
+- صحة إتاحة الفساتين وسجل التدقيق وسجل التغييرات بعد العملية
+
+مثال:
+    python benchmarks/bench_bulk.py --dresses 3000 --bookings 30000 --count 500
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+from common import logged_in_client, make_app, seed
+
+
+def active_ids(the_bride, count, offset=0):
+    Booking = the_bride.Booking
+    return [row[0] for row in the_bride.db.session.query(Booking.id).filter(Booking.status == 'active')
+            .order_by(Booking.id).offset(offset).limit(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=3000)
+    parser.add_argument('--bookings', type=int, default=30000)
+    parser.add_argument('--count', type=int, default=500)
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    seed(the_bride, args.dresses, args.bookings)
+    client = logged_in_client(app)
+    client.get('/')
+    Booking, Dress, SystemLog, ChangeLog = the_bride.Booking, the_bride.Dress, the_bride.SystemLog, the_bride.ChangeLog
+
+    with app.app_context():
+        single_ids = active_ids(the_bride, args.count)
+        bulk_ids = active_ids(the_bride, args.count, args.count)
+        logs_before = SystemLog.query.count()
+
+    start = time.perf_counter()
+    for booking_id in single_ids:
+        assert client.post(f'/api/v1/bookings/{booking_id}/return').status_code == 200
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post('/api/v1/bookings/bulk', json={'action': 'return', 'ids': bulk_ids})
+    bulk = time.perf_counter() - start
+    assert response.status_code == 200, response.get_json()
+
+    print(f'إرجاع {args.count} حجز:')
+    print(f'  طلب لكل حجز: {single * 1000:8.0f} ms')
+    print(f'  طلب واحد:     {bulk * 1000:8.0f} ms ({single / bulk:.0f}x)')
+
+    ok = bulk < 1.0
+    if not ok:
+        print('❌ الإرجاع الجماعي تجاوز ثانية واحدة')
+
+    # نتائج مختلطة: محجوز مسبقاً، غير موجود، تكرار
+    mixed = client.post('/api/v1/bookings/bulk', json={'action': 'cancel', 'ids': bulk_ids[:2] + [10 ** 9, bulk_ids[0]]})
+    results = [item['result'] for item in mixed.get_json()['results']]
+    print(f'\nنتائج مختلطة: {results}')
+    if results != ['not_active', 'not_active', 'not_found']:
+        ok = False
+
+    with app.app_context():
+        db = the_bride.db
+        returned = Booking.query.filter(Booking.id.in_(bulk_ids), Booking.status == 'returned',
+                                        Booking.return_date == date.today()).count()
+        logs = SystemLog.query.count() - logs_before
+        changes = ChangeLog.query.filter(ChangeLog.entity == 'booking', ChangeLog.entity_id.in_(bulk_ids)).count()
+        # الفستان متاح إذا لم يُوقف يدوياً ولم يبقَ له حجز نشط يشمل اليوم
+        wrong = Dress.query.filter(
+            Dress.id.in_(db.session.query(Booking.dress_id).filter(Booking.id.in_(bulk_ids))),
+            Dress.is_available != (Dress.in_service & ~the_bride.rented_on(date.today()))).count()
+        print(f'مُرجعة: {returned}/{len(bulk_ids)}، سجل التدقيق: {logs}، سجل التغييرات: {changes}، إتاحة خاطئة: {wrong}')
+        if returned != len(bulk_ids) or logs != 2 * args.count or changes < len(bulk_ids) or wrong:
+            ok = False
+
+        # تأجيل يتعارض مع حجز آخر لنفس الفستان
+        first, second = db.session.query(Booking).filter(Booking.status == 'active').order_by(Booking.id).limit(2).all()
+        far = date.today() + timedelta(days=900)
+        first.booking_date, first.return_date = far, far + timedelta(days=2)
+        second.dress_id = first.dress_id
+        second.booking_date, second.return_date = far + timedelta(days=10), far + timedelta(days=12)
+        db.session.commit()
+        ids = [first.id, second.id]
+
+    together = client.post('/api/v1/bookings/bulk', json={'action': 'reschedule', 'ids': ids, 'days': 10}).get_json()
+    alone = client.post('/api/v1/bookings/bulk', json={'action': 'reschedule', 'ids': ids[:1], 'days': 10}).get_json()
+    print(f'تأجيل الحجزين معاً: {[item["result"] for item in together["results"]]}، '
+          f'تأجيل الأول وحده: {[item["result"] for item in alone["results"]]}')
+    if [item['result'] for item in together['results']] != ['ok', 'ok'] or alone['results'][0]['result'] != 'conflict':
+        ok = False
+
+    # A=[+1,+3] و B=[+5,+7] و C=[+8,+10] لنفس الفستان، وتأجيل A و B أربعة أيام:
+    # B يتعارض مع C فيبقى مكانه، و A لا يجب أن ينتقل فوقه إلى [+5,+7]
+    with app.app_context():
+        chain = db.session.query(Booking).filter(Booking.status == 'active').order_by(Booking.id).offset(2).limit(3).all()
+        base = date.today() + timedelta(days=1200)
+        for booking, (start, end) in zip(chain, ((1, 3), (5, 7), (8, 10))):
+            booking.dress_id = chain[0].dress_id
+            booking.booking_date, booking.return_date = base + timedelta(days=start), base + timedelta(days=end)
+        db.session.commit()
+        chain_ids = [booking.id for booking in chain]
+    response = client.post('/api/v1/bookings/bulk', json={'action': 'reschedule', 'ids': chain_ids[:2], 'days': 4})
+    chain_results = [item['result'] for item in response.get_json()['results']]
+    with app.app_context():
+        placed = sorted((booking.booking_date, booking.return_date) for booking in Booking.query.filter(
+            Booking.id.in_(chain_ids)))
+        double_booked = any(later[0] <= earlier[1] for earlier, later in zip(placed, placed[1:]))
+    print(f'سلسلة التعارض (A و B مع بقاء C): {chain_results}، حجز مزدوج بعد التأجيل: {double_booked}')
+    if chain_results != ['conflict', 'conflict'] or double_booked:
+        ok = False
+
+    print('✅ النتائج صحيحة' if ok else '❌ فشل التحقق')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""خطط الاستعلام (EXPLAIN) وزمن تصفية الكتالوج حسب السعر والمقاس والتصنيف
+
+لكل تركيبة من الفلاتر يبني نفس استعلام صفحة /dresses (filter_catalog مع
+الترتيب المطلوب)، ويطبع خطة SQLite ويتأكد أن جدول الفساتين لا يُقرأ كاملاً
+(لا يوجد SCAN dress)، ثم يقيس زمن الاستعلام وعدد النتائج.
+لا يُشغَّل ANALYZE (التطبيق لا يشغله): مع إحصاءاته قد يفضل SQLite قراءة فهرس
+رقم الفستان مرتباً للفلاتر ضعيفة الانتقائية مثل تصنيف واحد من خمسة.
+
+مثال:
+    python benchmarks/bench_catalog_filters.py --dresses 20000
+"""
+import argparse
+import re
+import sys
+import time
+
+from werkzeug.datastructures import MultiDict
+
+from common import CATEGORIES, FABRICS, SIZES, make_app, seed
+
+CASES = [
+    ('نطاق سعر', {'min_price': '2000', 'max_price': '3000'}, 'price'),
+    ('نطاق سعر (الأعلى أولاً)', {'min_price': '8000'}, 'price_desc'),
+    ('مقاسان + سعر', {'size': ['M', 'L'], 'max_price': '1500'}, 'price'),
+    ('تصنيف + مقاس + سعر', {'category': CATEGORIES[0], 'size': 'M', 'min_price': '1000', 'max_price': '4000'},
+     'popular'),
+    ('تصنيف + مقاسات', {'category': CATEGORIES[1], 'size': SIZES[:3]}, 'number'),
+    ('مقاس + قماشان', {'size': 'S', 'fabric': FABRICS[:2]}, 'price'),
+]
+
+
+def build_query(the_bride, params, sort):
+    args = MultiDict([(key, item) for key, value in params.items()
+                      for item in (value if isinstance(value, list) else [value])])
+    query = the_bride.filter_catalog(the_bride.db.session.query(the_bride.Dress.id), args)
+    return query.order_by(*the_bride.DRESS_SORTS[sort])
+
+
+def query_plan(the_bride, query):
+    db = the_bride.db
+    sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    seed(the_bride, dresses=args.dresses, bookings=0)
+    failures = 0
+    with app.test_request_context():
+        the_bride.migrate_dress_tags()
+        for name, params, sort in CASES:
+            query = build_query(the_bride, params, sort)
+            plan = query_plan(the_bride, query)
+            full_scan = any(re.match(r'SCAN dress\b', step) for step in plan)
+            failures += full_scan
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                rows = query.all()
+                timings.append(time.perf_counter() - start)
+            print(f"{name} (sort={sort}): {len(rows)} نتيجة، {min(timings) * 1000:.2f} ms"
+                  f"{' ← قراءة كاملة للجدول!' if full_scan else ''}")
+            for step in plan:
+                print(f'    {step}')
+    if failures:
+        sys.exit(f'{failures} استعلام يقرأ جدول الفساتين كاملاً')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""فحص التحكم المتفائل بالتزامن مع كتّاب متزامنين
+
+- عدة موظفين (خيوط) يعدّلون نفس الفستان: كل تعديل يقرأ النموذج ثم يضيف علامة إلى
+  التفاصيل ويحفظ. مع الإصدار لا تضيع أي علامة (التعارض يعيد المحاولة)، وبدونه تضيع
+- إرجاع نفس الحجز من عدة خيوط في نفس اللحظة: إرجاع واحد فقط ينجح والباقي 409
+- الحجز والإرجاع والصيانة بعد فتح نموذج التعديل لا تسبب 409 عند حفظه
+
+مثال:
+    python benchmarks/bench_concurrency.py --threads 8 --edits 20
+"""
+import argparse
+import html
+from datetime import date, timedelta
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+from common import logged_in_client, make_app, seed
+
+VERSION = re.compile(r'name="version" value="(\d+)"')
+DETAILS = re.compile(r'<textarea name="details" rows="3">(.*?)</textarea>', re.S)
+FORM = {'model_name': 'Model', 'category': 'سواريه', 'color': 'ذهبي', 'fabric_types': 'تول',
+        'rental_price': '1500', 'size': 'M', 'in_service': 'on'}
+
+
+def editor(app, dress_id, marker, edits, use_version, stats):
+    client = logged_in_client(app)
+    client.get('/')
+    done = 0
+    while done < edits:
+        page = client.get(f'/dresses/{dress_id}/edit').get_data(as_text=True)
+        details = html.unescape(DETAILS.search(page).group(1))
+        form = dict(FORM, details=f'{details} [{marker}.{done}]')
+        if use_version:
+            form['version'] = VERSION.search(page).group(1)
+        response = client.post(f'/dresses/{dress_id}/edit', data=form)
+        if response.status_code == 409:
+            stats['conflicts'] += 1
+            continue
+        assert response.status_code == 302, response.status_code
+        done += 1
+
+
+def run_editors(app, the_bride, dress_id, threads, edits, use_version):
+    stats = {'conflicts': 0}
+    workers = [threading.Thread(target=editor, args=(app, dress_id, f't{i}', edits, use_version, stats))
+               for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        details = the_bride.db.session.get(the_bride.Dress, dress_id).details
+    kept = sum(f'[t{i}.{k}]' in details for i in range(threads) for k in range(edits))
+    return kept, stats['conflicts'], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--edits', type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='the_bride_concurrency_'), 'bench.db')
+    app, the_bride = make_app(db_path)
+    seed(the_bride, 20, 200)
+    total = args.threads * args.edits
+    ok = True
+
+    with app.app_context():
+        first, second = [row[0] for row in the_bride.db.session.query(the_bride.Dress.id).order_by(the_bride.Dress.id)
+                         .limit(2)]
+
+    print(f'{args.threads} خيوط × {args.edits} تعديل على نفس الفستان:')
+    for label, dress_id, use_version in (('بدون إصدار', first, False), ('مع الإصدار', second, True)):
+        kept, conflicts, elapsed = run_editors(app, the_bride, dress_id, args.threads, args.edits, use_version)
+        print(f'  {label:<12} محفوظ {kept}/{total}، تعارضات {conflicts}، {total / elapsed:.0f} تعديل/ثانية')
+        if use_version and kept != total:
+            print('❌ ضاعت تعديلات رغم شرط الإصدار')
+            ok = False
+
+    with app.app_context():
+        Booking = the_bride.Booking
+        booking_id = Booking.query.filter(Booking.status == 'active').order_by(Booking.id).first().id
+        logs_before = the_bride.SystemLog.query.filter_by(action='RETURN_BOOKING').count()
+
+    barrier = threading.Barrier(args.threads)
+    statuses = []
+
+    def returner():
+        client = logged_in_client(app)
+        barrier.wait()
+        statuses.append(client.post(f'/api/v1/bookings/{booking_id}/return').status_code)
+
+    workers = [threading.Thread(target=returner) for _ in range(args.threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    with app.app_context():
+        logs = the_bride.SystemLog.query.filter_by(action='RETURN_BOOKING').count() - logs_before
+    print(f'\nإرجاع نفس الحجز من {args.threads} خيوط: {sorted(statuses)}، سجلات الإرجاع {logs}')
+    if statuses.count(200) != 1 or logs != 1:
+        print('❌ أكثر من إرجاع نجح لنفس الحجز')
+        ok = False
+
+    # الإصدار في JSON قد يصل نصاً من بعض العملاء
+    with app.app_context():
+        booking = Booking.query.filter(Booking.status == 'active').order_by(Booking.id).first()
+        booking_id, version = booking.id, booking.version
+    client = logged_in_client(app)
+    invalid = client.post(f'/api/v1/bookings/{booking_id}/return', json={'version': 'abc'}).status_code
+    as_text = client.post(f'/api/v1/bookings/{booking_id}/return', json={'version': str(version)}).status_code
+    print(f'الإصدار كنص غير رقمي: {invalid}، الإصدار الحالي كنص: {as_text}')
+    if invalid != 400 or as_text != 200:
+        ok = False
+
+    # الحجز والإرجاع والصيانة لا تغير إصدار الفستان، فالنموذج المفتوح قبلها يُحفظ
+    with app.app_context():
+        dress = the_bride.Dress.query.order_by(the_bride.Dress.id.desc()).first()
+        dress_id = dress.id
+        form = {'dress_number': dress.dress_number, 'category': dress.category or '', 'size': dress.size or '',
+                'rental_price': str(dress.rental_price), 'in_service': 'on', 'details': 'بعد الحجز'}
+    page = client.get(f'/dresses/{dress_id}/edit').get_data(as_text=True)
+    form['version'] = VERSION.search(page).group(1)
+    today = date.today()
+    booking = client.post('/api/v1/bookings', json={
+        'dress_id': dress_id, 'customer_name': 'قياس', 'booking_date': today.isoformat(),
+        'return_date': (today + timedelta(days=1)).isoformat()}).get_json()
+    client.post(f"/api/v1/bookings/{booking['id']}/return")
+    with app.app_context():
+        the_bride.run_maintenance()
+    saved = client.post(f'/dresses/{dress_id}/edit', data=form).status_code
+    print(f'حفظ نموذج فُتح قبل الحجز والإرجاع والصيانة: {saved}')
+    if saved != 302:
+        ok = False
+
+    print('✅ لا تضيع تعديلات ولا يتكرر الإرجاع' if ok else '❌ فشل التحقق')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
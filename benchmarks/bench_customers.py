@@ -0,0 +1,116 @@
+"""قياس ربط الحجوزات بالعملاء والبحث عن سجل عميل برقم هاتفه
+
+- زمن الربط على دفعات (حجز/ثانية) وأطول توقف لكاتب مستمر أثناءه
+- صحة إزالة التكرار: عميل واحد لكل رقم بعد توحيد الصيغة، وكل حجز برقم مرتبط
+- البحث عن حجوزات رقم هاتف: البحث النصي (LIKE) مقابل فهرس العملاء، مع خطة الاستعلام
+
+مثال:
+    python benchmarks/bench_customers.py --dresses 2000 --bookings 200000 --customers 40000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import Writer, logged_in_client, make_app, seed
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def phone_formats(number):
+    """نفس الرقم بالصيغ التي يكتبها الموظفون"""
+    return [f'05{number:08d}', f'+9665{number:08d}', f'00966 5{number:08d}', f'05{number:08d} ']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=2000)
+    parser.add_argument('--bookings', type=int, default=200000)
+    parser.add_argument('--customers', type=int, default=40000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='the_bride_customers_'), 'bench.db')
+    app, the_bride = make_app(db_path)
+    seed(the_bride, args.dresses, args.bookings)
+    rng = random.Random(3)
+    Booking, Customer = the_bride.Booking, the_bride.Customer
+
+    with app.app_context():
+        db = the_bride.db
+        ids = [row[0] for row in db.session.query(Booking.id)]
+        numbers = {}
+        for i in range(0, len(ids), 5000):
+            updates = []
+            for booking_id in ids[i:i + 5000]:
+                numbers[booking_id] = rng.randrange(args.customers)
+                updates.append({'b_id': booking_id, 'b_phone': rng.choice(phone_formats(numbers[booking_id]))})
+            table = Booking.__table__
+            db.session.execute(table.update().where(table.c.id == db.bindparam('b_id'))
+                               .values(customer_phone=db.bindparam('b_phone')), updates)
+        db.session.commit()
+        archived = the_bride.archive_bookings()
+        print(f'{len(ids)} حجز ({archived} في الأرشيف) لـ {len(set(numbers.values()))} رقم بصيغ مختلفة')
+
+        writer = Writer(db_path, 0.002)
+        writer.start()
+        start = time.perf_counter()
+        result = the_bride.migrate_customers(args.batch_size)
+        elapsed = time.perf_counter() - start
+        writes, worst, p99 = writer.stop()
+        print(f'الربط: {result} في {elapsed:.1f}s ({result["bookings"] / elapsed:.0f} حجز/ثانية)')
+        print(f'الكاتب أثناء الربط: {writes} كتابة، أطولها {worst:.1f} ms، p99 {p99:.1f} ms')
+        again = the_bride.migrate_customers(args.batch_size)
+
+        ok = True
+        customers = Customer.query.count()
+        unlinked = sum(model.query.filter(model.customer_id == None).count()
+                       for model in (Booking, the_bride.BookingArchive))
+        if customers != len(set(numbers.values())) or unlinked or again['bookings']:
+            print(f'❌ عملاء {customers}، غير مرتبط {unlinked}، إعادة التشغيل ربطت {again["bookings"]}')
+            ok = False
+
+        number = numbers[ids[len(ids) // 2]]
+        phone = f'05{number:08d}'
+        like, rows = best_of(lambda: Booking.query.filter(Booking.customer_phone.contains(phone)).count(), args.repeat)
+        customer = the_bride.find_customer(phone)
+        history = the_bride.booking_history()
+        query = db.session.query(history).filter(history.c.customer_id == customer.id)
+        indexed, count = best_of(lambda: query.count(), args.repeat)
+        print(f'\nحجوزات الرقم {phone}:')
+        print(f'  LIKE على booking فقط:      {like:8.2f} ms ({rows} حجز، الصيغ الأخرى لا تُطابق)')
+        print(f'  فهرس العملاء (مع الأرشيف): {indexed:8.2f} ms ({count} حجز)')
+        if count != sum(1 for value in numbers.values() if value == number):
+            print('❌ سجل العميل لا يشمل كل حجوزاته')
+            ok = False
+
+        plan = db.session.execute(db.text('EXPLAIN QUERY PLAN ' + str(query.statement.compile(
+            db.engine, compile_kwargs={'literal_binds': True})))).all()
+        for row in plan:
+            print(f'  {row[-1]}')
+        if any(row[-1].startswith('SCAN') and 'booking' in row[-1] for row in plan):
+            print('❌ سجل العميل يمسح جدول الحجوزات بدل استخدام الفهرس')
+            ok = False
+
+    client = logged_in_client(app)
+    client.get('/')
+    page, response = best_of(lambda: client.get(f'/customers/{customer.id}'), args.repeat)
+    assert response.status_code == 200
+    print(f'صفحة سجل العميل: {page:.2f} ms')
+
+    print('✅ عميل واحد لكل رقم وكل الحجوزات مرتبطة' if ok else '❌ فشل التحقق')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""قياس ذاكرة بيانات الفساتين (LRU) والتحقق من تماسكها بين العمليات
+
+- زمن البحث عن فستان: session.get كما في Dress.query.get (يحمّل الصورة) مقابل الذاكرة باردة ودافئة
+- إنتاجية صفحات التعديل والصور وإضافة الحجز مع الذاكرة معطلة، ومفعلة مع فحص سجل التغييرات
+  في كل طلب، ومفعلة مع الفحص مرة كل DRESS_CACHE_SYNC_SECONDS، ونسبة الإصابة
+- تعديل فستان من عملية أخرى (عامل ثانٍ) ثم التحقق أن العملية الأولى ترى التعديل
+  بعد فحص سجل التغييرات التالي
+- إضافة حجز تعدّل عدادات الفستان (booking_count) فتلغيه دائماً: نسبة إصابتها 0% بطبيعتها
+- داخل نفس العملية بعدة خيوط (gthread): عدادات الإصابة دقيقة، والقراءة التي تسبق إلغاءً
+  لا تعيد حفظ القيمة القديمة
+
+مثال:
+    python benchmarks/bench_dress_cache.py --dresses 2000 --image-kb 80 --seconds 2
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from common import logged_in_client, make_app, seed
+
+
+def attach_images(the_bride, size_kb):
+    """صور وهمية بحجم ثابت لكل الفساتين عدا فستان من كل عشرة"""
+    blob = os.urandom(size_kb * 1024)
+    with the_bride.app.app_context():
+        Dress = the_bride.Dress
+        blob_id = the_bride.store_image(blob)
+        the_bride.db.session.execute(the_bride.db.update(Dress).where(Dress.id % 10 != 0).values(image_id=blob_id))
+        the_bride.db.session.commit()
+        the_bride.recount_images()
+
+
+def lookup_timings(app, the_bride, ids):
+    """متوسط زمن البحث بالميكروثانية لكل طريقة"""
+    results = {}
+    with app.app_context():
+        start = time.perf_counter()
+        for dress_id in ids:
+            the_bride.db.session.get(the_bride.Dress, dress_id)
+            the_bride.db.session.expunge_all()
+        results['session.get'] = time.perf_counter() - start
+
+    the_bride.dress_cache.clear()
+    for label in ('cache cold', 'cache warm'):
+        with app.test_request_context():
+            start = time.perf_counter()
+            for dress_id in ids:
+                the_bride.dress_cache.get(dress_id)
+            results[label] = time.perf_counter() - start
+    return {label: elapsed / len(ids) * 1e6 for label, elapsed in results.items()}
+
+
+def throughput(func, seconds):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func()
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def edit_in_other_process(db_path, dress_id, model_name):
+    """تشغيل عامل ثانٍ على نفس قاعدة البيانات يعدل الفستان عبر صفحة التعديل"""
+    subprocess.run([sys.executable, os.path.abspath(__file__), '--worker-edit', db_path, str(dress_id), model_name],
+                   check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def worker_edit(db_path, dress_id, model_name):
+    app, the_bride = make_app(db_path)
+    client = logged_in_client(app)
+    with app.test_request_context():
+        dress = the_bride.dress_cache.get(dress_id)
+    client.post(f'/dresses/{dress_id}/edit', data={
+        'model_name': model_name, 'category': dress.category, 'color': dress.color,
+        'fabric_types': dress.fabric_types, 'rental_price': dress.rental_price, 'size': dress.size,
+        'details': dress.details, 'in_service': 'on' if dress.in_service else '',
+    })
+
+
+def check_threads(app, the_bride, ids, threads=8):
+    """عدادات الإصابة بعدة خيوط، وقراءة بطيئة يسبقها تعديل وإلغاء قبل أن تحفظ نتيجتها"""
+    cache, db, Dress = the_bride.dress_cache, the_bride.db, the_bride.Dress
+    cache.clear()
+    cache.hits = cache.misses = 0
+
+    def lookups(chunk):
+        with app.test_request_context():
+            for dress_id in chunk:
+                cache.get(dress_id)
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lookups, [ids[i::threads] for i in range(threads)]))
+    stats = cache.stats()
+    counted = stats['hits'] + stats['misses'] == len(ids)
+
+    target = ids[0]
+    cache.invalidate(target)
+    loading, release = threading.Event(), threading.Event()
+    reader = {}
+
+    def pause_reader(conn, cursor, statement, parameters, context, executemany):
+        if threading.current_thread() is reader.get('thread') and 'FROM dress' in statement:
+            loading.set()
+            release.wait(10)
+
+    def read():
+        with app.test_request_context():
+            cache.get(target)
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'after_cursor_execute', pause_reader)
+    try:
+        reader['thread'] = threading.Thread(target=read)
+        reader['thread'].start()
+        loading.wait(10)
+        # القارئ قرأ الصف القديم ولم يحفظه بعد: مسار الكتابة يعدل ويلغي
+        with app.app_context():
+            db.session.execute(db.update(Dress).where(Dress.id == target).values(
+                model_name='بعد الإلغاء', version=Dress.version + 1))
+            db.session.commit()
+        cache.invalidate(target)
+        release.set()
+        reader['thread'].join()
+    finally:
+        event.remove(engine, 'after_cursor_execute', pause_reader)
+    with app.test_request_context():
+        fresh = cache.get(target).model_name == 'بعد الإلغاء'
+    print(f'\n{threads} خيوط: {len(ids)} بحث، إصابة + إخفاق = {stats["hits"] + stats["misses"]}؛ '
+          f"القراءة المتزامنة مع الإلغاء لم تحفظ القيمة القديمة: {'نعم' if fresh else 'لا'}")
+    return counted and fresh
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=2000)
+    parser.add_argument('--image-kb', type=int, default=80)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--seconds', type=float, default=2)
+    parser.add_argument('--worker-edit', nargs=3, metavar=('DB', 'ID', 'NAME'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_edit:
+        db_path, dress_id, model_name = args.worker_edit
+        worker_edit(db_path, int(dress_id), model_name)
+        return
+
+    db_path = os.path.join(__import__('tempfile').mkdtemp(prefix='the_bride_bench_'), 'bench.db')
+    app, the_bride = make_app(db_path)
+    seed(the_bride, args.dresses, bookings=0)
+    attach_images(the_bride, args.image_kb)
+    rng = random.Random(7)
+    # وصول غير متساوٍ: معظم الطلبات على نسبة صغيرة من الفساتين
+    hot = [rng.randint(1, args.dresses) for _ in range(max(args.dresses // 20, 1))]
+    ids = [rng.choice(hot) if rng.random() < 0.8 else rng.randint(1, args.dresses) for _ in range(args.lookups)]
+
+    print(f"{'البحث عن فستان':<20}{'µs/بحث':>10}")
+    for label, micros in lookup_timings(app, the_bride, ids).items():
+        print(f'{label:<20}{micros:>10.1f}')
+
+    client = logged_in_client(app)
+    client.get('/')
+    counter = iter(range(10 ** 9))
+
+    def add_booking():
+        day = date(2050, 1, 1) + timedelta(days=3 * next(counter))
+        client.post('/api/v1/bookings', json={
+            'dress_id': rng.choice(ids), 'customer_name': 'قياس', 'booking_date': day.isoformat(),
+            'return_date': (day + timedelta(days=1)).isoformat(),
+        })
+
+    cases = [
+        ('صفحة التعديل', lambda: client.get(f'/dresses/{rng.choice(ids)}/edit')),
+        ('صورة بدون ملف', lambda: client.get(f'/dresses/{rng.choice(hot) // 10 * 10 or 10}/image')),
+        ('إضافة حجز', add_booking),
+    ]
+    cache = the_bride.dress_cache
+    print(f"\n{'العملية':<16}{'بدون ذاكرة':>12}{'فحص كل طلب':>12}{'مع الذاكرة':>12}{'الإصابة':>10}")
+    for name, func in cases:
+        cache.max_size = 0
+        cold = throughput(func, args.seconds)
+        cache.max_size = the_bride.DRESS_CACHE_SIZE
+        # الذاكرة مع فحص سجل التغييرات في كل طلب (السلوك قبل تحديد فترة الفحص)
+        cache.sync_interval = 0
+        every_request = throughput(func, args.seconds)
+        cache.sync_interval = the_bride.DRESS_CACHE_SYNC_SECONDS
+        cache.hits = cache.misses = 0
+        warm = throughput(func, args.seconds)
+        hit_rate = client.get('/api/v1/stats/cache').get_json()['dress']['hit_rate'] or 0
+        print(f'{name:<16}{cold:>12.1f}{every_request:>12.1f}{warm:>12.1f}{hit_rate * 100:>9.1f}%')
+
+    # التماسك بين العمليات: الصفحة تُقرأ من الذاكرة ثم تُعدل في عملية أخرى
+    target = hot[0]
+    client.get(f'/dresses/{target}/edit')
+    edit_in_other_process(db_path, target, 'عدلها عامل آخر')
+    # تعديلات العمليات الأخرى تظهر بعد فحص سجل التغييرات التالي (كل sync_interval ثانية)
+    time.sleep(the_bride.dress_cache.sync_interval)
+    coherent = 'عدلها عامل آخر' in client.get(f'/dresses/{target}/edit').get_data(as_text=True)
+    print(f"\nالتماسك بين العمليات: {'نعم' if coherent else 'لا'}")
+    print('إحصاءات الذاكرة:', client.get('/api/v1/stats/cache').get_json()['dress'])
+    threaded = check_threads(app, the_bride, ids)
+    if not (coherent and threaded):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
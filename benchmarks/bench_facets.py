@@ -0,0 +1,79 @@
+"""قياس قائمة التصنيفات وعدد الفساتين لكل قيمة (facets)
+
+لكل حجم كتالوج يقارن زمن:
+  - SELECT DISTINCT category (الطريقة السابقة، بدون أعداد)
+  - تجميع لكل عمود (التصنيف والمقاس) مع الأعداد (ذاكرة فارغة)
+  - catalog_facets() من الذاكرة (قراءة عداد الكتالوج فقط)
+ويتحقق أن أعداد التصنيف والمقاس تطابق COUNT لكل قيمة، وأن الحجز لا يلغي
+الذاكرة وأن إضافة فستان تلغيها.
+
+مثال:
+    python benchmarks/bench_facets.py --sizes 1000 20000 100000
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from common import logged_in_client, make_app, seed
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 20000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'الفساتين':>10}{'DISTINCT ms':>14}{'تجميع ms':>12}{'ذاكرة ms':>12}")
+    for size in args.sizes:
+        app, the_bride = make_app()
+        seed(the_bride, dresses=size, bookings=0)
+        Dress = the_bride.Dress
+        with app.test_request_context():
+            distinct = best_of(lambda: the_bride.db.session.query(Dress.category).distinct().all(), args.repeat)
+
+            def uncached():
+                the_bride._facet_cache.clear()
+                the_bride.catalog_facets()
+            grouped = best_of(uncached, args.repeat)
+            cached = best_of(the_bride.catalog_facets, args.repeat)
+        print(f'{size:>10}{distinct:>14.2f}{grouped:>12.2f}{cached:>12.3f}')
+
+    # الحجز لا يغير الكتالوج، وإضافة فستان تغيره
+    client = logged_in_client(app)
+    client.get('/')
+    with app.test_request_context():
+        before = the_bride._facet_cache['entry'][0]
+    day = date(2050, 1, 1) + timedelta(days=1)
+    client.post('/api/v1/bookings', json={'dress_id': 1, 'customer_name': 'قياس', 'booking_date': day.isoformat(),
+                                           'return_date': (day + timedelta(days=1)).isoformat()})
+    client.post('/dresses/add', data={'dress_number': 'FACET-1', 'category': 'فستان زفاف', 'rental_price': '100'})
+    facets = client.get('/api/v1/facets').get_json()
+    with app.test_request_context():
+        after = the_bride._facet_cache['entry'][0]
+    print(f'\nعداد الكتالوج: {before} -> {after} (الحجز لم يغيره، إضافة الفستان زادته)')
+    print('التصنيفات:', ', '.join(f"{item['value']} ({item['count']})" for item in facets['category']))
+    assert after == before + 1
+
+    # كل عدد يساوي عدد الفساتين بتلك القيمة (لا يتجزأ حسب اللون أو عمود آخر)
+    with app.test_request_context():
+        for name in the_bride.FACET_COLUMNS:
+            column = getattr(Dress, name)
+            expected = dict(the_bride.db.session.query(column, the_bride.db.func.count(Dress.id))
+                            .filter(column != '').group_by(column).all())
+            expected.pop(None, None)
+            actual = {item['value']: item['count'] for item in facets[name]}
+            assert actual == expected, (name, actual, expected)
+    print('أعداد التصنيف والمقاس تطابق COUNT لكل قيمة')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""قياس البايتات وعدد الطلبات لعرض صور صفحة من الكتالوج
+
+يقارن لصفحة واحدة من المعرض (GALLERY_PAGE_SIZE فستان):
+- فتح كل فستان على حدة (صفحة التعديل + الصورة الكاملة 800px)
+- المعرض بمصغرة لكل فستان (1x و 2x)، أول زيارة ثم زيارة متكررة من ذاكرة المتصفح
+- المعرض مع صور الصفحة في ملف واحد (sprite=1)
+ويتحقق أن كل img في المعرض يحمل width و height و loading و srcset، وأن المصغرات بالمقاس المعلن.
+أول زيارة لكل عرض تشمل إنشاء مصغراته وحفظها، والملف الواحد يُبنى من مصغرات 1x المحفوظة.
+
+مثال:
+    python benchmarks/bench_gallery.py --dresses 200
+"""
+import argparse
+import gzip
+import io
+import re
+import sys
+import time
+
+from PIL import Image
+
+from common import logged_in_client, make_app, seed
+
+HEADERS = {'Accept-Encoding': 'gzip'}
+
+
+def make_photo(index, size=(600, 800)):
+    """صورة فستان بتفاصيل مختلفة لكل رقم"""
+    x = -2.0 + (index % 20) * 0.04
+    y = -1.2 + (index // 20) * 0.04
+    blue = Image.effect_mandelbrot(size, (x, y, x + 2.4, y + 3.2), 48)
+    img = Image.merge('RGB', (Image.linear_gradient('L').resize(size), Image.radial_gradient('L').resize(size), blue))
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+class Browser:
+    """عميل يعد الطلبات والبايتات، مع ذاكرة للاستجابات immutable وETag"""
+
+    def __init__(self, client):
+        self.client = client
+        self.cache = {}
+        self.requests = 0
+        self.bytes = 0
+
+    def get(self, url):
+        cached = self.cache.get(url)
+        if cached and 'immutable' in cached.headers.get('Cache-Control', ''):
+            return cached
+        headers = dict(HEADERS)
+        if cached and cached.headers.get('ETag'):
+            headers['If-None-Match'] = cached.headers['ETag']
+        response = self.client.get(url, headers=headers)
+        self.requests += 1
+        self.bytes += len(response.data)
+        if response.status_code == 304:
+            return cached
+        self.cache[url] = response
+        return response
+
+    def reset(self):
+        self.requests = self.bytes = 0
+
+
+def text(response):
+    data = response.data
+    return (gzip.decompress(data) if response.headers.get('Content-Encoding') == 'gzip' else data).decode()
+
+
+def attribute_urls(html, pattern):
+    return [url.replace('&amp;', '&') for url in re.findall(pattern, html)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=200)
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    seed(the_bride, args.dresses, 0)
+    Dress, db = the_bride.Dress, the_bride.db
+    with app.app_context():
+        start = time.perf_counter()
+        ids = [row[0] for row in db.session.query(Dress.id).order_by(Dress.dress_number)]
+        for i, dress_id in enumerate(ids):
+            image_id = the_bride.store_image(the_bride.compress_image(make_photo(i)))
+            db.session.execute(db.update(Dress).where(Dress.id == dress_id).values(image_id=image_id))
+        the_bride.bump_version('dress', 'catalog')
+        db.session.commit()
+        print(f'{len(ids)} فستان بصورة 800px في {time.perf_counter() - start:.1f}s')
+    page_ids = ids[:the_bride.GALLERY_PAGE_SIZE]
+    ok = True
+
+    rows = []
+    browser = Browser(logged_in_client(app))
+    for dress_id in page_ids:
+        browser.get(f'/dresses/{dress_id}/edit')
+        browser.get(f'/dresses/{dress_id}/image')
+    rows.append(('فتح كل فستان على حدة', browser.requests, browser.bytes, None))
+
+    for label, query, density in (('المعرض (1x)', '', 1), ('المعرض (2x)', '', 2), ('المعرض (ملف واحد)', '&sprite=1', 1)):
+        browser = Browser(logged_in_client(app))
+        timings = []
+        for visit in range(2):
+            browser.reset()
+            start = time.perf_counter()
+            html = text(browser.get(f'/dresses?view=gallery{query}'))
+            if query:
+                images = attribute_urls(html, r"url\('([^']+)'\)")[:1]
+            elif density == 1:
+                images = attribute_urls(html, r'<img class="gallery-thumb"[^>]*?\ssrc="([^"]+)"')
+            else:
+                images = [srcset.split(', ')[1].split(' ')[0] for srcset in attribute_urls(html, r'srcset="([^"]+)"')]
+            for url in images:
+                browser.get(url)
+            timings.append(time.perf_counter() - start)
+            rows.append((f'{label} {"أول زيارة" if visit == 0 else "زيارة متكررة"}', browser.requests, browser.bytes,
+                         timings[-1]))
+        if not query and density == 1:
+            tags = re.findall(r'<img class="gallery-thumb"[^>]*>', html, re.S)
+            hinted = all('width="150"' in tag and 'height="200"' in tag and 'loading=' in tag and 'srcset=' in tag
+                         for tag in tags)
+            lazy = sum('loading="lazy"' in tag for tag in tags)
+            size = Image.open(io.BytesIO(browser.cache[images[-1]].data)).size
+            print(f'{len(tags)} مصغرة في الصفحة، {lazy} منها lazy، أبعاد معلنة في كل img: {hinted}، مقاس المصغرة {size}')
+            ok &= hinted and size == (150, 200) and len(tags) == len(page_ids)
+
+    baseline = rows[0]
+    print(f'\n{"الطريقة":<32}{"طلبات":>7}{"KB":>10}{"من الأساس":>11}{"الزمن":>10}')
+    for label, requests, size, elapsed in rows:
+        timing = f'{elapsed * 1000:.0f} ms' if elapsed is not None else '-'
+        print(f'{label:<32}{requests:>7}{size / 1024:>10.0f}{size / baseline[2] * 100:>10.1f}%{timing:>10}')
+
+    ok &= all(size < baseline[2] and requests < baseline[1] for _, requests, size, _ in rows[1:])
+    print('✅ المعرض أقل بايتات وطلبات من فتح الفساتين واحداً واحداً' if ok else '❌ نتائج غير متوقعة')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""قياس إزالة تكرار الصور: المساحة الموفرة وصحة عدادات المراجع
+
+- رفع صور الفساتين عبر /dresses/add حيث تتشارك موديلات عدة نفس الصور
+- المساحة المخزنة فعلياً مقابل نسخة لكل فستان (image_storage_report)
+- زمن الرفع عند وجود الصورة مسبقاً مقابل صورة جديدة
+- استبدال الصورة وحذفها وحذف الفستان: الصورة المشتركة تبقى حتى آخر مرجع
+- ETag ثابت لمحتوى الصورة يعطي 304 للمتصفح
+
+مثال:
+    python benchmarks/bench_image_dedupe.py --dresses 300 --photos 40
+"""
+import argparse
+import io
+import random
+import sys
+import time
+
+from PIL import Image
+
+from common import logged_in_client, make_app
+
+
+def make_photo(index, size=(1600, 1200)):
+    """صورة JPEG مختلفة لكل رقم"""
+    x = -2.0 + (index % 10) * 0.05
+    y = -1.2 + (index // 10) * 0.05
+    blue = Image.effect_mandelbrot(size, (x, y, x + 3.0, y + 2.4), 64)
+    img = Image.merge('RGB', (Image.linear_gradient('L').resize(size), Image.radial_gradient('L').resize(size), blue))
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=92)
+    return output.getvalue()
+
+
+def add_dress(client, number, photo):
+    return client.post('/dresses/add', data={
+        'dress_number': number, 'model_name': 'Dedupe', 'category': 'سواريه', 'color': 'ذهبي',
+        'fabric_types': 'شيفون', 'rental_price': '1000', 'size': 'M', 'in_service': 'on',
+        'image': (io.BytesIO(photo), 'photo.jpg'),
+    }, content_type='multipart/form-data')
+
+
+def refs_consistent(the_bride):
+    """كل عداد يساوي عدد الفساتين التي تشير إلى الصورة، ولا صورة بلا مرجع"""
+    Dress, ImageBlob, db = the_bride.Dress, the_bride.ImageBlob, the_bride.db
+    actual = dict(db.session.query(Dress.image_id, db.func.count(Dress.id))
+                  .filter(Dress.image_id != None).group_by(Dress.image_id))
+    stored = dict(db.session.query(ImageBlob.id, ImageBlob.ref_count))
+    return actual == stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=300)
+    parser.add_argument('--photos', type=int, default=40)
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    client = logged_in_client(app)
+    rng = random.Random(3)
+    photos = [make_photo(i) for i in range(args.photos)]
+    Dress, ImageBlob, db = the_bride.Dress, the_bride.ImageBlob, the_bride.db
+    ok = True
+
+    timings = {'new': [], 'shared': []}
+    seen = set()
+    for i in range(args.dresses):
+        # أول الصور لكل صورة ثم اختيار عشوائي، كما تتكرر صور الموديل بين المقاسات والألوان
+        index = i if i < args.photos else rng.randrange(args.photos)
+        start = time.perf_counter()
+        add_dress(client, f'D{i:05d}', photos[index])
+        timings['shared' if index in seen else 'new'].append(time.perf_counter() - start)
+        seen.add(index)
+
+    with app.app_context():
+        report = the_bride.image_storage_report()
+        print(f'{report["dresses_with_image"]} فستان بصورة، {report["unique_images"]} صورة مخزنة')
+        print(f'المخزن: {report["stored_bytes"] / 1024 / 1024:.1f} MB، بدون إزالة التكرار: '
+              f'{report["logical_bytes"] / 1024 / 1024:.1f} MB، الموفر: {report["saved_bytes"] / 1024 / 1024:.1f} MB '
+              f'({report["saved_percent"]}%)')
+        for label, key in (('صورة جديدة', 'new'), ('صورة موجودة', 'shared')):
+            values = timings[key]
+            print(f'زمن الرفع ({label}): {sum(values) / len(values) * 1000:.1f} ms لـ {len(values)} فستان')
+        if report['unique_images'] != args.photos or report['dresses_with_image'] != args.dresses:
+            print('❌ عدد الصور المخزنة لا يساوي عدد الصور المختلفة')
+            ok = False
+
+        blob_id, count = db.session.query(Dress.image_id, db.func.count(Dress.id)).group_by(Dress.image_id) \
+            .order_by(db.func.count(Dress.id).desc()).first()
+        sharing = [row[0] for row in db.session.query(Dress.id).filter(Dress.image_id == blob_id).order_by(Dress.id)]
+        first_etag = None
+
+    # ETag هو بصمة المحتوى، فكل الفساتين المشتركة تعطي نفس القيمة و 304 عند تطابقها
+    response = client.get(f'/dresses/{sharing[0]}/image')
+    first_etag = response.headers.get('ETag')
+    revalidated = client.get(f'/dresses/{sharing[-1]}/image', headers={'If-None-Match': first_etag})
+    print(f'\nETag: {first_etag[:16]}… → إعادة التحقق {revalidated.status_code}')
+    ok &= revalidated.status_code == 304
+
+    # استبدال صورة فستان ثم إزالة الصورة من كل من يشاركها عدا واحد، ثم حذفه
+    replacement = make_photo(args.photos + 1)
+    with app.app_context():
+        version = db.session.get(Dress, sharing[0]).version
+    client.post(f'/dresses/{sharing[0]}/edit', data={
+        'model_name': 'Dedupe', 'category': 'سواريه', 'color': 'ذهبي', 'fabric_types': 'شيفون',
+        'rental_price': '1000', 'size': 'M', 'version': str(version),
+        'image': (io.BytesIO(replacement), 'new.jpg'),
+    }, content_type='multipart/form-data')
+    for dress_id in sharing[1:-1]:
+        with app.app_context():
+            version = db.session.get(Dress, dress_id).version
+        client.post(f'/dresses/{dress_id}/edit', data={
+            'model_name': 'Dedupe', 'category': 'سواريه', 'color': 'ذهبي', 'fabric_types': 'شيفون',
+            'rental_price': '1000', 'size': 'M', 'version': str(version), 'remove_image': '1',
+            'image': (io.BytesIO(b''), ''),
+        }, content_type='multipart/form-data')
+    with app.app_context():
+        remaining = db.session.get(ImageBlob, blob_id)
+        print(f'الصورة المشتركة ({count} فستان) بعد الاستبدال والإزالة: عداد {remaining.ref_count if remaining else 0}')
+        ok &= remaining is not None and remaining.ref_count == 1
+    client.post(f'/dresses/{sharing[-1]}/delete')
+    with app.app_context():
+        gone = db.session.get(ImageBlob, blob_id) is None
+        print(f'بعد حذف آخر فستان يستخدمها: {"حُذفت" if gone else "ما زالت موجودة"}')
+        consistent = refs_consistent(the_bride)
+        recount = the_bride.recount_images()
+        print(f'العدادات مطابقة للمراجع: {consistent}، تصحيح الصيانة: {recount}')
+        ok &= gone and consistent and recount == {'fixed': 0, 'removed': 0}
+
+    print('✅ إزالة التكرار والعدادات صحيحة' if ok else '❌ خطأ في إزالة التكرار أو العدادات')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""قياس أداء مسار ضغط الصور واستهلاكه للذاكرة
+
+يولد مجموعة صور اختبارية (JPEG تدريجي، PNG بشفافية، GIF بلوحة ألوان، WebP)
+بدقات مختلفة حتى 50 ميجابكسل، ثم يشغل compress_image (أو أي مسار بديل)
+ويطبع عدد الصور في الثانية وزمن كل مرحلة وذروة الذاكرة ونسبة حجم الناتج.
+
+أمثلة:
+    python benchmarks/bench_images.py
+    python benchmarks/bench_images.py --max-mp 50 --save-baseline baseline.json
+    python benchmarks/bench_images.py --baseline baseline.json --max-regression 10
+    python benchmarks/bench_images.py --pipeline mymodule:compress_v2
+"""
+import argparse
+import importlib
+import io
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as the_bride  # noqa: E402
+
+# الدقات المختبرة (عرض، ارتفاع)
+RESOLUTIONS = [
+    (640, 480),
+    (1920, 1080),
+    (4000, 3000),     # 12MP
+    (6000, 4000),     # 24MP
+    (8660, 5774),     # 50MP
+]
+
+FORMATS = ('jpeg-progressive', 'png-rgba', 'gif-palette', 'webp')
+
+
+def make_source(size):
+    """إنشاء صورة RGB ذات تفاصيل واقعية بحجم معين"""
+    base = (1024, 768)
+    red = Image.linear_gradient('L').resize(base)
+    green = Image.radial_gradient('L').resize(base)
+    blue = Image.effect_mandelbrot(base, (-2.0, -1.2, 1.0, 1.2), 64)
+    img = Image.merge('RGB', (red, green, blue))
+    return img.resize(size, Image.Resampling.BICUBIC)
+
+
+def encode_sample(img, fmt):
+    """ترميز الصورة المصدر بالصيغة المطلوبة"""
+    output = io.BytesIO()
+    if fmt == 'jpeg-progressive':
+        img.save(output, format='JPEG', quality=92, progressive=True)
+    elif fmt == 'png-rgba':
+        rgba = img.convert('RGBA')
+        rgba.putalpha(Image.linear_gradient('L').resize(img.size))
+        rgba.save(output, format='PNG', compress_level=1)
+    elif fmt == 'gif-palette':
+        img.convert('P', palette=Image.Palette.ADAPTIVE, colors=128).save(output, format='GIF')
+    elif fmt == 'webp':
+        img.save(output, format='WEBP', quality=85, method=0)
+    return output.getvalue()
+
+
+def build_corpus(max_mp):
+    """توليد مجموعة الصور الاختبارية"""
+    corpus = []
+    for size in RESOLUTIONS:
+        megapixels = size[0] * size[1] / 1e6
+        if megapixels > max_mp + 0.5:
+            continue
+        source = make_source(size)
+        for fmt in FORMATS:
+            # WebP و GIF لا يدعمان أبعاداً أكبر من 16383 بكسل
+            if fmt in ('webp', 'gif-palette') and max(size) > 16383:
+                continue
+            corpus.append({
+                'name': f'{fmt}@{size[0]}x{size[1]}',
+                'megapixels': round(megapixels, 1),
+                'data': encode_sample(source, fmt),
+            })
+        source.close()
+    return corpus
+
+
+def load_pipeline(spec):
+    """تحميل مسار ضغط من الصيغة module:function"""
+    if spec == 'compress_image':
+        return 'compress_image', the_bride.compress_image
+    module_name, func_name = spec.split(':', 1)
+    return spec, getattr(importlib.import_module(module_name), func_name)
+
+
+def time_stages(data, max_size=(800, 800)):
+    """قياس زمن كل مرحلة من مراحل compress_image بالمللي ثانية"""
+    timings = {}
+    start = time.perf_counter()
+    img = the_bride.decode_image(data, max_size)
+    timings['decode'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    img = the_bride.resize_image(img, max_size)
+    timings['resize'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    img = the_bride.flatten_alpha(img)
+    timings['flatten'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        the_bride.encode_jpeg(img)
+    except Exception:
+        pass
+    timings['encode'] = time.perf_counter() - start
+    return {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}
+
+
+def run_case(pipeline, sample, repeat):
+    """تشغيل حالة واحدة وإرجاع مقاييسها"""
+    data = sample['data']
+
+    # تشغيل تمهيدي + قياس ذروة الذاكرة
+    tracemalloc.start()
+    output = pipeline(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        pipeline(data)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'name': sample['name'],
+        'megapixels': sample['megapixels'],
+        'input_bytes': len(data),
+        'output_bytes': len(output),
+        'size_ratio': round(len(output) / len(data), 4),
+        # المسار يعيد الملف الأصلي كما هو عند الفشل
+        'fallback': output == data,
+        'images_per_sec': round(repeat / elapsed, 2),
+        'tracemalloc_peak_mb': round(peak / 1024 / 1024, 2),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare_with_baseline(results, baseline_path, max_regression):
+    """مقارنة الإنتاجية مع خط الأساس وإرجاع قائمة التراجعات"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for pipeline_name, cases in results.items():
+        previous = {case['name']: case for case in baseline.get(pipeline_name, [])}
+        for case in cases:
+            old = previous.get(case['name'])
+            if not old:
+                continue
+            drop = (old['images_per_sec'] - case['images_per_sec']) / old['images_per_sec'] * 100
+            if drop > max_regression:
+                regressions.append(
+                    f"{pipeline_name} {case['name']}: {old['images_per_sec']} -> "
+                    f"{case['images_per_sec']} صورة/ث (-{drop:.1f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pipeline', action='append', default=[],
+                        help='مسار ضغط إضافي بصيغة module:function (يمكن تكراره)')
+    parser.add_argument('--max-mp', type=float, default=12, help='أقصى دقة بالميجابكسل (حتى 50)')
+    parser.add_argument('--repeat', type=int, default=3, help='عدد مرات التكرار لكل صورة')
+    parser.add_argument('--json', help='حفظ النتائج الكاملة في ملف JSON')
+    parser.add_argument('--save-baseline', help='حفظ النتائج كخط أساس')
+    parser.add_argument('--baseline', help='ملف خط الأساس للمقارنة')
+    parser.add_argument('--max-regression', type=float, default=10.0,
+                        help='أقصى نسبة تراجع مسموحة في الإنتاجية (٪)')
+    args = parser.parse_args()
+
+    print(f'توليد الصور الاختبارية حتى {args.max_mp}MP...')
+    corpus = build_corpus(args.max_mp)
+
+    pipelines = [load_pipeline('compress_image')] + [load_pipeline(spec) for spec in args.pipeline]
+    results = {}
+
+    for pipeline_name, pipeline in pipelines:
+        print(f'\n=== {pipeline_name} ===')
+        print(f"{'الحالة':<28}{'صورة/ث':>9}{'decode':>9}{'resize':>9}{'flatten':>9}"
+              f"{'encode':>9}{'نسبة':>8}{'ذروة MB':>9}{'RSS MB':>9}  ملاحظات")
+        cases = []
+        for sample in corpus:
+            case = run_case(pipeline, sample, args.repeat)
+            if pipeline is the_bride.compress_image:
+                case['stages_ms'] = time_stages(sample['data'])
+            stages = case.get('stages_ms', {})
+            note = 'fallback: تم تخزين الملف الأصلي' if case['fallback'] else ''
+            print(f"{case['name']:<28}{case['images_per_sec']:>9}"
+                  f"{stages.get('decode', '-'):>9}{stages.get('resize', '-'):>9}"
+                  f"{stages.get('flatten', '-'):>9}{stages.get('encode', '-'):>9}"
+                  f"{case['size_ratio']:>8}{case['tracemalloc_peak_mb']:>9}{case['max_rss_mb']:>9}  {note}")
+            cases.append(case)
+
+        total_images = args.repeat * len(cases)
+        total_time = sum(args.repeat / case['images_per_sec'] for case in cases)
+        print(f'الإجمالي: {total_images / total_time:.2f} صورة/ث، '
+              f"حالات fallback: {sum(case['fallback'] for case in cases)}")
+        results[pipeline_name] = cases
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f'\nتم حفظ خط الأساس: {args.save_baseline}')
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.max_regression)
+        if regressions:
+            print(f'\n❌ تراجع في الإنتاجية أكبر من {args.max_regression}%:')
+            for line in regressions:
+                print(f'   {line}')
+            sys.exit(1)
+        print(f'\n✅ لا يوجد تراجع أكبر من {args.max_regression}%')
+
+
+if __name__ == '__main__':
+    main()
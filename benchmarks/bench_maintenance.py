@@ -0,0 +1,78 @@
+"""قياس مهمة الصيانة وزمن لوحة التحكم من الملخص المحسوب مسبقاً
+
+- زمن run_maintenance على كتالوج كبير (أول تشغيل ثم تشغيل بدون تغييرات)
+- زمن حساب لوحة التحكم كاملة (كما كانت في كل طلب) مقابل قراءة الملخص
+- زمن صفحة / الفعلية بعد الصيانة
+- الفستان المُوقف يدوياً (بدون "متاح للحجز") يبقى غير متاح بعد الصيانة
+
+مثال:
+    python benchmarks/bench_maintenance.py --dresses 5000 --bookings 50000
+"""
+import argparse
+import time
+from datetime import date
+
+from common import logged_in_client, make_app, seed
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=5000)
+    parser.add_argument('--bookings', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    seed(the_bride, args.dresses, args.bookings)
+    with app.app_context():
+        # الحالة القديمة: كل فستان حُجز مرة يبقى غير متاح
+        the_bride.db.session.execute(the_bride.db.text(
+            'UPDATE dress SET is_available = 0 WHERE id IN (SELECT dress_id FROM booking)'))
+        the_bride.db.session.commit()
+
+        start = time.perf_counter()
+        first = the_bride.run_maintenance()
+        print(f'الصيانة (أول تشغيل): {(time.perf_counter() - start) * 1000:.0f} ms {first}')
+        elapsed, again = best_of(the_bride.run_maintenance, args.repeat)
+        print(f'الصيانة (بدون تغييرات): {elapsed:.1f} ms {again}')
+
+        today = date.today()
+        full, _ = best_of(lambda: the_bride.build_dashboard_digest(today), args.repeat)
+        cached, _ = best_of(lambda: the_bride.dashboard_digest(today), args.repeat)
+        print(f'\nحساب لوحة التحكم كاملة: {full:.2f} ms')
+        print(f'قراءة الملخص المحسوب:    {cached:.2f} ms')
+
+    client = logged_in_client(app)
+    client.get('/')
+    page, response = best_of(lambda: client.get('/'), args.repeat)
+    assert response.status_code == 200
+    print(f'صفحة لوحة التحكم: {page:.2f} ms')
+
+    # اختيار "متاح للحجز" اليدوي لا تلغيه الصيانة، وإعادته تتيح الفستان فوراً
+    form = {'dress_number': 'MAINT-OFF', 'category': 'فستان زفاف', 'rental_price': '100', 'size': 'M'}
+    client.post('/dresses/add', data=form)
+    with app.app_context():
+        dress = the_bride.Dress.query.filter_by(dress_number='MAINT-OFF').one()
+        the_bride.run_maintenance()
+        the_bride.db.session.refresh(dress)
+        stopped = (dress.in_service, dress.is_available)
+        dress_id, version = dress.id, dress.version
+    client.post(f'/dresses/{dress_id}/edit', data={**form, 'in_service': 'on', 'version': version})
+    with app.app_context():
+        dress = the_bride.db.session.get(the_bride.Dress, dress_id)
+        restored = (dress.in_service, dress.is_available)
+    print(f'فستان موقف يدوياً بعد الصيانة: {stopped}، بعد إعادته: {restored}')
+    assert stopped == (False, False) and restored == (True, True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""قياس حجم HTML المرسل لكل صفحة والتوفير الناتج عن ملفات CSS الخارجية والضغط
+
+لكل صفحة يطبع حجم HTML الحالي، والحجم الذي كان سيُرسل لو بقيت أنماط CSS
+مضمنة في الصفحة، والتوفير لكل مشاهدة صفحة، والحجم بعد ضغط gzip.
+ولصفحات القوائم يقارن زمن العرض الكامل بزمن استجابة 304 عند عدم تغير البيانات.
+
+مثال:
+    python benchmarks/bench_page_weight.py --dresses 200 --bookings 500
+"""
+import argparse
+import os
+import re
+import time
+
+from common import logged_in_client, make_app, seed
+
+LIST_PAGES = ['/dresses', '/bookings?status=all', '/reports']
+
+PAGES = ['/login', '/', '/dresses', '/dresses/add', '/dresses/1/edit', '/booking/add',
+         '/bookings', '/availability', '/reports']
+
+
+def stylesheet_bytes(the_bride, html):
+    """حجم الأنماط التي كانت مضمنة بدلاً من وسوم <link>"""
+    total = 0
+    for link in re.findall(r'<link rel="stylesheet" href="/assets/([^"]+)">', html):
+        logical = next(name for name, fp in the_bride.ASSET_MANIFEST.items() if fp == link)
+        with open(os.path.join(the_bride.app.static_folder, logical), 'rb') as f:
+            css = len(f.read())
+        inline = css + len('    <style>\n    </style>\n')
+        total += inline - len(f'    <link rel="stylesheet" href="/assets/{link}">\n'.encode())
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=200)
+    parser.add_argument('--bookings', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    seed(the_bride, args.dresses, args.bookings)
+    anonymous = app.test_client()
+    client = logged_in_client(app)
+
+    # استهلاك رسالة الترحيب حتى لا تمنع استجابات 304
+    client.get('/')
+
+    print(f"{'الصفحة':<22}{'HTML الآن':>12}{'مع CSS مضمن':>14}{'التوفير':>10}{'٪':>7}{'gzip':>9}")
+    for page in PAGES:
+        response = (anonymous if page == '/login' else client).get(page)
+        html = response.get_data(as_text=True)
+        saved = stylesheet_bytes(the_bride, html)
+        before = len(response.data) + saved
+        compressed = (anonymous if page == '/login' else client).get(page, headers={'Accept-Encoding': 'gzip'})
+        print(f'{page:<22}{len(response.data):>12}{before:>14}{saved:>10}{saved / before * 100:>6.1f}%'
+              f'{len(compressed.data):>9}')
+
+    print(f"\n{'صفحة القائمة':<22}{'200 ms':>10}{'304 ms':>10}{'بايت 304':>10}")
+    for page in LIST_PAGES:
+        full = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            response = client.get(page, headers={'Accept-Encoding': 'gzip'})
+            # /dresses و /bookings متدفقة: الزمن يشمل قراءة الصفحة كاملة لا أول دفعة فقط
+            response.get_data()
+            response.close()
+            full.append(time.perf_counter() - start)
+        etag = response.headers['ETag']
+        revalidated = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            not_modified = client.get(page, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+            revalidated.append(time.perf_counter() - start)
+        assert not_modified.status_code == 304, not_modified.status_code
+        print(f'{page:<22}{min(full) * 1000:>10.1f}{min(revalidated) * 1000:>10.1f}{len(not_modified.data):>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""تشغيل التطبيق على مجموعة Postgres مؤقتة (initdb + pg_ctl) والتحقق من إعداداته
+
+ينشئ مجموعة Postgres مؤقتة على منفذ محلي، ويضبط DATABASE_URL بصيغة
+postgres:// القديمة، ثم يتحقق من:
+  - تصحيح الرابط إلى postgresql+psycopg2:// وإعدادات مجمع الاتصالات من متغيرات البيئة
+  - تطبيق statement_timeout على كل اتصال
+  - إنشاء الجداول والبيانات الأولية وسير العمل الأساسي (دخول، فستان، حجز، إرجاع)
+  - عدم مشاركة الاتصالات بين العملية الأم والعملية الابنة بعد fork (--preload)
+وأخيراً يقيس عدد الطلبات في الثانية عبر عدة خيوط تتشارك مجمع الاتصالات.
+
+يتطلب initdb و pg_ctl في PATH أو في المجلد المحدد بـ PG_BIN.
+
+مثال:
+    PG_BIN=/usr/lib/postgresql/16/bin python benchmarks/bench_postgres.py --threads 8
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LOGIN = {'email': '7oda10035@gmail.com', 'password': 'Ma7moowd10035'}
+
+
+def pg_tool(name):
+    """مسار أداة Postgres من PG_BIN أو PATH"""
+    if os.environ.get('PG_BIN'):
+        return os.path.join(os.environ['PG_BIN'], name)
+    return shutil.which(name)
+
+
+def free_port():
+    """منفذ محلي غير مستخدم"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TempCluster:
+    """مجموعة Postgres مؤقتة تحذف بعد الانتهاء"""
+
+    def __init__(self):
+        self.dir = tempfile.mkdtemp(prefix='the_bride_pg_')
+        self.data = os.path.join(self.dir, 'data')
+        self.port = free_port()
+
+    def __enter__(self):
+        subprocess.run([pg_tool('initdb'), '-D', self.data, '-U', 'bride', '-A', 'trust', '-E', 'UTF8'],
+                       check=True, stdout=subprocess.DEVNULL)
+        subprocess.run([pg_tool('pg_ctl'), '-D', self.data, '-l', os.path.join(self.dir, 'pg.log'), '-w',
+                        '-o', f'-p {self.port} -k {self.dir} -c listen_addresses=127.0.0.1', 'start'],
+                       check=True, stdout=subprocess.DEVNULL)
+        return self
+
+    def __exit__(self, *exc):
+        subprocess.run([pg_tool('pg_ctl'), '-D', self.data, '-m', 'immediate', 'stop'],
+                       stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    @property
+    def url(self):
+        return f'postgres://bride@127.0.0.1:{self.port}/postgres'
+
+
+def check(condition, message):
+    """طباعة نتيجة تحقق والخروج عند الفشل"""
+    print(f"{'✅' if condition else '❌'} {message}")
+    if not condition:
+        sys.exit(1)
+
+
+def run_checks(the_bride):
+    """التحقق من الإعدادات وسير العمل الأساسي"""
+    from sqlalchemy import text
+
+    app, db = the_bride.app, the_bride.db
+    check(app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql+psycopg2://'),
+          'تصحيح postgres:// إلى postgresql+psycopg2://')
+
+    with app.app_context():
+        check(the_bride.Dress.query.count() == 3, 'إنشاء الجداول والبيانات الأولية في create_app()')
+        pool = db.engine.pool
+        check(pool.size() == 3, f'pool_size من DB_POOL_SIZE ({pool.size()})')
+        timeout = db.session.execute(text('SHOW statement_timeout')).scalar()
+        check(timeout == '2s', f'statement_timeout مطبق على الاتصال ({timeout})')
+        try:
+            db.session.execute(text('SELECT pg_sleep(3)'))
+            check(False, 'إلغاء الاستعلام الطويل')
+        except Exception as e:
+            db.session.rollback()
+            check('statement timeout' in str(e), 'إلغاء الاستعلام الطويل بواسطة statement_timeout')
+
+    client = app.test_client()
+    check(client.post('/login', data=LOGIN).status_code == 302, 'تسجيل الدخول')
+    response = client.post('/dresses/add', data={
+        'dress_number': 'PG001', 'model_name': 'Postgres', 'category': 'سواريه', 'rental_price': '100',
+        'size': 'M', 'in_service': 'on',
+    })
+    check(response.status_code == 302, 'إضافة فستان')
+    with app.app_context():
+        dress = the_bride.Dress.query.filter_by(dress_number='PG001').one()
+        dress_id = dress.id
+    response = client.post('/booking/add', data={
+        'dress_id': dress_id, 'customer_name': 'عميل', 'booking_date': '2031-01-01',
+        'return_date': '2031-01-03', 'total_price': '100', 'deposit_paid': '50',
+    })
+    check(response.status_code == 302, 'إضافة حجز')
+    with app.app_context():
+        booking = the_bride.Booking.query.filter_by(dress_id=dress_id).one()
+        booking_id = booking.id
+    check(client.post(f'/bookings/{booking_id}/return').status_code == 302, 'إرجاع الحجز')
+    for url in ('/', '/dresses', '/bookings', '/reports'):
+        check(client.get(url).status_code == 200, f'GET {url}')
+
+    # العملية الابنة يجب أن تفتح اتصالاتها الخاصة بعد fork
+    with app.app_context():
+        parent_backend = db.session.execute(text('SELECT pg_backend_pid()')).scalar()
+        db.session.remove()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        with app.app_context():
+            child_backend = db.session.execute(text('SELECT pg_backend_pid()')).scalar()
+        os.write(write_fd, str(child_backend).encode())
+        os._exit(0)
+    os.close(write_fd)
+    child_backend = int(os.read(read_fd, 64).decode())
+    os.waitpid(pid, 0)
+    check(child_backend != parent_backend, 'العملية الابنة لا تعيد استخدام اتصال العملية الأم')
+    with app.app_context():
+        check(db.session.execute(text('SELECT 1')).scalar() == 1, 'اتصال العملية الأم سليم بعد fork')
+    return client
+
+
+def run_benchmark(the_bride, threads, requests_per_thread):
+    """قياس الطلبات في الثانية عبر خيوط تتشارك مجمع الاتصالات"""
+    def session_worker(_):
+        client = the_bride.app.test_client()
+        client.post('/login', data=LOGIN)
+        latencies = []
+        for i in range(requests_per_thread):
+            url = ('/', '/dresses', '/bookings')[i % 3]
+            start = time.perf_counter()
+            client.get(url)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        latencies = sorted(lat for result in pool.map(session_worker, range(threads)) for lat in result)
+    elapsed = time.perf_counter() - start
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f'\n{threads} خيوط: {len(latencies) / elapsed:.0f} طلب/ث، p99 = {p99 * 1000:.1f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100, help='عدد الطلبات لكل خيط')
+    args = parser.parse_args()
+
+    if not pg_tool('initdb') or not os.path.exists(pg_tool('initdb')):
+        print('initdb غير موجود: ثبّت Postgres أو حدد PG_BIN')
+        sys.exit(2)
+
+    with TempCluster() as cluster:
+        os.environ.update({
+            'DATABASE_URL': cluster.url,
+            'DB_POOL_SIZE': '3',
+            'DB_MAX_OVERFLOW': '2',
+            'DB_STATEMENT_TIMEOUT_MS': '2000',
+            'MAINTENANCE_INTERVAL': '0',
+        })
+        import app as the_bride
+
+        the_bride.create_app()
+        run_checks(the_bride)
+        run_benchmark(the_bride, args.threads, args.requests)
+
+
+if __name__ == '__main__':
+    main()
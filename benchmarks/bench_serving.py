@@ -0,0 +1,230 @@
+"""قياس زمن الاستجابة تحت حمل مختلط لكل نوع عامل في gunicorn
+
+يشغل gunicorn بإعدادات gunicorn.conf.py لكل نوع عامل (sync و gthread و gevent)، ثم في نفس الوقت:
+- متصفحون يطلبون لوحة التحكم والمعرض وواجهة JSON وصور الفساتين
+- رفع صور بطيء (عميل يرسل الملف على دفعات كشبكة جوال)
+- تقارير متكررة (/reports)
+ويطبع p50 و p99 وأقصى زمن لطلبات التصفح، وعدد الأخطاء والرفع المكتمل.
+
+أمثلة:
+    python benchmarks/bench_serving.py --workers 2 --duration 15
+    python benchmarks/bench_serving.py --mode gthread --threads 4 --threads 8 --threads 16
+"""
+import argparse
+import http.client
+import io
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from PIL import Image
+
+from common import LOGIN, ROOT, make_app, seed
+
+BROWSE_PATHS = ('/', '/dresses?view=gallery', '/api/v1/dresses?limit=100', '/api/v1/facets', '/bookings/history')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def make_photo(size=(1500, 2000)):
+    img = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 32).convert('RGB')
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+def start_server(port, env):
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'app:create_app()'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, start_new_session=True)
+    deadline = time.perf_counter() + 60
+    while time.perf_counter() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/login')
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.1)
+    os.killpg(process.pid, 15)
+    raise RuntimeError(process.stderr.read().decode()[-2000:])
+
+
+def session_cookie(port):
+    """كوكي الجلسة بعد تسجيل الدخول وبعد عرض رسالة الترحيب (حتى لا تتكرر في كل طلب)"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    connection.request('POST', '/login', urllib.parse.urlencode(LOGIN),
+                       {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie').split(';')[0]
+    connection.request('GET', '/', headers={'Cookie': cookie})
+    response = connection.getresponse()
+    response.read()
+    updated = response.getheader('Set-Cookie')
+    return updated.split(';')[0] if updated else cookie
+
+
+class Load:
+    def __init__(self, port, cookie, duration, image_ids, think):
+        self.think = think
+        self.port = port
+        self.cookie = cookie
+        self.deadline = time.perf_counter() + duration
+        self.image_ids = image_ids
+        self.lock = threading.Lock()
+        self.browse = []
+        self.errors = 0
+        self.uploads = []
+        self.reports = 0
+
+    def record(self, bucket, value):
+        with self.lock:
+            bucket.append(value)
+
+    def browser(self, seed_value):
+        rng = random.Random(seed_value)
+        connection = None
+        while time.perf_counter() < self.deadline:
+            path = rng.choice(BROWSE_PATHS + (f'/dresses/{rng.choice(self.image_ids)}/image',))
+            start = time.perf_counter()
+            try:
+                connection = connection or http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+                connection.request('GET', path, headers={'Cookie': self.cookie})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise OSError(response.status)
+                self.record(self.browse, time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                with self.lock:
+                    self.errors += 1
+                connection = None
+            # وقت قراءة الصفحة قبل الطلب التالي، فالحمل ثابت ولا يتبع سرعة الخادم
+            time.sleep(rng.uniform(0, 2 * self.think))
+
+    def uploader(self, index, photo, rate):
+        """رفع صورة بسرعة rate بايت/ثانية، كعميل على شبكة بطيئة"""
+        counter = 0
+        while time.perf_counter() < self.deadline:
+            counter += 1
+            boundary = f'bench{index}x{counter}'
+            fields = {'dress_number': f'UP{index}-{counter}', 'model_name': 'رفع', 'category': 'سواريه',
+                      'rental_price': '1000', 'size': 'M'}
+            body = b''.join(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+                            for name, value in fields.items())
+            body += (f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="photo.jpg"\r\n'
+                     f'Content-Type: image/jpeg\r\n\r\n').encode() + photo + f'\r\n--{boundary}--\r\n'.encode()
+            start = time.perf_counter()
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+                connection.putrequest('POST', '/dresses/add')
+                connection.putheader('Cookie', self.cookie)
+                connection.putheader('Content-Type', f'multipart/form-data; boundary={boundary}')
+                connection.putheader('Content-Length', str(len(body)))
+                connection.endheaders()
+                chunk = max(rate // 10, 1)
+                for i in range(0, len(body), chunk):
+                    connection.send(body[i:i + chunk])
+                    time.sleep(0.1)
+                connection.getresponse().read()
+                connection.close()
+                self.record(self.uploads, time.perf_counter() - start)
+            except (OSError, http.client.HTTPException):
+                with self.lock:
+                    self.errors += 1
+
+    def reporter(self):
+        connection = None
+        while time.perf_counter() < self.deadline:
+            try:
+                connection = connection or http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+                connection.request('GET', '/reports', headers={'Cookie': self.cookie})
+                connection.getresponse().read()
+                with self.lock:
+                    self.reports += 1
+            except (OSError, http.client.HTTPException):
+                connection = None
+            time.sleep(self.think * 2)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+
+def run(mode, threads, args, env, photo, image_ids):
+    port = free_port()
+    env = dict(env, GUNICORN_WORKER_CLASS=mode, WEB_CONCURRENCY=str(args.workers), GUNICORN_THREADS=str(threads))
+    process = start_server(port, env)
+    try:
+        load = Load(port, session_cookie(port), args.duration, image_ids, args.think)
+        workers = [threading.Thread(target=load.browser, args=(i,)) for i in range(args.browsers)]
+        workers += [threading.Thread(target=load.uploader, args=(i, photo, args.upload_rate)) for i in range(args.uploads)]
+        workers += [threading.Thread(target=load.reporter) for _ in range(args.reports)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return load
+    finally:
+        os.killpg(process.pid, 15)
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=('sync', 'gthread', 'gevent'), action='append')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, action='append', help='خيوط gthread (يمكن تكراره)')
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--browsers', type=int, default=16)
+    parser.add_argument('--think', type=float, default=0.5, help='متوسط الانتظار بين طلبات كل متصفح بالثواني')
+    parser.add_argument('--uploads', type=int, default=3, help='عدد عمليات الرفع البطيء المتزامنة')
+    parser.add_argument('--upload-rate', type=int, default=128 * 1024, help='سرعة الرفع بالبايت/ثانية')
+    parser.add_argument('--reports', type=int, default=1)
+    parser.add_argument('--dresses', type=int, default=2000)
+    parser.add_argument('--bookings', type=int, default=20000)
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix='the_bride_serving_')
+    db_path = os.path.join(work, 'serving.db')
+    app, the_bride = make_app(db_path)
+    seed(the_bride, args.dresses, args.bookings)
+    photo = make_photo()
+    with app.app_context():
+        db, Dress = the_bride.db, the_bride.Dress
+        image_ids = [row[0] for row in db.session.query(Dress.id).order_by(Dress.id).limit(100)]
+        image_id = the_bride.store_image(the_bride.compress_image(photo))
+        db.session.execute(db.update(Dress).where(Dress.id.in_(image_ids)).values(image_id=image_id))
+        db.session.commit()
+        the_bride.recount_images()
+    os.makedirs(os.path.join(work, 'jinja'))
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', JINJA_CACHE_DIR=os.path.join(work, 'jinja'),
+               MAINTENANCE_INTERVAL='0')
+    print(f'{args.workers} عامل، {args.browsers} متصفح، {args.uploads} رفع بطيء '
+          f'({len(photo) / 1024 / 1024:.1f} MB بسرعة {args.upload_rate // 1024} KB/s)، {args.reports} تقارير، '
+          f'{args.duration:.0f}s لكل تشغيل، {os.cpu_count()} نواة')
+
+    print(f'\n{"العامل":<14}{"طلبات":>8}{"p50 ms":>9}{"p99 ms":>9}{"أقصى ms":>10}{"أخطاء":>7}{"رفع":>6}{"تقارير":>8}')
+    for mode in args.mode or ('sync', 'gthread', 'gevent'):
+        for threads in (args.threads or [8]) if mode == 'gthread' else [1]:
+            load = run(mode, threads, args, env, photo, image_ids)
+            label = f'{mode}×{threads}' if mode == 'gthread' else mode
+            browse = [value * 1000 for value in load.browse]
+            print(f'{label:<14}{len(browse):>8}{percentile(browse, 0.5):>9.0f}{percentile(browse, 0.99):>9.0f}'
+                  f'{max(browse, default=float("nan")):>10.0f}{load.errors:>7}{len(load.uploads):>6}{load.reports:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""قياس البحث عن الفساتين المشابهة بصرياً على كتالوج كبير
+
+- يولد صورة لكل فستان: خلفية تصوير فاتحة وفستان بأحد ألوان الكتالوج وقصة من ثلاث
+- زمن حساب الخصائص للصور المخزنة مسبقاً (backfill_image_features)
+- زمن بناء مصفوفة الخصائص في الذاكرة وزمن الترتيب (p50/p99) مباشرة وعبر الواجهة
+- الدقة: نسبة نتائج أول 10 من نفس لون الفستان المطلوب
+
+مثال:
+    python benchmarks/bench_similarity.py --dresses 20000 --queries 200
+"""
+import argparse
+import hashlib
+import io
+import random
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from common import logged_in_client, make_app, seed
+
+# ألوان الكتالوج (common.COLORS) بقيم RGB تقريبية
+PALETTE = {
+    'أبيض عاجي': (240, 234, 214), 'أبيض ثلجي': (250, 250, 252), 'أحمر قرمزي': (160, 20, 40),
+    'ذهبي': (212, 175, 55), 'وردي': (240, 160, 190), 'أزرق ملكي': (40, 60, 160),
+    'أسود': (20, 20, 20), 'فضي': (170, 170, 180),
+}
+SILHOUETTES = (
+    [(45, 20), (75, 20), (110, 150), (10, 150)],   # قصة A
+    [(50, 20), (70, 20), (80, 150), (40, 150)],    # حورية
+    [(40, 20), (80, 20), (118, 90), (118, 150), (2, 150), (2, 90)],  # منفوش
+)
+
+
+def make_photo(rng, color, serial=0):
+    """صورة 120×160 لفستان بلون قريب من color على خلفية فاتحة (serial يجعل كل صورة مختلفة)"""
+    background = tuple(rng.randint(225, 245) for _ in range(3))
+    img = Image.new('RGB', (120, 160), background)
+    draw = ImageDraw.Draw(img)
+    tint = tuple(min(255, max(0, value + rng.randint(-15, 15))) for value in color)
+    draw.polygon(rng.choice(SILHOUETTES), fill=tint)
+    img.putpixel((0, 0), (serial % 256, serial // 256 % 256, serial // 65536 % 256))
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=85)
+    return output.getvalue()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--max-ms', type=float, default=50.0, help='حد p99 لزمن الطلب عبر الواجهة')
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    if the_bride.np is None:
+        print('numpy غير مثبتة: البحث بالتشابه غير متاح')
+        return 1
+    seed(the_bride, args.dresses, 0)
+    rng = random.Random(11)
+    Dress, ImageBlob, db = the_bride.Dress, the_bride.ImageBlob, the_bride.db
+    ok = True
+
+    with app.app_context():
+        dresses = db.session.query(Dress.id, Dress.color).order_by(Dress.id).all()
+        colors = {dress_id: color if color in PALETTE else rng.choice(list(PALETTE)) for dress_id, color in dresses}
+        start = time.perf_counter()
+        # صور مخزنة بدون خصائص كما كانت قبل هذه الميزة، ثم الحساب اللاحق
+        for i in range(0, len(dresses), 1000):
+            batch = dresses[i:i + 1000]
+            photos = {dress_id: make_photo(rng, PALETTE[colors[dress_id]], dress_id) for dress_id, _ in batch}
+            db.session.execute(ImageBlob.__table__.insert(), [
+                {'digest': hashlib.sha256(data).hexdigest(), 'data': data, 'size': len(data), 'ref_count': 1}
+                for data in photos.values()])
+            ids = dict(db.session.query(ImageBlob.digest, ImageBlob.id).filter(
+                ImageBlob.digest.in_([hashlib.sha256(data).hexdigest() for data in photos.values()])))
+            db.session.execute(Dress.__table__.update().where(Dress.id == db.bindparam('dress')).values(
+                image_id=db.bindparam('blob')),
+                [{'dress': dress_id, 'blob': ids[hashlib.sha256(data).hexdigest()]} for dress_id, data in photos.items()])
+        db.session.commit()
+        print(f'{len(dresses)} فستان بصورة في {time.perf_counter() - start:.1f}s')
+
+        start = time.perf_counter()
+        computed = the_bride.backfill_image_features()
+        elapsed = time.perf_counter() - start
+        print(f'حساب الخصائص: {computed} صورة في {elapsed:.1f}s ({elapsed / max(computed, 1) * 1000:.2f} ms للصورة)')
+
+        start = time.perf_counter()
+        index = the_bride.feature_index()
+        print(f'بناء المصفوفة: {len(index["ids"])} صف، {index["colors"].nbytes / 1024 / 1024:.1f} MB ألوان، '
+              f'{(time.perf_counter() - start) * 1000:.0f} ms')
+
+        features = dict(db.session.query(Dress.id, ImageBlob.features).join(ImageBlob, Dress.image_id == ImageBlob.id))
+        queries = rng.sample([dress_id for dress_id, _ in dresses], min(args.queries, len(dresses)))
+        timings = []
+        precision = []
+        for dress_id in queries:
+            start = time.perf_counter()
+            ranked = the_bride.similar_dresses(features[dress_id], 10, exclude=dress_id)
+            timings.append((time.perf_counter() - start) * 1000)
+            precision.append(sum(colors[other] == colors[dress_id] for other, _ in ranked) / len(ranked))
+
+    print(f'\nالترتيب (similar_dresses): p50 {percentile(timings, 0.5):.2f} ms، p99 {percentile(timings, 0.99):.2f} ms')
+    quality = sum(precision) / len(precision)
+    print(f'دقة أول 10 (نفس اللون): {quality * 100:.1f}%')
+
+    client = logged_in_client(app)
+    api_timings = []
+    for dress_id in queries:
+        start = time.perf_counter()
+        response = client.get(f'/api/v1/dresses/{dress_id}/similar?limit=12')
+        api_timings.append((time.perf_counter() - start) * 1000)
+        ok &= response.status_code == 200 and len(response.get_json()['results']) == 12
+    p99 = percentile(api_timings, 0.99)
+    print(f'الواجهة (/api/v1/dresses/<id>/similar): p50 {percentile(api_timings, 0.5):.2f} ms، p99 {p99:.2f} ms')
+
+    photo_timings = []
+    for color in list(PALETTE) * 3:
+        photo = make_photo(rng, PALETTE[color])
+        start = time.perf_counter()
+        response = client.post('/api/v1/dresses/similar?limit=12', data={'image': (io.BytesIO(photo), 'customer.jpg')},
+                               content_type='multipart/form-data')
+        photo_timings.append((time.perf_counter() - start) * 1000)
+        ok &= response.status_code == 200
+    print(f'صورة العميل (POST /api/v1/dresses/similar): p50 {percentile(photo_timings, 0.5):.2f} ms، '
+          f'p99 {percentile(photo_timings, 0.99):.2f} ms')
+
+    ok &= p99 < args.max_ms and quality > 0.5
+    print(f'✅ p99 أقل من {args.max_ms:.0f} ms' if ok else f'❌ تجاوز {args.max_ms:.0f} ms أو نتائج غير صحيحة')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
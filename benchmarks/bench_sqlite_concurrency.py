@@ -0,0 +1,138 @@
+"""قياس القراءة والكتابة المتزامنة على SQLite: الوضع الافتراضي مقابل WAL
+
+يشغل عدة عمليات كتابة (مثل log_action) وعدة عمليات قراءة (مثل لوحة التحكم)
+على نفس ملف قاعدة البيانات، مرة بإعدادات SQLite الافتراضية ومرة بملف
+production، ويطبع الإنتاجية وزمن الاستجابة وعدد أخطاء "database is locked".
+
+مثال:
+    python benchmarks/bench_sqlite_concurrency.py --writers 4 --readers 8 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, pct):
+    """حساب النسبة المئوية من قائمة أزمنة"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def worker(role, db_path, seconds, queue):
+    """عملية قراءة أو كتابة تعمل لمدة محددة"""
+    from sqlalchemy import create_engine, text
+    import app  # noqa: F401 - يسجل مستمع إعدادات SQLite
+
+    engine = create_engine(f'sqlite:///{db_path}')
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    today = date.today().isoformat()
+
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                if role == 'writer':
+                    conn.execute(
+                        text('INSERT INTO system_log (timestamp, action, details) VALUES (:ts, :action, :details)'),
+                        {'ts': datetime.now(), 'action': 'BENCH', 'details': 'كتابة متزامنة'},
+                    )
+                else:
+                    conn.execute(text("SELECT count(*) FROM booking WHERE status = 'active'")).scalar()
+                    conn.execute(
+                        text("SELECT * FROM booking WHERE booking_date >= :today AND status = 'active' "
+                             "ORDER BY booking_date LIMIT 10"),
+                        {'today': today},
+                    ).fetchall()
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            if 'locked' not in str(e):
+                raise
+            errors += 1
+
+    engine.dispose()
+    queue.put((role, latencies, errors))
+
+
+def prepare_database(db_path, profile):
+    """إنشاء الجداول وتعبئتها ببيانات للقراءة"""
+    from sqlalchemy import create_engine
+    import app
+
+    app.app.config['SQLITE_PROFILE'] = profile
+    engine = create_engine(f'sqlite:///{db_path}')
+    app.db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(app.Dress.__table__.insert(), [
+            {'dress_number': f'B{i:05d}', 'model_name': 'Bench', 'category': 'فستان زفاف',
+             'rental_price': 1000.0, 'is_available': True, 'booking_count': 0}
+            for i in range(200)
+        ])
+        start = date.today()
+        conn.execute(app.Booking.__table__.insert(), [
+            {'customer_name': f'عميل {i}', 'booking_date': start + timedelta(days=i % 90),
+             'return_date': start + timedelta(days=i % 90 + 2), 'status': 'active',
+             'dress_id': i % 200 + 1, 'deposit_paid': 0.0, 'total_price': 0.0,
+             'remaining_balance': 0.0, 'created_date': datetime.now()}
+            for i in range(5000)
+        ])
+    engine.dispose()
+
+
+def run_profile(profile, args):
+    """تشغيل السيناريو بملف إعدادات معين"""
+    os.environ['SQLITE_PROFILE'] = profile
+    ctx = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        prepare_database(db_path, profile)
+
+        queue = ctx.Queue()
+        roles = ['writer'] * args.writers + ['reader'] * args.readers
+        processes = [ctx.Process(target=worker, args=(role, db_path, args.seconds, queue)) for role in roles]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    summary = {}
+    for role in ('writer', 'reader'):
+        latencies = [lat for r, lats, _ in results if r == role for lat in lats]
+        summary[role] = {
+            'ops_per_sec': len(latencies) / args.seconds,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'locked_errors': sum(errors for r, _, errors in results if r == role),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f'{args.writers} عمليات كتابة، {args.readers} عمليات قراءة، {args.seconds} ثوانٍ لكل ملف إعدادات\n')
+    print(f"{'الإعدادات':<12}{'الدور':<8}{'عملية/ث':>10}{'p50 ms':>10}{'p99 ms':>10}{'locked':>9}")
+    for profile in ('default', 'production'):
+        summary = run_profile(profile, args)
+        for role, stats in summary.items():
+            print(f"{profile:<12}{role:<8}{stats['ops_per_sec']:>10.0f}{stats['p50_ms']:>10.2f}"
+                  f"{stats['p99_ms']:>10.2f}{stats['locked_errors']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""قياس زمن الإقلاع: من تشغيل العملية حتى أول استجابة
+
+يشغل التطبيق بطريقتين (python app.py و gunicorn "app:create_app()") ويقيس الزمن من
+بدء العملية حتى أول استجابة ناجحة لصفحة الدخول، مرة بذاكرة Jinja المؤقتة
+فارغة (بارد) ومرة بعد تعبئتها (دافئ).
+
+مثال:
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    """منفذ محلي غير مستخدم"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def command_for(mode, port):
+    """أمر التشغيل لكل طريقة"""
+    if mode == 'python':
+        return [sys.executable, 'app.py']
+    return [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', '1', 'app:create_app()']
+
+
+def time_to_first_response(mode, env, timeout=30):
+    """تشغيل التطبيق وإرجاع الزمن حتى أول استجابة بالثواني"""
+    port = free_port()
+    env = dict(env, PORT=str(port))
+    start = time.perf_counter()
+    process = subprocess.Popen(command_for(mode, port), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/login', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f'{mode}: لم يستجب التطبيق خلال {timeout} ثانية')
+    finally:
+        # إنهاء المجموعة كاملة (تشمل عملية إعادة التحميل في وضع debug)
+        os.killpg(process.pid, 15)
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--mode', choices=('python', 'gunicorn'), action='append')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = os.path.join(tmp, 'jinja')
+        env = dict(os.environ,
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+                   JINJA_CACHE_DIR=cache_dir, MAINTENANCE_INTERVAL='0')
+
+        print(f"{'الطريقة':<10}{'الذاكرة':<8}{'أدنى ms':>10}{'وسيط ms':>10}{'أقصى ms':>10}")
+        for mode in args.mode or ('python', 'gunicorn'):
+            for state in ('cold', 'warm'):
+                timings = []
+                for _ in range(args.runs):
+                    if state == 'cold':
+                        shutil.rmtree(cache_dir, ignore_errors=True)
+                    os.makedirs(cache_dir, exist_ok=True)
+                    timings.append(time_to_first_response(mode, env) * 1000)
+                timings.sort()
+                print(f'{mode:<10}{state:<8}{timings[0]:>10.0f}{timings[len(timings) // 2]:>10.0f}{timings[-1]:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""قياس زمن أول بايت والذاكرة لصفحات القوائم الطويلة (عرض متدفق مقابل عرض كامل)
+
+لكل حجم بيانات يقيس لصفحتي /dresses و /bookings:
+  - زمن أول بايت (TTFB) وزمن الصفحة كاملة في وضع التدفق الحالي
+  - ذروة الذاكرة (tracemalloc) أثناء استهلاك الصفحة
+  - نفس المقاييس للعرض الكامل القديم (query.all() + render_template) للمقارنة
+  - ضغط التدفق بـ gzip: كل دفعة تُفك وحدها فور وصولها، والمحتوى بعد الفك مطابق
+
+مثال:
+    python benchmarks/bench_streaming.py --sizes 1000 5000 20000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+import zlib
+
+from flask import render_template
+
+from common import logged_in_client, make_app, seed
+
+
+def measure_stream(client, url):
+    """زمن أول دفعة، الزمن الكلي، ذروة الذاكرة، الحجم"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(url, buffered=False)
+    ttfb = None
+    size = 0
+    for chunk in response.response:
+        if ttfb is None:
+            ttfb = time.perf_counter() - start
+        size += len(chunk)
+    total = time.perf_counter() - start
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ttfb, total, peak, size
+
+
+def measure_gzip_stream(client, url, plain_size):
+    """التدفق المضغوط: الحجم، زمن أول دفعة مفكوكة، وصحة المحتوى بعد الفك"""
+    start = time.perf_counter()
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    decompressor = zlib.decompressobj(31)
+    ttfb = None
+    size = 0
+    html = b''
+    for chunk in response.response:
+        size += len(chunk)
+        html += decompressor.decompress(chunk)
+        if ttfb is None and html:
+            ttfb = time.perf_counter() - start
+    total = time.perf_counter() - start
+    response.close()
+    ok = (response.headers.get('Content-Encoding') == 'gzip' and 'Accept-Encoding' in response.headers.get('Vary', '')
+          and decompressor.eof and len(html) == plain_size and html.rstrip().endswith(b'</html>'))
+    return ttfb or total, total, size, ok
+
+
+def measure_full_render(app, the_bride, url):
+    """العرض الكامل في الذاكرة كما كان قبل التدفق"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with app.test_request_context(url):
+        if url.startswith('/dresses'):
+            html = render_template('dresses.html', dresses=the_bride.Dress.query.order_by(
+                the_bride.Dress.dress_number).all(), categories=[], current_category='all', search_query='')
+        else:
+            html = render_template('bookings.html', bookings=the_bride.Booking.query.order_by(
+                the_bride.Booking.booking_date.desc()).all(), current_status='all', search_query='')
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # العرض الكامل لا يرسل أي بايت قبل انتهاء الصفحة
+    return total, total, peak, len(html.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000],
+                        help='عدد الفساتين (والحجوزات ضعفها)')
+    args = parser.parse_args()
+
+    print(f"{'الصفوف':>8}  {'الصفحة':<22}{'الوضع':<8}{'TTFB ms':>10}{'الكل ms':>10}{'ذروة MB':>10}{'الحجم KB':>10}")
+    ok = True
+    for size in args.sizes:
+        app, the_bride = make_app()
+        seed(the_bride, dresses=size, bookings=size * 2)
+        client = logged_in_client(app)
+        client.get('/')
+        for url in ('/dresses', '/bookings?status=all'):
+            rows = size if url == '/dresses' else size * 2
+            for mode, result in (('stream', measure_stream(client, url)),
+                                 ('full', measure_full_render(app, the_bride, url))):
+                ttfb, total, peak, nbytes = result
+                print(f'{rows:>8}  {url:<22}{mode:<8}{ttfb * 1000:>10.1f}{total * 1000:>10.1f}'
+                      f'{peak / 1024 / 1024:>10.1f}{nbytes / 1024:>10.0f}')
+                if mode == 'stream':
+                    plain_size = nbytes
+            ttfb, total, nbytes, compressed = measure_gzip_stream(client, url, plain_size)
+            print(f'{rows:>8}  {url:<22}{"gzip":<8}{ttfb * 1000:>10.1f}{total * 1000:>10.1f}{"-":>10}'
+                  f'{nbytes / 1024:>10.0f}')
+            ok &= compressed and nbytes < plain_size / 2
+
+    print('✅ صفحات التدفق مضغوطة بـ gzip دفعة بدفعة' if ok else '❌ صفحة متدفقة غير مضغوطة أو تالفة بعد الفك')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
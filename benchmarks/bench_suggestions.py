@@ -0,0 +1,141 @@
+"""قياس اقتراحات الحجز عند التعارض والتحقق من صحتها
+
+- يضيف لفستان واحد عدداً كبيراً من الحجوزات النشطة بفجوات عشوائية
+- يتحقق أن أقرب فترة حرة قبل الطلب وبعده تطابق فحصاً يوماً بيوم
+- يتحقق أن الفستان المشابه المؤجر اليوم يُقترح إذا كان حراً في الفترة المطلوبة
+- يقيس زمن booking_suggestions وزمن طلب حجز متعارض (409 مع الاقتراحات)،
+  وعدد المحاولات التي كان الموظف سيحتاجها بتجربة الأيام التالية واحداً تلو الآخر
+- يقارن زمن صفحة الإتاحة مع فهرس (dress_id, status, booking_date) وبدونه
+
+مثال:
+    python benchmarks/bench_suggestions.py --dresses 2000 --bookings 20000 --dress-bookings 1000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from common import logged_in_client, make_app, seed
+
+
+def add_dress_bookings(the_bride, dress_id, count, rng):
+    """حجوزات نشطة متتالية للفستان بفجوات من 0 إلى 6 أيام"""
+    day = date.today() + timedelta(days=1)
+    rows = []
+    for _ in range(count):
+        length = rng.randint(0, 4)
+        rows.append({'customer_name': 'قياس', 'booking_date': day, 'return_date': day + timedelta(days=length),
+                     'status': 'active', 'dress_id': dress_id, 'created_date': datetime.now()})
+        day += timedelta(days=length + 1 + rng.choice([0, 0, 0, 1, 2, 6]))
+    with the_bride.app.app_context():
+        the_bride.db.session.execute(the_bride.Booking.__table__.insert(), rows)
+        the_bride.db.session.commit()
+    return day
+
+
+def brute_force(intervals, start, length, earliest):
+    """أقرب بداية حرة قبل start وبعده بفحص كل يوم"""
+    def free(begin):
+        end = begin + timedelta(days=length)
+        return all(end < busy_start or begin > busy_end for busy_start, busy_end in intervals)
+
+    after = start
+    while not free(after):
+        after += timedelta(days=1)
+    before = start
+    while before >= earliest and not free(before):
+        before -= timedelta(days=1)
+    return (before if before >= earliest else None), after
+
+
+def add_rented_twin(the_bride, dress_id):
+    """فستان من نفس التصنيف والمقاس مؤجر اليوم فقط (is_available=False) وهو الأكثر حجزاً"""
+    Dress, db = the_bride.Dress, the_bride.db
+    with the_bride.app.app_context():
+        dress = db.session.get(Dress, dress_id)
+        twin = Dress(dress_number='TWIN-1', model_name='مؤجر اليوم', category=dress.category, size=dress.size,
+                     rental_price=dress.rental_price, is_available=False, booking_count=10 ** 6)
+        db.session.add(twin)
+        db.session.flush()
+        db.session.add(the_bride.Booking(customer_name='قياس', dress_id=twin.id, status='active',
+                                         booking_date=date.today(), return_date=date.today() + timedelta(days=1)))
+        db.session.commit()
+        return twin.id
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=2000)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--dress-bookings', type=int, default=1000)
+    parser.add_argument('--checks', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    app, the_bride = make_app()
+    seed(the_bride, args.dresses, args.bookings)
+    last_day = add_dress_bookings(the_bride, 1, args.dress_bookings, rng)
+    twin_id = add_rented_twin(the_bride, 1)
+    today = date.today()
+
+    with app.test_request_context():
+        intervals = the_bride.busy_intervals(1, today)
+        for _ in range(args.checks):
+            start = today + timedelta(days=rng.randint(0, (last_day - today).days))
+            length = rng.randint(0, 5)
+            expected = brute_force(intervals, start, length, today)
+            assert the_bride.free_windows(intervals, start, length, today) == expected, (start, length)
+        print(f'صحة الفترات المقترحة: {args.checks} طلب عشوائي يطابق الفحص يوماً بيوم '
+              f'({len(intervals)} فترة مشغولة مدمجة)')
+
+        dress = the_bride.dress_cache.get(1)
+        middle = today + timedelta(days=(last_day - today).days // 2)
+        busy_start = next(begin for begin, _ in intervals if begin >= middle)
+        elapsed, suggestions = best_of(
+            lambda: the_bride.booking_suggestions(dress, busy_start, busy_start + timedelta(days=2)), args.repeat)
+        guesses = (suggestions['after']['booking_date'] - busy_start).days
+        print(f'booking_suggestions: {elapsed:.2f} ms، أقرب بديل بعد {guesses} يوم'
+              f' (أي {guesses} محاولة إضافية بالتجربة)، {len(suggestions["similar"])} فستان مشابه')
+        twin_suggested = twin_id in [row['id'] for row in suggestions['similar']]
+        today_twin = the_bride.booking_suggestions(dress, today, today + timedelta(days=1))
+        twin_excluded = twin_id not in [row['id'] for row in today_twin['similar']]
+        print(f'الفستان المشابه المؤجر اليوم: مقترح للفترة الحرة {twin_suggested}، '
+              f'مستبعد لفترة حجزه {twin_excluded}')
+
+    client = logged_in_client(app)
+    client.get('/')
+    conflict = {'dress_id': 1, 'customer_name': 'قياس', 'booking_date': busy_start.isoformat(),
+                'return_date': (busy_start + timedelta(days=2)).isoformat()}
+    elapsed, response = best_of(lambda: client.post('/api/v1/bookings', json=conflict), args.repeat)
+    assert response.status_code == 409 and 'suggestions' in response.get_json()
+    print(f'طلب متعارض مع الاقتراحات (409): {elapsed:.2f} ms')
+
+    check_date = (today + timedelta(days=30)).isoformat()
+    db = the_bride.db
+    print(f"\n{'الإتاحة':<16}{'ms':>10}")
+    for label in ('مع الفهرس', 'بدون الفهرس'):
+        if label == 'بدون الفهرس':
+            with app.app_context():
+                db.session.execute(db.text('DROP INDEX ix_booking_dress_status_date'))
+                db.session.commit()
+        elapsed, _ = best_of(lambda: client.get(f'/api/v1/availability?date={check_date}&limit=500'), args.repeat)
+        print(f'{label:<16}{elapsed:>10.2f}')
+
+    ok = twin_suggested and twin_excluded
+    print('✅ الاقتراحات تتبع الحجوزات في الفترة المطلوبة' if ok else '❌ فستان مشابه حر في الفترة لم يُقترح')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
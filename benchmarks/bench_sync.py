@@ -0,0 +1,131 @@
+"""قياس حجم وزمن مزامنة الأجهزة اللوحية: نسخة كاملة مقابل التغييرات فقط
+
+يبني كتالوجاً كبيراً، ثم يأخذ نسخة كاملة (since=0) ويحفظ المؤشر، ثم يطبق
+عدداً من التغييرات (تعديل أسعار، حجوزات جديدة، إرجاع، حذف فستان) ويقيس
+الفرق منذ المؤشر. لكل ترميز (JSON و msgpack إن كانت مثبتة) يطبع الحجم
+قبل الضغط وبعد gzip وزمن الاستجابة.
+
+ويتحقق أن تغييراً بمؤشر أقل يُكتب بعد قراءة مؤشر أعلى (معاملة Postgres متأخرة)
+يصل في المزامنة التالية ولا يضيع.
+
+مثال:
+    python benchmarks/bench_sync.py --dresses 5000 --bookings 20000 --changes 50
+"""
+import argparse
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from common import logged_in_client, make_app, seed
+
+ENCODINGS = {'json': 'application/json', 'msgpack': 'application/msgpack'}
+
+
+def timed_get(client, url, accept, repeat):
+    """أفضل زمن من عدة محاولات، الحجم قبل الضغط وبعده، والاستجابة"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        plain = client.get(url, headers={'Accept': accept})
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    compressed = client.get(url, headers={'Accept': accept, 'Accept-Encoding': 'gzip'})
+    return best, len(plain.data), len(compressed.data), plain
+
+
+def apply_changes(app, the_bride, client, count):
+    """تغييرات نموذجية بين مزامنتين"""
+    with app.app_context():
+        dresses = the_bride.Dress.query.order_by(the_bride.Dress.id).limit(count).all()
+        for dress in dresses:
+            dress.rental_price += 50
+        the_bride.bump_version('dress')
+        the_bride.db.session.commit()
+    for i in range(count):
+        day = date(2045, 1, 1) + timedelta(days=3 * i)
+        response = client.post('/api/v1/bookings', json={
+            'dress_id': 1, 'customer_name': 'مزامنة', 'booking_date': day.isoformat(),
+            'return_date': (day + timedelta(days=1)).isoformat(),
+        })
+        if i % 2 == 0:
+            client.post(f"/api/v1/bookings/{response.get_json()['id']}/return")
+    # فستان جديد ثم حذفه لإنتاج شاهد حذف
+    with app.app_context():
+        dress = the_bride.Dress(dress_number='SYNC-DEL', model_name='مؤقت', category='أخرى',
+                                rental_price=1000, size='M')
+        the_bride.db.session.add(dress)
+        the_bride.db.session.commit()
+        dress_id = dress.id
+    client.post(f'/dresses/{dress_id}/delete')
+    client.get('/dresses')  # استهلاك رسالة flash
+
+
+def check_late_commit(app, the_bride, client):
+    """فجوة في المؤشرات ثم كتابة متأخرة داخلها: المزامنة التالية يجب أن تحملها"""
+    db, Dress, ChangeLog = the_bride.db, the_bride.Dress, the_bride.ChangeLog
+    start = client.get('/api/v1/sync').get_json()['cursor']
+    early, late = 1, 2
+    with app.app_context():
+        # معاملة حجزت start+1 ولم تنته بعد، وأخرى بعدها كتبت start+2
+        db.session.execute(ChangeLog.__table__.insert(), [
+            {'seq': start + 2, 'entity': 'dress', 'entity_id': early, 'op': 'upsert', 'changed_at': datetime.now()}])
+        db.session.commit()
+    first = client.get(f'/api/v1/sync?since={start}').get_json()
+    with app.app_context():
+        db.session.execute(db.update(Dress).where(Dress.id == late).values(
+            rental_price=Dress.rental_price + 1, version=Dress.version + 1))
+        db.session.execute(ChangeLog.__table__.insert(), [
+            {'seq': start + 1, 'entity': 'dress', 'entity_id': late, 'op': 'upsert', 'changed_at': datetime.now()}])
+        db.session.commit()
+    second = client.get(f"/api/v1/sync?since={first['cursor']}").get_json()
+    with app.app_context():
+        # بعد مدة الاستقرار تُعتبر الفجوات نهائية
+        db.session.execute(db.update(ChangeLog).values(
+            changed_at=datetime.now() - timedelta(seconds=the_bride.SYNC_SETTLE_SECONDS + 1)))
+        db.session.commit()
+    settled = client.get(f"/api/v1/sync?since={second['cursor']}").get_json()
+    received = {item['id'] for item in second['dresses']}
+    print(f'\nكتابة متأخرة بمؤشر أقل: المؤشر بعد الفجوة {first["cursor"]} (آخر تغيير {start + 2})، '
+          f'وصلت في المزامنة التالية: {late in received}، المؤشر بعد الاستقرار {settled["cursor"]}')
+    return first['cursor'] == start and late in received and settled['cursor'] == start + 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=5000)
+    parser.add_argument('--bookings', type=int, default=20000)
+    parser.add_argument('--changes', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    seed(the_bride, args.dresses, args.bookings)
+    client = logged_in_client(app)
+    client.get('/')
+    encodings = [name for name in ENCODINGS if name == 'json' or the_bride.msgpack is not None]
+    if the_bride.msgpack is None:
+        print('msgpack غير مثبتة: القياس على JSON فقط\n')
+
+    full = client.get('/api/v1/sync').get_json()
+    cursor = full['cursor']
+    apply_changes(app, the_bride, client, args.changes)
+
+    print(f"{'النوع':<8}{'الترميز':<10}{'سجلات':>8}{'محذوف':>8}{'KB':>10}{'gzip KB':>10}{'ms':>10}")
+    for name in encodings:
+        for kind, url in (('full', '/api/v1/sync?since=0'), ('delta', f'/api/v1/sync?since={cursor}')):
+            elapsed, raw, compressed, response = timed_get(client, url, ENCODINGS[name], args.repeat)
+            assert response.mimetype == ENCODINGS[name], response.mimetype
+            payload = response.get_json() if name == 'json' else the_bride.msgpack.unpackb(response.data)
+            assert payload['full'] == (kind == 'full')
+            records = len(payload['dresses']) + len(payload['bookings'])
+            deleted = sum(len(ids) for ids in payload['deleted'].values())
+            print(f'{kind:<8}{name:<10}{records:>8}{deleted:>8}{raw / 1024:>10.1f}{compressed / 1024:>10.1f}'
+                  f'{elapsed * 1000:>10.1f}')
+
+    ok = check_late_commit(app, the_bride, client)
+    print('✅ لا يضيع أي تغيير بين مزامنتين' if ok else '❌ ضاع تغيير كُتب بعد قراءة المؤشر')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
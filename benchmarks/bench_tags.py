@@ -0,0 +1,79 @@
+"""قياس التصفية حسب وسوم الأقمشة والألوان مقابل LIKE على النص المفصول بالفواصل
+
+يبني كتالوجاً، ويقيس زمن ترحيل النصوص إلى جداول الوسوم، ثم يقارن لعدة
+تركيبات من الوسوم زمن الاستعلام ونتيجته عبر فهرس الوسوم وعبر LIKE، ويتحقق
+من صحة النتيجة مقابل تقسيم النصوص في بايثون.
+
+مثال:
+    python benchmarks/bench_tags.py --dresses 20000
+"""
+import argparse
+import time
+
+from common import COLORS, FABRICS, make_app, seed
+
+COMBINATIONS = [
+    ([FABRICS[0]], []),
+    (FABRICS[:2], []),
+    (FABRICS[:3], []),
+    (FABRICS[:2], [COLORS[0]]),
+    ([FABRICS[5]], COLORS[:2]),
+]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dresses', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app, the_bride = make_app()
+    seed(the_bride, dresses=args.dresses, bookings=0)
+    Dress = the_bride.Dress
+    db = the_bride.db
+
+    with app.test_request_context():
+        start = time.perf_counter()
+        migrated = the_bride.migrate_dress_tags()
+        print(f'ترحيل {migrated} فستان إلى الوسوم: {(time.perf_counter() - start) * 1000:.0f} ms\n')
+
+        catalog = db.session.query(Dress.id, Dress.fabric_types, Dress.color).all()
+
+        def expected(fabrics, colors):
+            return {dress_id for dress_id, fabric_types, color in catalog
+                    if set(fabrics) <= set(the_bride.split_tags(fabric_types))
+                    and (not colors or set(colors) & set(the_bride.split_tags(color)))}
+
+        def by_tags(fabrics, colors):
+            return {row[0] for row in the_bride.filter_by_tags(db.session.query(Dress.id), fabrics, colors)}
+
+        def by_like(fabrics, colors):
+            query = db.session.query(Dress.id)
+            for fabric in fabrics:
+                query = query.filter(Dress.fabric_types.like(f'%{fabric}%'))
+            if colors:
+                query = query.filter(db.or_(*[Dress.color.like(f'%{color}%') for color in colors]))
+            return {row[0] for row in query}
+
+        print(f"{'الوسوم':<44}{'وسوم ms':>9}{'LIKE ms':>9}{'النتائج':>9}{'LIKE':>7}{'صحيح':>6}")
+        for fabrics, colors in COMBINATIONS:
+            tag_ms, tag_ids = best_of(lambda: by_tags(fabrics, colors), args.repeat)
+            like_ms, like_ids = best_of(lambda: by_like(fabrics, colors), args.repeat)
+            correct = tag_ids == expected(fabrics, colors)
+            label = ' + '.join(fabrics) + (' | ' + ' / '.join(colors) if colors else '')
+            print(f'{label:<44}{tag_ms:>9.2f}{like_ms:>9.2f}{len(tag_ids):>9}{len(like_ids):>7}'
+                  f'{"نعم" if correct else "لا":>6}')
+            assert correct, label
+
+
+if __name__ == '__main__':
+    main()
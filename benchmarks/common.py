@@ -0,0 +1,113 @@
+"""أدوات مشتركة لسكربتات القياس: تطبيق على قاعدة بيانات مؤقتة وبيانات اختبارية"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LOGIN = {'email': '7oda10035@gmail.com', 'password': 'Ma7moowd10035'}
+
+CATEGORIES = ['فستان زفاف', 'سواريه', 'فستان سهرة', 'فستان خطوبة', 'أخرى']
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+COLORS = ['أبيض عاجي', 'أبيض ثلجي', 'أحمر قرمزي', 'ذهبي', 'وردي', 'أزرق ملكي', 'أسود', 'فضي']
+FABRICS = ['ساتان حريري', 'شيفون', 'دانتيل فرنسي', 'مخمل', 'تول', 'ليز', 'كريب', 'أورجانزا', 'تفتا', 'جورجيت']
+
+
+def make_app(db_path=None, **config):
+    """تجهيز التطبيق على ملف SQLite مؤقت وإرجاع (app, module)"""
+    import app as the_bride
+
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='the_bride_bench_'), 'bench.db')
+    config.setdefault('SQLALCHEMY_DATABASE_URI', f'sqlite:///{db_path}')
+    # الصيانة الدورية في الخلفية تشوش القياس
+    config.setdefault('MAINTENANCE_INTERVAL', 0)
+    return the_bride.create_app(config), the_bride
+
+
+def logged_in_client(app):
+    """عميل اختبار بعد تسجيل الدخول"""
+    client = app.test_client()
+    client.post('/login', data=LOGIN)
+    return client
+
+
+def seed(the_bride, dresses=1000, bookings=5000, seed_value=42):
+    """إضافة فساتين وحجوزات عشوائية بإدخال جماعي"""
+    rng = random.Random(seed_value)
+    db = the_bride.db
+    with the_bride.app.app_context():
+        start_id = (db.session.query(db.func.max(the_bride.Dress.id)).scalar() or 0) + 1
+        db.session.execute(the_bride.Dress.__table__.insert(), [
+            {
+                'dress_number': f'S{start_id + i:06d}',
+                'model_name': f'Model {rng.randint(1, 400)}',
+                'category': rng.choice(CATEGORIES),
+                'color': rng.choice(COLORS),
+                'fabric_types': ', '.join(rng.sample(FABRICS, rng.randint(1, 3))),
+                'rental_price': float(rng.randrange(500, 9000, 50)),
+                'size': rng.choice(SIZES),
+                'details': 'تفاصيل ' * rng.randint(5, 40),
+                'is_available': True,
+                'booking_count': 0,
+                'created_date': datetime.now(),
+            }
+            for i in range(dresses)
+        ])
+        dress_ids = [row[0] for row in db.session.query(the_bride.Dress.id).all()]
+        today = date.today()
+        rows = []
+        for i in range(bookings):
+            begin = today + timedelta(days=rng.randint(-400, 200))
+            status = 'active' if begin >= today - timedelta(days=3) else rng.choice(['returned', 'returned', 'cancelled'])
+            rows.append({
+                'customer_name': f'عميل {rng.randint(1, bookings // 2 or 1)}',
+                'customer_phone': f'05{rng.randint(10000000, 99999999)}',
+                'customer_email': f'c{i}@example.com',
+                'booking_date': begin,
+                'return_date': begin + timedelta(days=rng.randint(1, 4)),
+                'deposit_paid': 500.0,
+                'total_price': 2000.0,
+                'remaining_balance': 1500.0,
+                'notes': '',
+                'status': status,
+                'dress_id': rng.choice(dress_ids),
+                'created_date': datetime.combine(begin, datetime.min.time()) - timedelta(days=rng.randint(1, 60)),
+            })
+        if rows:
+            db.session.execute(the_bride.Booking.__table__.insert(), rows)
+        db.session.commit()
+        the_bride.invalidate_totals()
+
+
+class Writer(threading.Thread):
+    """كاتب مستمر على اتصال مستقل يسجل زمن كل كتابة"""
+
+    def __init__(self, path, interval):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.latencies = []
+        self.running = True
+
+    def run(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        while self.running:
+            start = time.perf_counter()
+            connection.execute("INSERT INTO system_log (action, details) VALUES ('BENCH', 'كتابة أثناء القياس')")
+            connection.commit()
+            self.latencies.append(time.perf_counter() - start)
+            time.sleep(self.interval)
+        connection.close()
+
+    def stop(self):
+        self.running = False
+        self.join()
+        ordered = sorted(self.latencies) or [0]
+        return len(ordered), ordered[-1] * 1000, ordered[int(len(ordered) * 0.99)] * 1000
@@ -0,0 +1,44 @@
+"""إعدادات gunicorn: نوع العامل وعدد العمال والخيوط من متغيرات البيئة
+
+الاستخدام: gunicorn --config gunicorn.conf.py "app:create_app()"
+
+GUNICORN_WORKER_CLASS:
+- gthread (افتراضي): خيوط في كل عامل، فرفع صورة بطيء أو تقرير كبير يشغل خيطاً لا عاملاً كاملاً
+- gevent: مئات الاتصالات لكل عامل مع Postgres (يتطلب requirements-gevent.txt)؛ استعلامات SQLite
+  لا تتخلى عن حلقة الأحداث، فانتظار قفل الكتابة يوقف كل طلبات العامل
+- sync: طلب واحد لكل عامل في نفس الوقت (السلوك السابق)
+
+الأعداد الافتراضية من benchmarks/bench_serving.py (انظر README).
+"""
+import multiprocessing
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # بدون psycogreen يعمل gevent لكن كل استعلام Postgres يوقف العامل، فالأفضل ألا يبدأ الخادم
+    try:
+        from gevent import monkey
+        from psycogreen.gevent import patch_psycopg
+    except ImportError as e:
+        raise SystemExit(f'GUNICORN_WORKER_CLASS=gevent يتطلب: pip install -r requirements-gevent.txt ({e})')
+    # الترقيع قبل استيراد التطبيق حتى مع preload، ثم psycopg2 حتى يتخلى عن حلقة الأحداث أثناء انتظار Postgres
+    monkey.patch_all()
+    patch_psycopg()
+
+cores = multiprocessing.cpu_count()
+# WEB_CONCURRENCY يحدد عدد العمال (كما في Heroku)، والافتراضي حسب نوع العامل
+workers = int(os.environ.get('WEB_CONCURRENCY', cores * 2 + 1 if worker_class == 'sync' else max(cores, 2)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))  # gthread
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))  # gevent
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
+# create_app() تهيئ القاعدة مرة واحدة في العملية الأم، والعمال يسقطون اتصالاتها بعد fork.
+# لا تبدأ خيوطاً في العملية الأم: خيط الصيانة يبدأ في post_worker_init أدناه
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def post_worker_init(worker):
+    """خيط الصيانة يبدأ في كل عامل بعد تحميل التطبيق، لا في العملية الأم قبل fork"""
+    from app import ensure_maintenance_thread
+    ensure_maintenance_thread()